@@ -0,0 +1,260 @@
+# This file is for streaming the output of the card (aka input of the reservoir) through a small buffer, instead of
+# preparing all of the output beforehand. You do not need to change anything here. It is used by Functions_Output.py
+# and Data_Output.py when you set streaming = True there.
+#
+# The buffer of the card is split into two halves. While the card outputs one half, the other half, which was already
+# output, is refilled with the next piece of data. This way, the memory that is needed does not depend on how long
+# the output is, so even runs of many hours are possible.
+#
+# For periodic functions, loop_output() goes one step further: only one period is prepared and the card repeats it
+# by itself (used by Functions_Output.py when you set looping = True there).
+
+from __future__ import absolute_import, division, print_function
+from builtins import *  # @UnusedWildImport
+
+from ctypes import cast, POINTER, c_ushort
+from time import sleep
+
+from mcculw.enums import ScanOptions, FunctionType, Status
+import numpy as np
+import pandas as pd
+
+try:
+    from DAQ_Backend import ul
+    from DAC_Conversion import get_conversion, write_counts
+except ImportError:
+    from .DAQ_Backend import ul
+    from .DAC_Conversion import get_conversion, write_counts
+
+
+def read_csv_chunks(file, columns, chunk_points=10000):
+    """Reads the given columns of a (prepared) data file piece by piece.
+
+    Yields arrays of shape (chunk_points, len(columns)), the last one may be
+    shorter.
+    """
+    for df in pd.read_csv(file, delimiter=',', usecols=columns,
+                          chunksize=chunk_points):
+        yield df[columns].to_numpy(dtype=float)
+
+
+def rechunk(chunks, block_points, num_chans):
+    """Cuts the pieces coming from chunks (arrays of any length) into blocks
+    of exactly block_points points.
+
+    Yields (block, num_valid) tuples. Only the last block can have
+    num_valid < block_points, the rest of it is filled with 0V.
+    """
+    block = np.zeros((block_points, num_chans))
+    filled = 0
+    for chunk in chunks:
+        chunk = np.asarray(chunk, dtype=float).reshape(-1, num_chans)
+        start = 0
+        while start < len(chunk):
+            num_points = min(block_points - filled, len(chunk) - start)
+            block[filled:filled + num_points] = chunk[start:start + num_points]
+            filled += num_points
+            start += num_points
+            if filled == block_points:
+                yield block, block_points
+                block = np.zeros((block_points, num_chans))
+                filled = 0
+    if filled > 0:
+        yield block, filled
+
+
+def stream_output(board_num, low_chan, high_chan, rate, ao_range, chunks,
+                  buffer_size_seconds=2):
+    """Outputs the data coming from chunks through a fixed-size circular
+    buffer.
+
+    Parameters
+    ----------
+    board_num : int
+        The board number of the card.
+    low_chan, high_chan : int
+        First and last output channel.
+    rate : int
+        Output rate (in Hz).
+    ao_range : ULRange
+        The output range of the card.
+    chunks : iterable
+        Generator or chunked file reader, which yields arrays of shape
+        (points, num_chans) in volts, e.g. Waveforms.generate_chunks() or
+        read_csv_chunks().
+    buffer_size_seconds : float, optional
+        Size of the UL buffer (in s). Each half is refilled while the other
+        half is output. Default is 2s.
+
+    Returns
+    -------
+    underruns : int
+        The number of underruns, i.e. how often the card output a half of
+        the buffer before it was refilled. Should be 0.
+    skipped_points : int
+        How many points (per channel) the card output old data instead,
+        i.e. how much later than planned the rest of the data was output.
+    """
+    num_chans = high_chan - low_chan + 1
+
+    # Each half of the buffer holds half of buffer_size_seconds, or at least
+    # 10 points
+    points_per_half = max(int(rate * buffer_size_seconds / 2), 10)
+    half_count = points_per_half * num_chans
+    ul_buffer_count = 2 * half_count
+
+    conversion = get_conversion(board_num, ao_range)
+    blocks = rechunk(chunks, points_per_half, num_chans)
+    empty_block = np.zeros((points_per_half, num_chans))
+
+    memhandle = ul.win_buf_alloc(ul_buffer_count)
+    if not memhandle:
+        raise Exception('Error: Failed to allocate memory')
+    data_array = cast(memhandle, POINTER(c_ushort))
+
+    # written: how many points have been written into the buffer so far.
+    # data_end: the point at which the real data ends, known once chunks is
+    # used up. After it, 0V is output.
+    written = 0
+    data_end = None
+    underruns = 0
+    skipped_points = 0
+
+    def write_next_half():
+        nonlocal written, data_end
+        block, num_valid = next(blocks, (empty_block, 0))
+        if num_valid < points_per_half and data_end is None:
+            data_end = written + num_valid * num_chans
+        write_counts(board_num, ao_range, data_array, block,
+                     first_point=written % ul_buffer_count,
+                     conversion=conversion)
+        written += half_count
+
+    try:
+        # Fill both halves before starting
+        write_next_half()
+        write_next_half()
+
+        ul.a_out_scan(board_num, low_chan, high_chan, ul_buffer_count, rate,
+                      ao_range, memhandle,
+                      ScanOptions.BACKGROUND | ScanOptions.CONTINUOUS)
+
+        print('Streaming output...', end='')
+        while True:
+            status, curr_count, _ = ul.get_status(board_num,
+                                                  FunctionType.AOFUNCTION)
+            if status == Status.IDLE:
+                raise Exception('Error: The output scan stopped unexpectedly')
+            if data_end is not None and curr_count >= data_end:
+                break
+
+            # The card has already output points that were not refilled yet,
+            # i.e. it repeated old data. The half it is in now can't be
+            # refilled anymore, so the data goes on at the next half
+            if curr_count > written:
+                underruns += 1
+                next_half = (curr_count // half_count + 1) * half_count
+                skipped = (next_half - written) // num_chans
+                skipped_points += skipped
+                written = next_half
+                print('\nAn underrun occurred ({} points skipped)'.format(
+                    skipped))
+
+            # Refill every half that has already been output
+            while curr_count >= written - half_count:
+                write_next_half()
+                print('.', end='')
+
+            # Slow down the status check so as not to flood the CPU
+            sleep(points_per_half / rate / 4)
+        print('')
+    finally:
+        ul.stop_background(board_num, FunctionType.AOFUNCTION)
+        ul.win_buf_free(memhandle)
+
+    if underruns > 0:
+        print(str(underruns) + ' underrun(s) occurred, ' + str(skipped_points)
+              + ' points were skipped. Try a larger buffer_size_seconds.')
+    return underruns, skipped_points
+
+
+def loop_output(board_num, low_chan, high_chan, rate, ao_range, period_data,
+                duration=None, min_buffer_seconds=1):
+    """Lets the card repeat period_data over and over again, until duration
+    is over or you press Ctrl+C.
+
+    Only one period has to be prepared, so the memory and the time needed
+    before the start don't depend on how long the output runs.
+
+    Parameters
+    ----------
+    board_num : int
+        The board number of the card.
+    low_chan, high_chan : int
+        First and last output channel.
+    rate : int
+        Output rate (in Hz).
+    ao_range : ULRange
+        The output range of the card.
+    period_data : numpy.ndarray
+        One period of all channels in volts, shape (points, num_chans), e.g.
+        from Waveforms.build_channels() with Waveforms.period_points().
+    duration : float, optional
+        How long (in s) the output should run. If None, it runs until you
+        press Ctrl+C.
+    min_buffer_seconds : float, optional
+        Short periods are repeated in the UL buffer until it holds at least
+        this long (in s), so that the card is not busy restarting the buffer.
+        Default is 1s.
+    """
+    num_chans = high_chan - low_chan + 1
+    period_data = np.asarray(period_data, dtype=float).reshape(-1, num_chans)
+
+    min_points = max(int(rate * min_buffer_seconds), 10)
+    repeats = -(-min_points // len(period_data))
+    buffer_data = np.tile(period_data, (repeats, 1))
+    ul_buffer_count = buffer_data.size
+
+    memhandle = ul.win_buf_alloc(ul_buffer_count)
+    if not memhandle:
+        raise Exception('Error: Failed to allocate memory')
+    data_array = cast(memhandle, POINTER(c_ushort))
+
+    try:
+        write_counts(board_num, ao_range, data_array, buffer_data)
+
+        ul.a_out_scan(board_num, low_chan, high_chan, ul_buffer_count, rate,
+                      ao_range, memhandle,
+                      ScanOptions.BACKGROUND | ScanOptions.CONTINUOUS)
+
+        if duration is None:
+            print('Repeating output, press Ctrl+C to stop...', end='')
+            total_count = None
+        else:
+            print('Repeating output for ' + str(duration) + 's...', end='')
+            total_count = int(duration * rate) * num_chans
+
+        try:
+            while True:
+                status, curr_count, _ = ul.get_status(board_num,
+                                                      FunctionType.AOFUNCTION)
+                if status == Status.IDLE:
+                    raise Exception('Error: The output scan stopped '
+                                    'unexpectedly')
+                if total_count is not None and curr_count >= total_count:
+                    break
+                print('.', end='')
+
+                # Slow down the status check so as not to flood the CPU, but
+                # don't sleep past the end
+                wait = 0.5
+                if total_count is not None:
+                    wait = min(wait, (total_count - curr_count)
+                               / num_chans / rate)
+                sleep(wait)
+        except KeyboardInterrupt:
+            print('\nStopped by user', end='')
+        print('')
+    finally:
+        ul.stop_background(board_num, FunctionType.AOFUNCTION)
+        ul.win_buf_free(memhandle)
@@ -0,0 +1,719 @@
+# This file does the actual recording for Input_Board_0.py, Input_Board_1.py and Input_Boards.py. You do not need to
+# change anything here.
+#
+# All boards are recorded by one loop in one process: the scans are started one after the other, the loop copies
+# the new data of every board out of its UL buffer and the points of all boards are written side by side into one
+# file (one column per channel), so that no manual alignment of Board0 and Board1 files is needed anymore.
+
+from __future__ import absolute_import, division, print_function
+from builtins import *  # @UnusedWildImport
+
+from ctypes import c_double, c_ushort
+from functools import partial
+from time import sleep, perf_counter, process_time
+from datetime import datetime
+import os
+from pathlib import Path
+
+from mcculw.enums import ScanOptions, FunctionType, Status, AnalogInputMode
+import matplotlib.pyplot as plt
+import numpy as np
+
+try:
+    from DAQ_Backend import ul, DaqDeviceInfo
+    from Config_File_Dont_Touch import config_first_detected_device
+    from Decimation import envelope
+    from Recording import BackgroundWriter, ChunkPool, CSVRecording, \
+        open_sink, open_recording
+    from Ring_Buffer import RingBuffer
+    from Spectral_Analysis import RunningPSD, welch_psd, plot_psd
+    from Live_Monitor import LiveMonitor
+except ImportError:
+    from .DAQ_Backend import ul, DaqDeviceInfo
+    from .Config_File_Dont_Touch import config_first_detected_device
+    from .Decimation import envelope
+    from .Recording import BackgroundWriter, ChunkPool, CSVRecording, \
+        open_sink, open_recording
+    from .Ring_Buffer import RingBuffer
+    from .Spectral_Analysis import RunningPSD, welch_psd, plot_psd
+    from .Live_Monitor import LiveMonitor
+
+
+class BoardScan:
+    """A continuous background a_in_scan of one board into a circular UL
+    buffer, from which the new data is copied chunk by chunk.
+
+    Parameters
+    ----------
+    board_num : int
+        The board number (as defined in Instacal).
+    low_chan, high_chan : int
+        First and last input channel.
+    rate : int
+        Scan rate (in Hz).
+    buffer_size_seconds : float, optional
+        The size of the UL buffer to create, in seconds. Default is 2s.
+    use_device_detection : bool, optional
+        Detect the device instead of using the one configured in Instacal.
+        Default is False.
+    chunks_per_buffer : int, optional
+        The data is copied out in chunks of 1/chunks_per_buffer of the UL
+        buffer. Default is 10.
+    raw_counts : bool, optional
+        Keep the raw counts of the card (16 bit) in the UL buffer instead of
+        volts. The chunks are then uint16 and self.conversion converts them.
+        Default is False.
+    """
+
+    def __init__(self, board_num, low_chan, high_chan, rate,
+                 buffer_size_seconds=2, use_device_detection=False,
+                 chunks_per_buffer=10, raw_counts=False):
+        self.board_num = board_num
+        self.low_chan = low_chan
+        self.high_chan = high_chan
+        self.num_chans = high_chan - low_chan + 1
+        self.rate = rate
+        self.use_device_detection = use_device_detection
+        self.raw_counts = raw_counts
+        self.memhandle = None
+
+        if use_device_detection:
+            config_first_detected_device(board_num, [])
+            ul.a_input_mode(board_num, AnalogInputMode.SINGLE_ENDED)
+
+        daq_dev_info = DaqDeviceInfo(board_num)
+        if not daq_dev_info.supports_analog_input:
+            raise Exception('Error: The DAQ device does not support '
+                            'analog input')
+
+        print('\nActive DAQ device: ', daq_dev_info.product_name, ' (',
+              daq_dev_info.unique_id, ')\n', sep='')
+
+        ai_info = daq_dev_info.get_ai_info()
+        self.packet_size = ai_info.packet_size
+
+        # Create a circular buffer that can hold buffer_size_seconds worth of
+        # data, or at least 10 points (this may need to be adjusted to prevent
+        # a buffer overrun)
+        points_per_channel = max(int(rate * buffer_size_seconds), 10)
+
+        # Some hardware requires that the total_count is an integer multiple
+        # of the packet size. For this case, calculate a points_per_channel
+        # that is equal to or just above the points_per_channel selected
+        # which matches that requirement.
+        if ai_info.packet_size != 1:
+            packet_size = ai_info.packet_size
+            remainder = points_per_channel % packet_size
+            if remainder != 0:
+                points_per_channel += packet_size - remainder
+
+        self.ul_buffer_count = points_per_channel * self.num_chans
+
+        # When handling the buffer, we will read 1/chunks_per_buffer of the
+        # buffer at a time, rounded to whole points of all channels
+        self.write_chunk_size = (max(points_per_channel // chunks_per_buffer,
+                                     1) * self.num_chans)
+
+        self.ai_range = ai_info.supported_ranges[0]
+
+        self.conversion = None
+        if raw_counts:
+            if ai_info.resolution > 16:
+                raise Exception('Error: Raw counts are only supported for '
+                                'cards with up to 16 bits')
+            # The voltage of count 0 and of one count, asked for once, so
+            # that the counts can be converted to V later (see
+            # Recording.ScaledRecording)
+            max_count = 2 ** ai_info.resolution - 1
+            v_low = ul.to_eng_units(board_num, self.ai_range, 0)
+            v_high = ul.to_eng_units(board_num, self.ai_range, max_count)
+            self.conversion = (v_low, (v_high - v_low) / max_count)
+            self.memhandle = ul.win_buf_alloc(self.ul_buffer_count)
+        else:
+            self.memhandle = ul.scaled_win_buf_alloc(self.ul_buffer_count)
+
+        # Check if the buffer was successfully allocated
+        if not self.memhandle:
+            raise Exception('Failed to allocate memory')
+
+        # numpy views of the UL buffer, so the data can be taken out of it
+        # directly (see Ring_Buffer.py)
+        self.ring = RingBuffer(self.memhandle, self.ul_buffer_count,
+                               self.num_chans,
+                               c_ushort if raw_counts else c_double)
+        # The chunks are copied into arrays that are used again once they
+        # are written, instead of allocating a new one for every chunk
+        self.pool = ChunkPool((self.write_chunk_size // self.num_chans,
+                               self.num_chans), self.ring.array.dtype)
+
+        self.status = Status.IDLE
+        self.curr_count = 0
+        self.prev_count = 0
+        self.prev_index = 0
+        self.overrun = False
+        self.start_time = None
+
+    def start(self):
+        """Starts the scan and waits until it is running. A scan that was
+        stopped can be started again, e.g. for the next run of a batch."""
+        self.status = Status.IDLE
+        self.curr_count = 0
+        self.prev_count = 0
+        self.prev_index = 0
+        self.overrun = False
+
+        scan_options = ScanOptions.BACKGROUND | ScanOptions.CONTINUOUS
+        if not self.raw_counts:
+            scan_options |= ScanOptions.SCALEDATA
+        ul.a_in_scan(
+            self.board_num, self.low_chan, self.high_chan,
+            self.ul_buffer_count, self.rate, self.ai_range, self.memhandle,
+            scan_options)
+        self.start_time = perf_counter()
+
+        # Wait for the scan to start fully
+        while self.status == Status.IDLE:
+            self.status, _, _ = ul.get_status(self.board_num,
+                                              FunctionType.AIFUNCTION)
+
+    def read_chunk(self):
+        """Copies the next chunk out of the UL buffer (in one go, see
+        Ring_Buffer.py) into an array of self.pool.
+
+        Returns
+        -------
+        numpy.ndarray or None
+            The chunk, shape (points, channels), or None if no full chunk is
+            there yet or a buffer overrun occurred (see self.overrun). Give
+            it back to self.pool once it is not needed anymore.
+        """
+        # Get the latest counts
+        self.status, curr_count, _ = ul.get_status(self.board_num,
+                                                   FunctionType.AIFUNCTION)
+        self.curr_count = curr_count
+
+        new_data_count = curr_count - self.prev_count
+
+        # Check for a buffer overrun before copying the data, so
+        # that no attempts are made to copy more than a full buffer
+        # of data
+        if new_data_count > self.ul_buffer_count:
+            self._stop_overrun()
+            return None
+
+        # Check if a chunk is available
+        if new_data_count <= self.write_chunk_size:
+            return None
+
+        # Copy the chunk straight out of the UL buffer. If it wraps around
+        # the end of the buffer, the two parts are joined here.
+        chunk = self.ring.copy_to(self.prev_index, self.write_chunk_size,
+                                  self.pool.take())
+
+        # Check for a buffer overrun just after copying the data
+        # from the UL buffer. This will ensure that the data was
+        # not overwritten in the UL buffer before the copy was
+        # completed. This should be done before writing to the
+        # file, so that corrupt data does not end up in it.
+        self.status, curr_count, _ = ul.get_status(self.board_num,
+                                                   FunctionType.AIFUNCTION)
+        if curr_count - self.prev_count > self.ul_buffer_count:
+            self.pool.give_back(chunk)
+            self._stop_overrun()
+            return None
+
+        # Increment prev_count by the chunk size
+        self.prev_count += self.write_chunk_size
+        # Increment prev_index by the chunk size and wrap it to the size of
+        # the UL buffer
+        self.prev_index += self.write_chunk_size
+        self.prev_index %= self.ul_buffer_count
+
+        return chunk
+
+    def time_to_next_chunk(self):
+        """How long (in s) it takes until the next chunk is ready, estimated
+        from the count of the last read_chunk() call. 0 if it is ready."""
+        missing = self.write_chunk_size + 1 - (self.curr_count
+                                               - self.prev_count)
+        if missing <= 0:
+            return 0
+        # The count only grows in whole packets
+        missing += -missing % self.packet_size
+        return missing / self.num_chans / self.rate
+
+    @property
+    def points_read(self):
+        """How many points (per channel) have been copied out so far."""
+        return self.prev_count // self.num_chans
+
+    def _stop_overrun(self):
+        # Print an error and stop the scan
+        ul.stop_background(self.board_num, FunctionType.AIFUNCTION)
+        print('\nA buffer overrun occurred on board ' + str(self.board_num))
+        self.overrun = True
+
+    def stop(self):
+        ul.stop_background(self.board_num, FunctionType.AIFUNCTION)
+
+    def free(self):
+        if self.memhandle:
+            # Free the buffer to prevent a memory leak.
+            ul.win_buf_free(self.memhandle)
+            self.memhandle = None
+        if self.use_device_detection:
+            ul.release_daq_device(self.board_num)
+
+
+def prepare_record_file(parent_dir, file_name, file_format='csv'):
+    """Creates a folder with todays date in parent_dir and returns the path
+    of the file to record to. If the file already exists, you are asked
+    whether it should be overwritten."""
+    now = datetime.now()
+    date_time = now.strftime('%Y%m%d')
+    path = os.path.join(parent_dir, date_time)
+
+    # Create directory of todays date
+    os.makedirs(path, exist_ok=True)
+
+    # Binary recordings are stored in a .bin file (plus a .json file)
+    record_file = os.path.join(path, file_name)
+    if file_format in ('binary', 'counts'):
+        record_file = str(Path(record_file).with_suffix('.bin'))
+
+    # Check, if file is already present
+    if os.path.exists(record_file):
+        answer = input('File already exists, it will be overwritten! '
+                       'Continue anyway? \n(y/n) ')
+
+        if answer.lower().startswith("y"):
+            print('\n')
+            print('Alright, as you like.')
+            print('\n')
+
+        elif answer.lower().startswith("n"):
+            print('\n')
+            print('Next time better change the name!')
+            print('\n')
+            exit()
+    return record_file
+
+
+def run_acquisition(boards, rate, input_scan_time, record_file,
+                    file_format='csv', buffer_size_seconds=2,
+                    writer_queue_chunks=100, use_device_detection=False,
+                    chunks_per_buffer=10, poll_interval=0.001, on_start=None,
+                    board_scans=None, stats=None, on_chunk=None):
+    """Records all boards at the same rate into one file.
+
+    Parameters
+    ----------
+    boards : list of tuple
+        (board_num, low_chan, high_chan) for every board.
+    rate : int
+        Scan rate (in Hz) of all boards.
+    input_scan_time : float
+        How long (in s) the boards are recorded at most.
+    record_file : str
+        The file to record to, see prepare_record_file().
+    file_format : str, optional
+        'csv', 'binary' or 'counts' (raw counts, see Recording.py). Default
+        is 'csv'.
+    buffer_size_seconds : float, optional
+        The size of the UL buffers, in seconds. Default is 2s.
+    writer_queue_chunks : int, optional
+        How many chunks can wait to be written to the file, if the disk is
+        slower than the cards for a while. Default is 100.
+    use_device_detection : bool, optional
+        Detect the devices instead of using the ones configured in Instacal.
+    chunks_per_buffer : int, optional
+        How many chunks the UL buffers are read in, see BoardScan. Default
+        is 10.
+    poll_interval : float, optional
+        When no chunk is ready, the loop sleeps until the next one is
+        expected and, if it is late, checks again every poll_interval (in s).
+        Larger values wake the CPU up less often, but the data can wait up
+        to poll_interval longer in the UL buffer. 0 checks again right away
+        (keeps one CPU core busy). Default is 1ms.
+    on_start : callable, optional
+        Called right after all scans have started, e.g. to start the output
+        (see Experiment.py). It may return the time (perf_counter()) at
+        which the recording should end, if that is before input_scan_time.
+    board_scans : list of BoardScan, optional
+        Scans of boards from an earlier run to use again, instead of setting
+        up the boards and their UL buffers anew (see Batch_Runner.py). They
+        have to match boards, rate and file_format (raw_counts for 'counts')
+        and are not freed at the end.
+    stats : dict, optional
+        If given, it is filled with how the recording went: overrun, error,
+        points_written, wall_time and cpu_time (in s, from the start of the
+        scans until everything is written), start_times (perf_counter() of
+        the start of every board), wakeups (how often the loop
+        slept), empty_polls (how often a board had no chunk), queue_full and
+        latencies (for every chunk, the time in s from when its last point
+        was measured until it was in the file). Used by
+        Benchmark_Acquisition.py.
+    on_chunk : callable or list of callable, optional
+        Called with every block of points (shape (points, channels)) right
+        after it was handed to the file writer, e.g. RunningPSD.update (see
+        Spectral_Analysis.py) or LiveMonitor.update (see Live_Monitor.py), in
+        V also for 'counts'. It has to be quick, the cards are not read while
+        it runs. The block is used again for later points, so copy what
+        you keep of it.
+
+    Returns
+    -------
+    data : numpy.ndarray or numpy.memmap
+        The recording, shape (points, channels). For 'binary', this is the
+        memmap of the file, for 'counts' the file as ScaledRecording (see
+        Recording.py), for 'csv' the file as CSVRecording (read from the
+        file when it is indexed, see Recording.py). Nothing is kept in
+        memory.
+    channel_names : list of str
+        The names of the columns of data.
+    """
+    total_points = int(input_scan_time * rate)
+    raw_counts = file_format == 'counts'
+    if on_chunk is None:
+        on_chunk = []
+    elif callable(on_chunk):
+        on_chunk = [on_chunk]
+    print('Scan time = ' + str(input_scan_time) + 's')
+    print('Expect ' + str(total_points) + ' data points per channel')
+
+    scans = []
+    points_written = 0
+    channel_names = []
+    try:
+        if board_scans is not None:
+            scans = list(board_scans)
+        else:
+            for board_num, low_chan, high_chan in boards:
+                scans.append(BoardScan(board_num, low_chan, high_chan, rate,
+                                       buffer_size_seconds,
+                                       use_device_detection,
+                                       chunks_per_buffer, raw_counts))
+        if any(scan.raw_counts != raw_counts for scan in scans):
+            raise Exception('Error: The scans of the boards do not match '
+                            'file_format "' + str(file_format) + '"')
+        if on_start is None:
+            print('NOW you can close the output window to start the '
+                  'experiment.\n')
+
+        # With one board, the columns are named as before. With several, the
+        # board is added to the name.
+        if len(scans) == 1:
+            channel_names = ['Channel ' + str(chan_num) for chan_num
+                             in range(scans[0].low_chan, scans[0].high_chan + 1)]
+        else:
+            channel_names = ['Board' + str(scan.board_num) + ' Channel '
+                             + str(chan_num) for scan in scans
+                             for chan_num in range(scan.low_chan,
+                                                   scan.high_chan + 1)]
+
+        # Create a file for storing the data. It is written in a separate
+        # thread, the loop below only copies the data out of the UL buffers.
+        board_nums = [scan.board_num for scan in scans]
+        scale = None
+        if raw_counts:
+            # How to convert the counts of every column to V, stored once
+            # with the recording
+            column_offset = np.concatenate([np.full(scan.num_chans,
+                                                    scan.conversion[0])
+                                            for scan in scans])
+            column_lsb = np.concatenate([np.full(scan.num_chans,
+                                                 scan.conversion[1])
+                                         for scan in scans])
+            scale = (column_offset, column_lsb)
+        sink = open_sink(file_format, record_file, channel_names, rate,
+                         scans[0].ai_range,
+                         board_nums[0] if len(scans) == 1 else board_nums,
+                         scale)
+        with BackgroundWriter(sink, writer_queue_chunks) as writer:
+            # Start the scans one after the other
+            cpu_start = process_time()
+            for scan in scans:
+                scan.start()
+            start_offsets = [scan.start_time - scans[0].start_time
+                             for scan in scans]
+            for scan, start_offset in zip(scans, start_offsets):
+                print('Board ' + str(scan.board_num) + ' started after '
+                      + '{:.4f}'.format(start_offset) + 's')
+            if hasattr(sink, 'meta'):
+                sink.meta['start_offsets'] = start_offsets
+
+            if on_start is not None:
+                end_time = on_start()
+                if end_time is not None:
+                    end_points = int(np.ceil((end_time - scans[0].start_time)
+                                             * rate))
+                    total_points = min(total_points, end_points)
+
+            print('Writing data to ' + record_file, end='')
+
+            # Chunks of each board that have not been written yet, because
+            # another board is not that far yet
+            pending = [[] for scan in scans]
+            wakeups = 0
+            empty_polls = 0
+            while True:
+                got_chunk = False
+                for scan, board_pending in zip(scans, pending):
+                    if scan.points_read >= total_points:
+                        continue
+                    chunk = scan.read_chunk()
+                    if chunk is not None:
+                        board_pending.append(chunk)
+                        got_chunk = True
+                    else:
+                        empty_polls += 1
+
+                if any(scan.overrun for scan in scans):
+                    break
+
+                # Write the points that all boards have already delivered,
+                # side by side
+                num_points = min(sum(len(c) for c in board_pending)
+                                 for board_pending in pending)
+                num_points = min(num_points, total_points - points_written)
+                if num_points > 0:
+                    points_written += num_points
+                    # The time when the last of these points was measured
+                    # (by the board that started last)
+                    measured = (scans[-1].start_time
+                                + points_written / rate)
+                    if (len(scans) == 1 and len(pending[0]) == 1
+                            and len(pending[0][0]) == num_points):
+                        # The usual case: one whole chunk of one board. It
+                        # is handed to the writer without copying and goes
+                        # back to the pool once it is written.
+                        combined = pending[0][0]
+                        pending[0] = []
+                        writer.write(combined.ravel(), measured, copy=False,
+                                     release=partial(scans[0].pool.give_back,
+                                                     combined))
+                    else:
+                        pending_chunks = list(pending)
+                        combined = []
+                        for i, board_pending in enumerate(pending):
+                            if len(board_pending) == 1:
+                                board_data = board_pending[0]
+                            else:
+                                board_data = np.concatenate(board_pending)
+                            combined.append(board_data[:num_points])
+                            # The rest is copied, so that the chunks can go
+                            # back to the pool
+                            pending[i] = [board_data[num_points:].copy()]
+                        if len(combined) == 1:
+                            combined = combined[0].copy()
+                        else:
+                            combined = np.hstack(combined)
+                        for scan, board_pending in zip(scans, pending_chunks):
+                            for chunk in board_pending:
+                                if chunk.shape == scan.pool.shape:
+                                    scan.pool.give_back(chunk)
+                        writer.write(combined.ravel(), measured, copy=False)
+                    if on_chunk:
+                        if raw_counts:
+                            # In V, like the values of the other formats
+                            combined = column_offset + combined * column_lsb
+                        for callback in on_chunk:
+                            callback(combined)
+                    print('.', end='')
+
+                if all(scan.points_read >= total_points
+                       or scan.status == Status.IDLE for scan in scans):
+                    break
+                if not got_chunk:
+                    # Sleep until the next chunk of any board is expected,
+                    # but at least poll_interval
+                    if poll_interval > 0:
+                        wait = min(scan.time_to_next_chunk() for scan in scans
+                                   if scan.points_read < total_points)
+                        sleep(max(wait, poll_interval))
+                    else:
+                        sleep(0)
+                    wakeups += 1
+
+            for scan in scans:
+                scan.stop()
+
+        wall_time = perf_counter() - scans[0].start_time
+        cpu_time = process_time() - cpu_start
+        print('Loop: ' + str(wakeups) + ' wakeups ('
+              + '{:.0f}'.format(wakeups / wall_time) + '/s), '
+              + str(empty_polls) + ' polls without a chunk, CPU '
+              + '{:.0f}'.format(100 * cpu_time / wall_time) + '% of one core')
+        if stats is not None:
+            stats.update(wall_time=wall_time, cpu_time=cpu_time,
+                         start_times=[scan.start_time for scan in scans],
+                         wakeups=wakeups, empty_polls=empty_polls,
+                         queue_full=writer.num_full, latencies=writer.lags)
+        for scan in scans:
+            print('Board ' + str(scan.board_num) + ': '
+                  + str(scan.points_read) + ' points read')
+        print(str(points_written) + ' points written')
+    except Exception as e:
+        print('\n', e)
+        if stats is not None:
+            stats['error'] = str(e)
+    finally:
+        print('Done')
+        for scan in scans:
+            if board_scans is None:
+                scan.free()
+            else:
+                # Keep the scans for the next run, but make sure they stopped
+                scan.stop()
+
+    if stats is not None:
+        stats.setdefault('error', None)
+        stats['overrun'] = any(scan.overrun for scan in scans)
+        stats['points_written'] = points_written
+    if file_format in ('binary', 'counts'):
+        data, meta = open_recording(record_file)
+    elif points_written > 0:
+        data = CSVRecording(record_file, points_written,
+                            sum(scan.num_chans for scan in scans))
+    else:
+        data = np.zeros((0, sum(scan.num_chans for scan in scans)))
+    return data, channel_names
+
+
+def plot_recording(data, rate, channel_names, title, FFT=False,
+                   board_name='', psd=None):
+    """Plots the recording and, if FFT is True, the power spectral density
+    of all channels (see Spectral_Analysis.py).
+
+    If psd (a Spectral_Analysis.RunningPSD that was updated while
+    recording) is given, its spectrum is plotted instead of calculating it
+    from data again.
+
+    Long recordings are decimated (see Decimation.py), so that they are
+    plotted within seconds.
+    """
+    time, values = envelope(data, rate)
+
+    plt.figure()
+    for chan, name in enumerate(channel_names):
+        plt.plot(time, values[:, chan], label = name)
+    plt.title(title)
+    plt.xlabel('Time (s)')
+    plt.ylabel('Voltage (V)')
+    plt.legend(loc = 6)
+
+    if FFT == True and len(data) > 1:
+        if psd is not None and psd.psd is not None:
+            freqs, power = psd.freqs, psd.psd
+        else:
+            freqs, power = welch_psd(data, rate)
+        if board_name:
+            psd_title = 'PSD (' + board_name + ')'
+        else:
+            psd_title = 'PSD'
+        plot_psd(freqs, power, channel_names, psd_title, max_freq=25)
+
+    plt.show()
+
+
+class RecordingMonitors:
+    """The spectrum (FFT) and live plot that are updated with every chunk
+    while recording, see run_acquisition(on_chunk=...).
+
+    Used as a context manager, so that the live plot is closed even if the
+    recording fails::
+
+        with RecordingMonitors(rate, FFT, live_plot) as monitors:
+            data, channel_names = run_acquisition(
+                ..., on_chunk=monitors.on_chunk)
+        plot_recording(data, rate, channel_names, title, FFT,
+                       psd=monitors.psd)
+
+    Parameters
+    ----------
+    rate : int
+        Rate of the recording (in Hz).
+    FFT : bool, optional
+        Calculate the spectrum while recording (see
+        Spectral_Analysis.RunningPSD). Default is False.
+    live_plot : bool, optional
+        Show the last seconds of all channels while recording (see
+        Live_Monitor.py). Default is False.
+    live_seconds : float, optional
+        How many seconds the live plot shows. Default is 10s.
+    """
+
+    def __init__(self, rate, FFT=False, live_plot=False, live_seconds=10):
+        self.rate = rate
+        self.FFT = FFT
+        self.live_plot = live_plot
+        self.live_seconds = live_seconds
+        self.psd = None
+        self.monitor = None
+        self.on_chunk = []
+
+    def __enter__(self):
+        if self.FFT:
+            self.psd = RunningPSD(self.rate)
+            self.on_chunk.append(self.psd.update)
+        if self.live_plot:
+            self.monitor = LiveMonitor(self.rate, self.live_seconds)
+            self.on_chunk.append(self.monitor.update)
+        return self
+
+    def __exit__(self, *exc):
+        if self.monitor:
+            self.monitor.close()
+        return False
+
+
+def record_boards(boards, rate, input_scan_time, parent_dir, file_name,
+                  file_format='csv', FFT=False, live_plot=False,
+                  live_seconds=10, buffer_size_seconds=2,
+                  writer_queue_chunks=100):
+    """Records the boards into a file in a folder with todays date and plots
+    the recording, as done by Input_Board_0.py, Input_Board_1.py and
+    Input_Boards.py.
+
+    Parameters
+    ----------
+    boards : list of tuple
+        (board_num, low_chan, high_chan) for every board.
+    rate : int
+        Scan rate (in Hz) of all boards.
+    input_scan_time : float
+        How long (in s) the boards are recorded at most.
+    parent_dir : pathlib.Path
+        The folder, in which the folder with todays date is created.
+    file_name : str
+        The name of the file, see prepare_record_file().
+    file_format : str, optional
+        'csv', 'binary' or 'counts', see run_acquisition(). Default is
+        'csv'.
+    FFT, live_plot, live_seconds : optional
+        See RecordingMonitors.
+    buffer_size_seconds, writer_queue_chunks : optional
+        See run_acquisition().
+
+    Returns
+    -------
+    data : numpy.ndarray, numpy.memmap or Recording.CSVRecording
+        The recording, see run_acquisition().
+    channel_names : list of str
+        The names of the channels.
+    """
+    record_file = prepare_record_file(parent_dir, file_name, file_format)
+
+    with RecordingMonitors(rate, FFT, live_plot, live_seconds) as monitors:
+        data, channel_names = run_acquisition(
+            boards, rate, input_scan_time, record_file, file_format,
+            buffer_size_seconds, writer_queue_chunks,
+            on_chunk=monitors.on_chunk)
+
+    board_names = ', '.join('Board ' + str(board[0]) for board in boards)
+    # With several boards, the board is already part of the channel names
+    plot_recording(data, rate, channel_names,
+                   'Input of ' + board_names + ' / Output of Reservoir', FFT,
+                   board_names if len(boards) == 1 else '',
+                   psd=monitors.psd)
+    return data, channel_names
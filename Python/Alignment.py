@@ -0,0 +1,404 @@
+# This script finds out when the stimulus started in a recording, e.g. for recordings made with the output and input
+# scripts in two terminals, where the delay between them is unknown. It works for any rate of stimulus and recording
+# (e.g. a stimulus at 100Hz and Board0 recorded at 500Hz) and for every board separately.
+#
+# Both are resampled to the lower of the two rates (see Resampling.py) and compared by cross-correlation, calculated
+# with FFTs for all channels at once. The peak of the correlation gives the lag, refined to a fraction of a point by
+# a parabola through the peak and its neighbours. Only the part of the recording where the stimulus is expected is
+# read, first for the start of the stimulus (up to max_lag away), then block by block for the rest of it, so that a
+# drift between the clocks of the cards is noticed as well. Blocks that tell nothing about the lag (0V, a periodic
+# stimulus that matches one period later just as well, or the end of the recording) are left out. Memory stays the same
+# for recordings of any length.
+#
+# The result is stored as _aligned.json file next to the recording: where the stimulus starts in it and how many points
+# it lasts. open_aligned() then gives exactly this part of the recording, without copying the file. If the stimulus
+# has a _boundaries.csv file (see Data_Preparation.py), the snippets are also stored as _segments.csv (see Segments.py).
+
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy.fft import rfft, irfft, next_fast_len
+
+try:
+    from Recording import open_recording, read_points, recording_rate, \
+        recording_length, ScaledRecording, SequentialReader
+    from Resampling import resample
+    from Segments import default_boundaries_file, map_segments, \
+        segments_file_for, write_segments
+    from Waveforms import build_stimulus
+except ImportError:
+    from .Recording import open_recording, read_points, recording_rate, \
+        recording_length, ScaledRecording, SequentialReader
+    from .Resampling import resample
+    from .Segments import default_boundaries_file, map_segments, \
+        segments_file_for, write_segments
+    from .Waveforms import build_stimulus
+
+#################################################
+# Insert your parameters here
+
+# The stimulus, as for Batch_Runner.py (see Waveforms.build_stimulus()), e.g. a prepared data file and its rate
+stimulus = {'type': 'data',
+            'file': 'C:/Users/lbongartz/Desktop/Reservoir Computing/Data/Setup_Test/Files_combined.csv',
+            'rate': 100}
+
+# The recordings of the boards (each is aligned on its own)
+recordings = ['C:/Users/lbongartz/Desktop/Reservoir Computing/Data/Setup_Test/Output_Test/20230316/Board0_Test.csv',
+              'C:/Users/lbongartz/Desktop/Reservoir Computing/Data/Setup_Test/Output_Test/20230316/Board1_Test.csv']
+
+max_lag = 30 # How far (in s) the start of the stimulus may be from the start of the recording, at most
+
+block_seconds = 60 # The stimulus is compared with the recording in blocks of this length (in s)
+
+tail = 1 # How long (in s) after the end of the stimulus the aligned recording goes on
+
+#################################################
+
+
+def _standardize(x):
+    x = np.asarray(x, dtype=float).reshape(len(x), -1)
+    x = x - x.mean(axis=0)
+    std = x.std(axis=0)
+    std[std == 0] = 1
+    return x / std
+
+
+def correlation_lag(reference, signal, lag_range=None, signs=None):
+    """The lag (in points) at which signal matches reference best, i.e.
+    signal[lag + n] is most similar to reference[n].
+
+    Every channel of signal is compared with every channel of reference, by
+    their correlation coefficient over the points where both overlap. The
+    reservoir may invert a channel, so without signs the sign of the
+    coefficients does not matter; with signs (e.g. from the start of the
+    stimulus), an inverted match counts against a lag. The lag is refined to
+    a fraction of a point with a parabola through the peak and its
+    neighbours.
+
+    Parameters
+    ----------
+    reference, signal : numpy.ndarray
+        Shape (points, channels), at the same rate.
+    lag_range : tuple of int, optional
+        The smallest and largest lag to consider. Default is all lags at
+        which at least half of the shorter one overlaps the other.
+    signs : numpy.ndarray, optional
+        The expected sign (1 or -1) of the correlation of every pair of
+        channels, shape (reference channels, signal channels).
+
+    Returns
+    -------
+    lag : float
+        The lag (in points). NaN if the best match is on the edge of the
+        lags considered (the real one is probably outside of them) or if
+        another lag, away from the peak, matches almost as well (less than
+        10% more mismatch), e.g. a periodic signal shifted by a period.
+    correlation : float
+        How well they match at this lag: without signs the RMS of the
+        correlation coefficients of all channel pairs (0 to 1), with signs
+        their mean times the sign (-1 to 1).
+    signs : numpy.ndarray
+        The sign of the correlation of every pair of channels at this lag
+        (signs, if given).
+    """
+    reference = _standardize(reference)
+    signal = _standardize(signal)
+    num_ref, num_sig = len(reference), len(signal)
+    n = next_fast_len(num_sig + num_ref - 1)
+    signal_fft = rfft(signal, n, axis=0)
+    reference_fft = np.conj(rfft(reference, n, axis=0))
+
+    # The points of reference (first to last, excluded) that overlap signal
+    lags = np.arange(-(num_ref - 1), num_sig)
+    first = np.maximum(-lags, 0)
+    last = np.minimum(num_ref, num_sig - lags)
+    valid = last - first >= max(min(num_ref, num_sig) // 2, 1)
+    if lag_range is not None:
+        valid &= (lags >= lag_range[0]) & (lags <= lag_range[1])
+    lags, first, last = lags[valid], first[valid], last[valid]
+    if len(lags) == 0:
+        raise Exception('Error: No lag to compare')
+
+    # The energy of both over the overlap, for the correlation coefficients
+    reference_energy = np.cumsum(np.vstack((np.zeros(reference.shape[1]),
+                                            reference**2)), axis=0)
+    signal_energy = np.cumsum(np.vstack((np.zeros(signal.shape[1]),
+                                         signal**2)), axis=0)
+    reference_energy = reference_energy[last] - reference_energy[first]
+    signal_energy = signal_energy[lags + last] - signal_energy[lags + first]
+    num_pairs = reference.shape[1] * signal.shape[1]
+    score = np.zeros(len(lags))
+    for chan in range(reference.shape[1]):
+        corr = irfft(signal_fft * reference_fft[:, [chan]], n, axis=0)
+        # Index k of corr is the lag k, the end of it the negative lags
+        corr = corr[lags % n]
+        norm = np.sqrt(reference_energy[:, [chan]] * signal_energy)
+        coefficients = np.divide(corr, norm, out=np.zeros_like(corr),
+                                 where=norm > 0)
+        if signs is None:
+            score += (coefficients**2).sum(axis=1)
+        else:
+            score += (coefficients * signs[chan]).sum(axis=1)
+    score /= num_pairs
+
+    peak = int(np.argmax(score))
+    if signs is None:
+        peak_lag = lags[peak]
+        overlap = slice(first[peak], last[peak])
+        corr = (reference[overlap].T
+                @ signal[peak_lag + first[peak]:peak_lag + last[peak]])
+        signs = np.where(corr < 0, -1, 1)
+        correlation = np.sqrt(score[peak])
+    else:
+        correlation = score[peak]
+    # Other lags, outside of the peak, that match almost as well (e.g. a
+    # periodic signal shifted by whole periods)
+    below = score < score[peak] / 2
+    before = np.flatnonzero(below[:peak])
+    after = np.flatnonzero(below[peak:])
+    start = before[-1] + 1 if len(before) else 0
+    end = peak + after[0] if len(after) else len(score)
+    others = np.concatenate((score[:start], score[end:]))
+    ambiguous = (len(others) > 0
+                 and 1 - others.max() < 1.1 * (1 - score[peak]))
+    if peak == 0 or peak == len(score) - 1 or ambiguous:
+        return np.nan, float(correlation), signs
+    before, at, after = score[peak - 1:peak + 2]
+    curvature = before - 2 * at + after
+    shift = 0.5 * (before - after) / curvature if curvature < 0 else 0.
+    return lags[peak] + shift, float(correlation), signs
+
+
+def estimate_lag(values, stimulus_rate, record_file, start_time=0,
+                 search_seconds=60, max_lag=30, guess=0, signs=None,
+                 reader=None):
+    """The time (in s) in the recording at which the stimulus started.
+
+    Only the part of the stimulus from start_time to start_time +
+    search_seconds is compared, with the part of the recording where it is
+    expected (guess + start_time, up to max_lag earlier or later). Only this
+    part of the recording is read.
+
+    Parameters
+    ----------
+    values : numpy.ndarray
+        The stimulus, shape (points, channels).
+    stimulus_rate : int
+        Rate of the stimulus (in Hz).
+    record_file : str or Path
+        The recording (.bin or .csv).
+    start_time : float, optional
+        Where to start in the stimulus (in s). Default is 0.
+    search_seconds : float, optional
+        How much of the stimulus to compare (in s). Default is 60s.
+    max_lag : float, optional
+        How far (in s) the lag may be from guess. Default is 30s.
+    guess : float, optional
+        The expected lag (in s). Default is 0.
+    signs : numpy.ndarray, optional
+        The expected sign of the correlation of every pair of channels, see
+        correlation_lag().
+    reader : Recording.SequentialReader, optional
+        Reads the recording, to compare several parts one after the other
+        without reading a .csv file from its start every time. By default,
+        only this part is read from the file.
+
+    Returns
+    -------
+    lag : float
+        The lag (in s). NaN if it cannot be told, see correlation_lag().
+    correlation : float
+        How well they match, see correlation_lag().
+    signs : numpy.ndarray
+        The sign of the correlation of every pair of channels, see
+        correlation_lag().
+    """
+    record_rate = recording_rate(record_file)
+    common_rate = min(stimulus_rate, record_rate)
+    reference = values[int(start_time * stimulus_rate):
+                       int((start_time + search_seconds) * stimulus_rate)]
+    reference = resample(reference, stimulus_rate, common_rate)
+
+    window_start = max(int(np.floor((start_time + guess - max_lag)
+                                    * record_rate)), 0)
+    window_end = int(np.ceil((start_time + guess + search_seconds + max_lag)
+                             * record_rate))
+    if reader is None:
+        reader = SequentialReader(record_file)
+    window = reader.read(window_start, window_end - window_start)
+    if len(window) == 0:
+        raise Exception('Error: ' + str(record_file) + ' is shorter than '
+                        + str(window_start / record_rate) + 's')
+    window = resample(window, record_rate, common_rate)
+    window_time = window_start / record_rate
+
+    # The lags (in points of the window) up to max_lag away from guess
+    expected = (start_time + guess - window_time) * common_rate
+    lag_range = (int(np.floor(expected - max_lag * common_rate)),
+                 int(np.ceil(expected + max_lag * common_rate)))
+    points, correlation, signs = correlation_lag(reference, window,
+                                                 lag_range, signs)
+    return (window_time + points / common_rate - start_time, correlation,
+            signs)
+
+
+def estimate_lags(values, stimulus_rate, record_file, max_lag=30,
+                  block_seconds=60, fine_lag=1, search_seconds=60):
+    """Estimates the lag from the start of the stimulus and then checks it
+    block by block over the whole stimulus.
+
+    Every step reads only one block of the recording, so memory does not
+    grow with the length of the recording, and .csv recordings are read
+    only once from start to end (see Recording.SequentialReader). The signs of the correlations
+    found at the start are kept for all blocks, so that an inverted match
+    (e.g. half a period away in a periodic stimulus) is not taken for the
+    lag.
+
+    Parameters
+    ----------
+    values : numpy.ndarray
+        The stimulus, shape (points, channels).
+    stimulus_rate : int
+        Rate of the stimulus (in Hz).
+    record_file : str or Path
+        The recording (.bin or .csv).
+    max_lag : float, optional
+        How far (in s) the start of the stimulus may be from the start of the
+        recording. Default is 30s.
+    block_seconds : float, optional
+        Length of the blocks (in s). Default is 60s.
+    fine_lag : float, optional
+        How far (in s) the lag of a block may be from the lag of the start.
+        Default is 1s.
+    search_seconds : float, optional
+        How much of the start of the stimulus (in s) is used to find the
+        lag of the start. Default is 60s.
+
+    Returns
+    -------
+    lag : float
+        The lag (in s) of the start of the stimulus: the median of the lags
+        of all valid blocks.
+    blocks : pandas.DataFrame
+        start_time, lag, correlation and valid of every block. Blocks of 0V,
+        blocks whose lag is on the edge of the lags allowed and blocks that
+        were not recorded completely are not valid, they tell nothing about
+        the lag.
+    """
+    duration = len(values) / stimulus_rate
+    reader = SequentialReader(record_file)
+    lag, _, signs = estimate_lag(values, stimulus_rate, record_file, 0,
+                                 min(search_seconds, duration), max_lag,
+                                 reader=reader)
+    if np.isnan(lag):
+        raise Exception('Error: The start of the stimulus was not found '
+                        'within ' + str(max_lag) + 's of the start of '
+                        + str(record_file))
+    record_seconds = recording_length(record_file) / recording_rate(
+        record_file)
+    rows = []
+    for start_time in np.arange(0, duration, block_seconds):
+        seconds = min(block_seconds, duration - start_time)
+        # All lags allowed must have the whole block in the recording
+        if (lag + start_time - fine_lag < 0
+                or lag + start_time + seconds + fine_lag > record_seconds):
+            rows.append({'start_time': start_time, 'lag': np.nan,
+                         'correlation': np.nan, 'valid': False})
+            continue
+        block_lag, correlation, _ = estimate_lag(
+            values, stimulus_rate, record_file, start_time, seconds,
+            fine_lag, lag, signs, reader)
+        rows.append({'start_time': start_time, 'lag': block_lag,
+                     'correlation': correlation,
+                     'valid': bool(correlation > 0
+                                   and not np.isnan(block_lag))})
+    blocks = pd.DataFrame(rows)
+    if blocks['valid'].any():
+        lag = float(np.median(blocks['lag'][blocks['valid']]))
+    return lag, blocks
+
+
+def aligned_file_for(record_file):
+    """The _aligned.json file next to a recording."""
+    record_file = Path(record_file)
+    return record_file.with_name(record_file.stem + '_aligned.json')
+
+
+def write_aligned(record_file, lag, duration):
+    """Stores which part of the recording belongs to the stimulus (from lag
+    for duration seconds) in its _aligned.json file and returns it."""
+    rate = recording_rate(record_file)
+    start = int(round(lag * rate))
+    aligned = {
+        'record_file': Path(record_file).name,
+        'rate': rate,
+        'lag': float(lag),
+        'start': max(start, 0),
+        'num_points': int(round(duration * rate)) + min(start, 0),
+        # Points at the start of the stimulus that were not recorded
+        'missing_points': max(-start, 0),
+    }
+    with open(aligned_file_for(record_file), 'w') as f:
+        json.dump(aligned, f, indent=4)
+    return aligned
+
+
+def open_aligned(record_file):
+    """The part of a recording that belongs to the stimulus, as stored by
+    write_aligned().
+
+    Returns
+    -------
+    data : numpy.ndarray, numpy.memmap or Recording.ScaledRecording
+        Shape (points, channels). For binary recordings a memory-mapped view
+        of the file, nothing is copied.
+    aligned : dict
+        The content of the _aligned.json file.
+    """
+    with open(aligned_file_for(record_file)) as f:
+        aligned = json.load(f)
+    start, num_points = aligned['start'], aligned['num_points']
+    if Path(record_file).suffix == '.bin':
+        data, _ = open_recording(record_file)
+        if isinstance(data, ScaledRecording):
+            return data.rows(start, start + num_points), aligned
+        return data[start:start + num_points], aligned
+    return read_points(record_file, start, num_points), aligned
+
+
+def run_example():
+    values, rate = build_stimulus(stimulus)
+    duration = len(values) / rate
+    boundaries_file = None
+    if stimulus['type'] == 'data':
+        boundaries_file = default_boundaries_file(stimulus['file'])
+
+    for record_file in recordings:
+        print('\n' + str(record_file))
+        lag, blocks = estimate_lags(values, rate, record_file, max_lag,
+                                    block_seconds)
+        print('The stimulus starts ' + '{:.4f}'.format(lag) + 's after the '
+              'start of the recording')
+        print(blocks.to_string(index=False))
+        valid = blocks[blocks['valid']]
+        if len(valid) > 1:
+            print('Drift over the stimulus: '
+                  + '{:.4f}'.format(valid['lag'].iloc[-1]
+                                    - valid['lag'].iloc[0]) + 's')
+        aligned = write_aligned(record_file, lag, duration + tail)
+        print('Aligned recording: points ' + str(aligned['start']) + ' to '
+              + str(aligned['start'] + aligned['num_points'])
+              + ', stored in ' + str(aligned_file_for(record_file)))
+
+        if boundaries_file is not None and boundaries_file.exists():
+            segments = map_segments(pd.read_csv(boundaries_file),
+                                    aligned['rate'], lag,
+                                    recording_length(record_file))
+            write_segments(segments, record_file, lag, boundaries_file)
+            print('Segments stored in ' + str(segments_file_for(record_file)))
+
+
+if __name__ == '__main__':
+    run_example()
@@ -0,0 +1,177 @@
+# This script runs many experiments (see Run_Experiment.py) back to back, e.g. hundreds of utterances or a sweep over
+# function parameters over night. Every run outputs its stimulus and stores its own recording (plus _run.json file)
+# in one folder per batch. There are no plots and no questions, so it can run unattended.
+#
+# The cards are set up only once for the whole batch: the device detection, the UL buffers of the recording and the
+# buffer of the output are kept and reused by every run (the output buffer only grows if a run is longer than all
+# runs before). A summary of all runs is written to batch_summary.csv after every run, so you can see how far it got.
+#
+# If a run fails (e.g. a broken data file), it is noted in the summary and the batch goes on with the next run. With
+# skip_existing = True, runs that were completed before (their _run.json file exists and reports no overrun or error)
+# are skipped, so an aborted batch can simply be restarted. Runs that were aborted during the recording are run again,
+# and the summary of the earlier start is kept and updated.
+
+
+from __future__ import absolute_import, division, print_function
+from builtins import *  # @UnusedWildImport
+
+from datetime import datetime
+import os
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    from DAQ_Backend import DaqDeviceInfo
+    from Acquisition import BoardScan
+    from Experiment import OutputScan, run_experiment
+    from Recording import load_run
+    from Waveforms import build_stimulus
+except ImportError:
+    from .DAQ_Backend import DaqDeviceInfo
+    from .Acquisition import BoardScan
+    from .Experiment import OutputScan, run_experiment
+    from .Recording import load_run
+    from .Waveforms import build_stimulus
+
+#################################################
+# Insert your parameters here
+
+# Which board does the output?
+output_board = 0
+
+# Which boards (as defined in Instacal) and which input channels of them do you record?
+# One line per board: (board number, lowest input channel, highest input channel)
+boards = [(0, 0, 7)]
+
+input_rate = 500 # At what rate the input should be recorded (the same for all runs)
+
+tail = 1 # How long (in s) the recording should go on after the output of each run is over
+
+zero_gap = 0.5 # How long (in s) 0V is output after each stimulus, unless a run sets its own 'zero_gap'
+
+# In which format should the data be stored?
+file_format = 'binary' # 'csv', 'binary' or 'counts', see Input_Board_0.py
+
+# Where should the recordings be stored?
+# In this folder, a folder with todays date and in it a folder named batch_name will be created
+parent_dir = Path('C:/Users/lbongartz/Desktop/Reservoir Computing/Data/Setup_Test/Output_Test')
+batch_name = 'Batch_Test'
+
+skip_existing = True # Skip runs that were already completed in the batch folder
+
+use_device_detection = False # Detect the devices instead of using the ones configured in Instacal
+
+# The runs, one dict per run (see Waveforms.build_stimulus()). 'name' is the name of its recording.
+# Functions, e.g. a sweep over the frequency:
+runs = [{'name': 'sin_' + str(freq) + 'Hz', 'type': 'functions',
+         'functions': ['sin', 'sin', 'sin', 'sin'],
+         'frequencies': [freq, freq, freq, freq],
+         'amplitude': [1, 1, 1, 1],
+         'y_offset': [0, 0, 0, 0],
+         'duty': 0.5,
+         'time': 10,
+         'rate': 500}
+        for freq in [1, 2, 5, 10]]
+
+# Data, e.g. all prepared files of a folder:
+# runs = [{'name': file.stem, 'type': 'data', 'file': str(file), 'rate': 100}
+#         for file in sorted(Path('C:/Users/lbongartz/Desktop/Reservoir Computing/Data/Digits').glob('*.csv'))]
+
+#################################################
+
+
+def run_batch():
+    """Runs all runs and returns the summary (one row per run)."""
+    folder = os.path.join(parent_dir, datetime.now().strftime('%Y%m%d'),
+                          batch_name)
+    os.makedirs(folder, exist_ok=True)
+    suffix = '.csv' if file_format == 'csv' else '.bin'
+    summary_file = os.path.join(folder, 'batch_summary.csv')
+
+    # The rows of an earlier start of the batch, by name of the run
+    rows = {}
+    if os.path.exists(summary_file):
+        for row in pd.read_csv(summary_file).to_dict('records'):
+            rows[row['name']] = row
+
+    scans = []
+    output = None
+    summary = []
+    try:
+        # Set up the cards once for all runs
+        for board_num, low_chan, high_chan in boards:
+            scans.append(BoardScan(board_num, low_chan, high_chan, input_rate,
+                                   use_device_detection=use_device_detection,
+                                   raw_counts=file_format == 'counts'))
+        # As many output channels as the card has, at most 4 (as in
+        # Functions_Output.py)
+        ao_info = DaqDeviceInfo(output_board).get_ao_info()
+        output = OutputScan(output_board, min(4, ao_info.num_chans))
+
+        for run_num, spec in enumerate(runs):
+            name = spec.get('name', 'Run_' + str(run_num))
+            record_file = os.path.join(folder, name + suffix)
+            print('\n' + '#' * 49 + '\nRun ' + str(run_num + 1) + '/'
+                  + str(len(runs)) + ': ' + name)
+
+            if skip_existing and run_completed(record_file):
+                print('Run already completed, skipped')
+                row = rows.get(name, {'name': name, 'status': 'skipped'})
+            else:
+                row = {'name': name}
+                row.update(run_one(spec, record_file, output, scans))
+            summary.append(row)
+            rows[name] = row
+            pd.DataFrame(list(rows.values())).to_csv(summary_file,
+                                                     index=False)
+    finally:
+        for scan in scans:
+            scan.free()
+        if output is not None:
+            output.free()
+
+    num_ok = sum(row['status'] in ('ok', 'skipped') for row in summary)
+    print('\n' + str(num_ok) + ' of ' + str(len(runs)) + ' runs ok, summary '
+          'stored in ' + summary_file)
+    return summary
+
+
+def run_completed(record_file):
+    """Whether the run of record_file was completed: run_experiment() stores
+    the _run.json file only once the recording is over, and it must report
+    no overrun or error."""
+    run_file = Path(record_file)
+    run_file = run_file.with_name(run_file.stem + '_run.json')
+    if not run_file.exists():
+        return False
+    run = load_run(run_file)
+    return not run['overrun'] and not run['error']
+
+
+def run_one(spec, record_file, output, scans):
+    """Runs one experiment with the cards that are already set up and
+    returns its row of the summary."""
+    row = {'status': 'ok'}
+    try:
+        spec = dict(spec)
+        spec.setdefault('zero_gap', zero_gap)
+        values, output_rate = build_stimulus(spec, output.num_chans)
+        data, channel_names, run = run_experiment(
+            output_board, output_rate, values, boards, input_rate,
+            record_file, tail, file_format, run_info=spec, output=output,
+            board_scans=scans)
+        del data
+        row.update(points_written=run['points_written'],
+                   output_start_offset=run['output_start_offset'])
+        if run['overrun'] or run['error']:
+            row['status'] = 'overrun' if run['overrun'] else 'error'
+            row['error'] = run['error']
+    except Exception as e:
+        print('\n', e)
+        row.update(status='error', error=str(e))
+    return row
+
+
+if __name__ == '__main__':
+    run_batch()
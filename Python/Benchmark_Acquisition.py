@@ -0,0 +1,306 @@
+# This script measures how fast the recording of Input_Board_0.py / Input_Boards.py can go, so that rate,
+# buffer_size_seconds and the chunk size don't have to be found by trial and error anymore.
+#
+# For every combination of channel count, chunk size and file format, it runs the real acquisition loop
+# (Acquisition.run_acquisition) at one rate after the other and stops at the first rate at which a buffer overrun
+# occurs, points are missing or the file writer falls behind (its queue was full or a chunk took longer than
+# max_latency to get into the file; the queue hides a slow disk only for a while). For every run it reports the CPU use and the latency of the chunks (how long after
+# its last point was measured a chunk was in the file). The results are stored as .json and .csv file in results_dir,
+# so that they can be compared with earlier results (see compare_file).
+#
+# By default, it runs against the simulated cards (Simulated_DAQ.py), so no card is needed. Note that the simulated
+# cards run in the same process, so their work is included in the CPU use. To measure the real cards, start it with
+# the environment variable RC_DAQ_BACKEND=mcculw.
+
+from __future__ import absolute_import, division, print_function
+from builtins import *  # @UnusedWildImport
+
+from contextlib import redirect_stdout
+from datetime import datetime
+import io
+import json
+import os
+from pathlib import Path
+import platform
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+# Use the simulated cards, unless RC_DAQ_BACKEND says otherwise
+os.environ.setdefault('RC_DAQ_BACKEND', 'simulator')
+
+try:
+    import DAQ_Backend
+    from DAQ_Backend import ul
+    from Acquisition import run_acquisition
+    from Recording import open_recording
+except ImportError:
+    from . import DAQ_Backend
+    from .DAQ_Backend import ul
+    from .Acquisition import run_acquisition
+    from .Recording import open_recording
+
+#################################################
+# Insert your parameters here
+
+# Which rates (in Hz) should be tried, from low to high?
+rates = [1000, 2000, 5000, 10000, 20000, 50000, 100000]
+
+# How many input channels (per board)?
+channel_counts = [1, 4, 8, 16]
+
+# How many boards should be recorded at once?
+num_boards = 1
+
+# In how many chunks should the UL buffer be read? (Input_Board_0.py uses 10)
+chunks_per_buffer_list = [10, 50]
+
+# Which file formats should be tried? 'csv', 'binary' and/or 'counts'
+file_formats = ['csv', 'binary', 'counts']
+
+# How long (in s) should the loop sleep at least when no chunk is ready? Add 0 to compare with checking again
+# right away, larger values mean fewer wakeups but a higher latency (see Acquisition.run_acquisition)
+poll_intervals = [0.001]
+
+input_scan_time = 3 # How long (in s) every single run records
+
+buffer_size_seconds = 2 # Size of the UL buffers (in s), as in Acquisition.py
+
+max_latency = 0.5 # How long (in s) a chunk may take at most to get into the file for the run to be ok
+
+# Where should the results be stored?
+results_dir = 'Benchmark_Results'
+
+# Results of an earlier benchmark (.json file) to compare with, or None
+compare_file = None
+
+# A binary recording (.bin file) that the simulated cards play back instead of the simulated reservoir, or None
+replay_file = None
+
+verbose = False # True prints everything the acquisition prints
+
+#################################################
+
+
+def run_once(rate, num_chans, chunks_per_buffer, file_format, poll_interval,
+             record_dir):
+    """Records once with the given settings and returns what happened.
+
+    Returns
+    -------
+    dict
+        The settings, whether the run was ok (no overrun, no error, all
+        points written, the queue of the writer never full and all latencies
+        from 0 to max_latency), CPU use, wakeups of the loop and latencies.
+    """
+    if hasattr(ul, 'reset'):
+        # No scans or buffers of the run before on the simulated cards
+        ul.reset()
+    boards = [(board_num, 0, num_chans - 1) for board_num in range(num_boards)]
+    record_file = os.path.join(record_dir, 'run.csv')
+    if file_format in ('binary', 'counts'):
+        record_file = str(Path(record_file).with_suffix('.bin'))
+    expected_points = int(input_scan_time * rate)
+
+    stats = {}
+    output = io.StringIO()
+    if verbose:
+        data, _ = run_acquisition(boards, rate, input_scan_time, record_file,
+                                  file_format, buffer_size_seconds,
+                                  chunks_per_buffer=chunks_per_buffer,
+                                  poll_interval=poll_interval, stats=stats)
+    else:
+        with redirect_stdout(output):
+            data, _ = run_acquisition(boards, rate, input_scan_time,
+                                      record_file, file_format,
+                                      buffer_size_seconds,
+                                      chunks_per_buffer=chunks_per_buffer,
+                                      poll_interval=poll_interval,
+                                      stats=stats)
+    # Close the memmap of binary recordings, so the file can be deleted
+    del data
+
+    latencies = np.array(stats.get('latencies', []))
+    wall_time = stats.get('wall_time', 0)
+    cpu_time = stats.get('cpu_time', 0)
+    # A negative latency means the timing of the run is wrong
+    ok = (not stats['overrun'] and stats['error'] is None
+          and stats['points_written'] >= expected_points
+          and stats.get('queue_full', 0) == 0 and len(latencies) > 0
+          and 0 <= latencies.min() and latencies.max() <= max_latency)
+    result = {
+        'file_format': file_format,
+        'num_boards': num_boards,
+        'num_chans': num_chans,
+        'chunks_per_buffer': chunks_per_buffer,
+        'poll_interval': poll_interval,
+        'rate': rate,
+        'ok': ok,
+        'overrun': stats['overrun'],
+        'error': stats['error'],
+        'expected_points': expected_points,
+        'points_written': stats['points_written'],
+        'wall_time': wall_time,
+        'cpu_time': cpu_time,
+        'cpu_percent': 100 * cpu_time / wall_time if wall_time else None,
+        'wakeups': stats.get('wakeups', 0),
+        'wakeups_per_s': (stats.get('wakeups', 0) / wall_time if wall_time
+                          else None),
+        'empty_polls': stats.get('empty_polls', 0),
+        'queue_full': stats.get('queue_full', 0),
+        'num_chunks': len(latencies),
+    }
+    for name, value in [('min', np.min), ('mean', np.mean),
+                        ('p50', np.median),
+                        ('p95', lambda x: np.percentile(x, 95)),
+                        ('max', np.max)]:
+        result['latency_' + name] = (float(value(latencies)) if len(latencies)
+                                     else None)
+    return result
+
+
+def find_max_rate(num_chans, chunks_per_buffer, file_format, poll_interval,
+                  record_dir):
+    """Tries the rates one after the other until a run is not ok.
+
+    Returns
+    -------
+    runs : list of dict
+        The results of run_once() of every rate that was tried.
+    max_rate : int or None
+        The highest rate that was ok, None if not even the first one was.
+    """
+    runs = []
+    max_rate = None
+    for rate in rates:
+        result = run_once(rate, num_chans, chunks_per_buffer, file_format,
+                          poll_interval, record_dir)
+        runs.append(result)
+        print('  ' + str(rate) + 'Hz: ' + ('ok' if result['ok'] else 'FAILED')
+              + ', CPU ' + format_value(result['cpu_percent'], '{:.0f}%')
+              + ', ' + format_value(result['wakeups_per_s'], '{:.0f}')
+              + ' wakeups/s'
+              + ', latency mean ' + format_value(result['latency_mean'],
+                                                 '{:.3f}s')
+              + ' / max ' + format_value(result['latency_max'], '{:.3f}s'))
+        if not result['ok']:
+            break
+        max_rate = rate
+    return runs, max_rate
+
+
+def format_value(value, fmt):
+    return 'n/a' if value is None else fmt.format(value)
+
+
+def summarize(runs, max_rate):
+    """The result of the fastest run that was ok, plus max_rate."""
+    ok_runs = [run for run in runs if run['rate'] == max_rate]
+    summary = dict(ok_runs[0] if ok_runs else runs[0])
+    summary['max_rate'] = max_rate
+    for key in ['rate', 'ok', 'overrun', 'error', 'expected_points',
+                'points_written']:
+        summary.pop(key)
+    return summary
+
+
+def save_results(runs, summaries):
+    """Stores all runs and the summaries as .json file and the runs as .csv
+    file in results_dir. Returns the path of the .json file."""
+    os.makedirs(results_dir, exist_ok=True)
+    now = datetime.now()
+    file = os.path.join(results_dir,
+                        'benchmark_' + now.strftime('%Y%m%d_%H%M%S'))
+    info = {
+        'date': now.isoformat(),
+        'backend': DAQ_Backend.backend,
+        'replay_file': replay_file,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'input_scan_time': input_scan_time,
+        'buffer_size_seconds': buffer_size_seconds,
+        'max_latency': max_latency,
+    }
+    with open(file + '.json', 'w') as f:
+        json.dump({'info': info, 'summary': summaries, 'runs': runs}, f,
+                  indent=4)
+    pd.DataFrame(runs).to_csv(file + '.csv', index=False)
+    return file + '.json'
+
+
+def compare_results(summaries, file):
+    """Prints how the highest rates changed compared to an earlier
+    benchmark."""
+    with open(file) as f:
+        old_summaries = json.load(f)['summary']
+    keys = ['file_format', 'num_boards', 'num_chans', 'chunks_per_buffer',
+            'poll_interval']
+    old_rates = {tuple(s[key] for key in keys): s['max_rate']
+                 for s in old_summaries}
+
+    print('\nCompared to ' + str(file) + ':')
+    for summary in summaries:
+        setting = tuple(summary[key] for key in keys)
+        if setting not in old_rates:
+            continue
+        old_rate = old_rates[setting]
+        new_rate = summary['max_rate']
+        note = ''
+        if (new_rate or 0) < (old_rate or 0):
+            note = '   <-- slower'
+        elif (new_rate or 0) > (old_rate or 0):
+            note = '   <-- faster'
+        print('  ' + describe(summary) + ': ' + str(old_rate) + 'Hz -> '
+              + str(new_rate) + 'Hz' + note)
+
+
+def describe(summary):
+    return (summary['file_format'] + ', ' + str(summary['num_chans'])
+            + ' channel(s) x ' + str(summary['num_boards']) + ' board(s), '
+            + '1/' + str(summary['chunks_per_buffer']) + ' buffer chunks, '
+            + 'poll interval ' + str(summary['poll_interval']) + 's')
+
+
+def run_benchmark():
+    if replay_file is not None:
+        if not hasattr(ul, 'replay'):
+            raise Exception('Error: replay_file only works with the '
+                            'simulated cards')
+        data, _ = open_recording(replay_file)
+        ul.set_reservoir(ul.replay(data))
+
+    runs = []
+    summaries = []
+    with tempfile.TemporaryDirectory() as record_dir:
+        for file_format in file_formats:
+            for num_chans in channel_counts:
+                for chunks_per_buffer in chunks_per_buffer_list:
+                    for poll_interval in poll_intervals:
+                        setting = {'file_format': file_format,
+                                   'num_boards': num_boards,
+                                   'num_chans': num_chans,
+                                   'chunks_per_buffer': chunks_per_buffer,
+                                   'poll_interval': poll_interval}
+                        print('\n' + describe(setting) + ':')
+                        setting_runs, max_rate = find_max_rate(
+                            num_chans, chunks_per_buffer, file_format,
+                            poll_interval, record_dir)
+                        runs += setting_runs
+                        summaries.append(summarize(setting_runs, max_rate))
+
+    print('\nHighest rate that kept up:')
+    for summary in summaries:
+        print('  ' + describe(summary) + ': '
+              + format_value(summary['max_rate'], '{}Hz'))
+
+    file = save_results(runs, summaries)
+    print('\nResults stored in ' + file)
+
+    if compare_file is not None:
+        compare_results(summaries, compare_file)
+
+
+if __name__ == '__main__':
+    run_benchmark()
@@ -1,9 +1,13 @@
 from __future__ import absolute_import, division, print_function
 from builtins import *  # @UnusedWildImport
 
-from mcculw import ul
 from mcculw.enums import InterfaceType
 
+try:
+    from DAQ_Backend import ul
+except ImportError:
+    from .DAQ_Backend import ul
+
 
 def config_first_detected_device(board_num, dev_id_list=None):
     """Adds the first available device to the UL.  If a types_list is specified,
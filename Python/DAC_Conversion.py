@@ -0,0 +1,98 @@
+# This file converts voltages into the raw counts of the DAC for Functions_Output.py and Data_Output.py.
+# You do not need to change anything here.
+#
+# Instead of asking the UL for every single point (ul.from_eng_units), the range and resolution of the card are
+# asked for once and all points are converted at once with numpy. The counts are then copied into the buffer of
+# the card in one go.
+
+from __future__ import absolute_import, division, print_function
+from builtins import *  # @UnusedWildImport
+
+import numpy as np
+
+try:
+    from DAQ_Backend import ul, DaqDeviceInfo
+except ImportError:
+    from .DAQ_Backend import ul, DaqDeviceInfo
+
+
+def get_conversion(board_num, ao_range):
+    """Asks the UL once for the voltage of count 0, the voltage of one count
+    (LSB) and the highest count of the DAC for the given range.
+
+    Returns
+    -------
+    tuple
+        (v_low, lsb, max_count), which is all that to_counts() needs.
+    """
+    resolution = DaqDeviceInfo(board_num).get_ao_info().resolution
+    max_count = 2 ** resolution - 1
+    v_low = ul.to_eng_units(board_num, ao_range, 0)
+    v_high = ul.to_eng_units(board_num, ao_range, max_count)
+    lsb = (v_high - v_low) / max_count
+    return v_low, lsb, max_count
+
+
+def to_counts(values, conversion):
+    """Converts an array of voltages (any shape, e.g. (samples, channels))
+    into DAC counts.
+
+    Values outside of the range of the card are clipped to the lowest or
+    highest count instead of wrapping around.
+
+    Returns
+    -------
+    counts : numpy.ndarray of uint16
+        The counts, same shape as values.
+    num_clipped : int
+        How many values were outside of the range.
+    """
+    v_low, lsb, max_count = conversion
+    counts = np.rint((np.asarray(values, dtype=float) - v_low) / lsb)
+    out_of_range = (counts < 0) | (counts > max_count)
+    num_clipped = int(np.count_nonzero(out_of_range))
+    np.clip(counts, 0, max_count, out=counts)
+    return counts.astype(np.uint16), num_clipped
+
+
+def buffer_view(data_array, count):
+    """Returns a numpy array that shares its memory with the ctypes array
+    (cast from the memhandle of ul.win_buf_alloc), so writing to it writes
+    directly into the buffer of the card."""
+    return np.ctypeslib.as_array(data_array, shape=(count,))
+
+
+def write_counts(board_num, ao_range, data_array, values, first_point=0,
+                 conversion=None):
+    """Converts the voltages to counts and writes them into the buffer.
+
+    Parameters
+    ----------
+    board_num : int
+        The board number of the card.
+    ao_range : ULRange
+        The output range of the card.
+    data_array : POINTER(c_ushort)
+        The buffer, cast from the memhandle of ul.win_buf_alloc.
+    values : numpy.ndarray
+        The voltages, either already interleaved or of shape
+        (samples, channels).
+    first_point : int, optional
+        Index in the buffer where the first value is written. Default is 0.
+    conversion : tuple, optional
+        The result of get_conversion(). If None, it is asked for here.
+
+    Returns
+    -------
+    int
+        How many values were clipped because they were out of range.
+    """
+    if conversion is None:
+        conversion = get_conversion(board_num, ao_range)
+    counts, num_clipped = to_counts(values, conversion)
+    counts = counts.ravel()
+    buffer_view(data_array, first_point + len(counts))[first_point:] = counts
+    if num_clipped > 0:
+        print('Warning: ' + str(num_clipped) + ' values were out of the '
+              'range of the card and have been clipped')
+    return num_clipped
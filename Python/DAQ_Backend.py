@@ -0,0 +1,34 @@
+# This file decides which "card" the scripts talk to. All scripts get ul and DaqDeviceInfo from here instead of
+# from mcculw directly.
+#
+#   - 'mcculw': the real MCC cards (default).
+#   - 'simulator': the software copy of the cards in Simulated_DAQ.py. Use this to try out or time the scripts
+#     without a card, e.g. on a Linux computer.
+#   - The name of any other module that provides the same functions as mcculw.ul plus a DaqDeviceInfo class.
+#
+# Instead of changing this file, you can also set the environment variable RC_DAQ_BACKEND, e.g.
+# "RC_DAQ_BACKEND=simulator python Input_Board_0.py".
+
+import importlib
+import os
+
+#################################################
+# Insert your parameters here
+
+backend = 'mcculw' # 'mcculw', 'simulator' or the name of a module
+
+#################################################
+
+backend = os.environ.get('RC_DAQ_BACKEND', backend)
+
+if backend == 'mcculw':
+    from mcculw import ul
+    from mcculw.device_info import DaqDeviceInfo
+else:
+    if backend == 'simulator':
+        backend = 'Simulated_DAQ'
+    try:
+        ul = importlib.import_module(backend)
+    except ImportError:
+        ul = importlib.import_module('.' + backend, __package__)
+    DaqDeviceInfo = ul.DaqDeviceInfo
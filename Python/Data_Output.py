@@ -8,27 +8,45 @@
 #
 # The data needs to be inserted as a single file. For preparing this, use Data_perparations.py
 # If everything works out well, you will not really need to set anything within this scripts, but just run it.
+#
+# The file is read only once, when you run the script. Binary files (.bin, see Data_Preparation.py) are
+# memory-mapped, so only the columns that are output are read from them. If the data has another rate than the
+# output (e.g. speech data at 100Hz, output at 500Hz), it is resampled on the way (see Resampling.py).
 
 from __future__ import absolute_import, division, print_function
 from builtins import *  
 
 from ctypes import cast, POINTER, c_ushort
-from math import pi, sin, cos, tanh
 from time import sleep
 
-from mcculw import ul
 from mcculw.enums import ScanOptions, FunctionType, Status
-from mcculw.device_info import DaqDeviceInfo
-import matplotlib.pyplot as plt
 import numpy as np
-from scipy import signal
 import pandas as pd
-import os
 
 try:
+    from DAQ_Backend import ul, DaqDeviceInfo
     from Config_File_Dont_Touch import config_first_detected_device
+    from DAC_Conversion import write_counts
+    from AO_Streaming import read_csv_chunks, stream_output
+    from Recording import open_recording
+    from Resampling import resample, resample_chunks, resample_prepared, \
+        resample_prepared_chunks
+    from Segments import default_boundaries_file
+    import Data_Preparation
+    from Stimulus_Cache import get_prepared
+    from Stimulus_Preview import show_preview
 except ImportError:
+    from .DAQ_Backend import ul, DaqDeviceInfo
     from .Config_File_Dont_Touch import config_first_detected_device
+    from .DAC_Conversion import write_counts
+    from .AO_Streaming import read_csv_chunks, stream_output
+    from .Recording import open_recording
+    from .Resampling import resample, resample_chunks, resample_prepared, \
+        resample_prepared_chunks
+    from .Segments import default_boundaries_file
+    from . import Data_Preparation
+    from .Stimulus_Cache import get_prepared
+    from .Stimulus_Preview import show_preview
 
 #################################################
 
@@ -37,47 +55,124 @@ except ImportError:
 
 rate = 100 # At what rate the signal should be applied. The default of the speech_data is 100Hz
 
+data_rate = None # The rate of the data in the file. If it is not the same as rate, the data is resampled.
+                 # None: the rate stored with binary files (.json), for .csv files the same as rate
+
 # In which folder is the input file located?
 path = 'C:/Users/lbongartz/Desktop/Reservoir Computing/Data/Setup_Test'
 
-# Filename?
+# Filename? A .csv file or a binary .bin file (see Data_Preparation.py)
 filename = 'Files_combined.csv'
 
+# Which columns of the file should be output? One per channel, the first to channel 0, e.g. ['F1', 'F2', 'F3', 'F4']
+feature_columns = None # None uses the data columns, i.e. all but the time and the target column
+
+streaming = False # Should the output be streamed from the file through a small buffer instead of loading all of it beforehand?
+                  # Use this for very long datasets that don't fit into memory. The plot is skipped in this case.
+
+use_cache = False # Instead of the file above, use the input files and settings of Data_Preparation.py. They are taken
+                  # from the stimulus cache (see Stimulus_Cache.py) if they were prepared before, so nothing is read again.
+
+plot = True # Should the output be plotted (the first seconds and an overview of all of it, see Stimulus_Preview.py)?
+confirm = 'close' # When should the output start after the plot? 'close': once you close the window, 'ask': you are asked
+                  # in the terminal, 'none': right away (e.g. for automated runs without a screen)
+
 #################################################
 
 board_num = 0
 
-directory = os.fsencode(path)
-
-Speech_Time = []
-Speech_Filter1 = []
-Speech_Filter2 = []
-Speech_Filter3 = []
-Speech_Filter4 = []
-Target = []
-
-num_files = len(os.listdir(directory))
-for file in os.listdir(directory):
-    Data = pd.read_csv(path+'/'+filename, delimiter=',').to_numpy()
-    Speech_Time.append(Data[:,0])
-    Speech_Filter1.append(Data[:,1])
-    Speech_Filter2.append(Data[:,2])
-    Speech_Filter3.append(Data[:,3])
-    Speech_Filter4.append(Data[:,4])
-    Target.append(Data[:,5])
-
-for sample in [0]:
-    time = len(Data)/rate
-
-    rate = int(len(Speech_Time[sample])/time)
-    points_per_channel = int(time * rate)
-
-    Speech_Time = Speech_Time[sample]
-    Speech_Filter1 = Speech_Filter1[sample]
-    Speech_Filter2 = Speech_Filter2[sample]
-    Speech_Filter3 = Speech_Filter3[sample]
-    Speech_Filter4 = Speech_Filter4[sample]
-    Target = Target[sample]
+
+def select_columns(columns, num_chans):
+    """The columns of the file that are output, one per channel."""
+    if feature_columns is None:
+        # Neither the time nor the target column is output
+        return Data_Preparation.data_columns(list(columns))[:num_chans]
+    missing = [name for name in feature_columns if name not in columns]
+    if missing:
+        raise Exception('Error: The file has no column(s) '
+                        + ', '.join(missing))
+    if len(feature_columns) > num_chans:
+        raise Exception('Error: ' + str(len(feature_columns)) + ' columns '
+                        'selected, but only ' + str(num_chans)
+                        + ' output channels')
+    return list(feature_columns)
+
+
+def load_stimulus(num_chans, chunk_points=None):
+    """Loads the data that is output, once.
+
+    Parameters
+    ----------
+    num_chans : int
+        The number of output channels.
+    chunk_points : int, optional
+        If set, the data is not loaded at once, but read piece by piece
+        (for streaming = True).
+
+    Returns
+    -------
+    values : numpy.ndarray or generator
+        The output in volts, shape (points, channels), or the pieces of it
+        if chunk_points is set.
+    columns : list of str
+        The columns of the file that are output.
+    """
+    file = path + '/' + filename
+    # With the _boundaries.csv file of Data_Preparation.py, the 0V between
+    # the snippets keeps its length and value when resampling
+    boundaries = None
+    if use_cache:
+        # Resampled to rate in the cache as well
+        data, meta, _ = get_prepared(Data_Preparation.path,
+                                     Data_Preparation.rate,
+                                     Data_Preparation.seconds_zeros,
+                                     Data_Preparation.y_offset,
+                                     Data_Preparation.columns,
+                                     output_rate=rate)
+        columns = meta['channels']
+        file_rate = rate
+    elif filename.endswith('.bin'):
+        data, meta = open_recording(file)
+        columns = meta['channels']
+        file_rate = meta.get('rate', rate) if data_rate is None else data_rate
+    else:
+        data = None
+        columns = list(pd.read_csv(file, nrows=0).columns)
+        file_rate = rate if data_rate is None else data_rate
+    columns = select_columns(columns, num_chans)
+    if not use_cache and default_boundaries_file(file).exists():
+        boundaries = pd.read_csv(default_boundaries_file(file))
+    if file_rate != rate:
+        print('Resampling from ' + str(file_rate) + 'Hz to ' + str(rate)
+              + 'Hz')
+
+    if data is None:
+        if chunk_points:
+            chunks = read_csv_chunks(file, columns, chunk_points)
+        else:
+            values = pd.read_csv(file, delimiter=',', usecols=columns)
+            values = values[columns].to_numpy(dtype=float)
+    else:
+        # Memory-mapped: only the selected columns are read
+        indices = [meta['channels'].index(name) for name in columns]
+        if chunk_points:
+            chunks = (data[start:start + chunk_points, indices]
+                      for start in range(0, len(data), chunk_points))
+        else:
+            values = np.asarray(data[:, indices], dtype=float)
+
+    if chunk_points:
+        if file_rate != rate and boundaries is not None:
+            chunks = resample_prepared_chunks(chunks, boundaries, file_rate,
+                                              rate, chunk_points)
+        elif file_rate != rate:
+            chunks = resample_chunks(chunks, file_rate, rate, chunk_points)
+        return chunks, columns
+    if file_rate != rate and boundaries is not None:
+        values, _ = resample_prepared(values, boundaries, file_rate, rate, [])
+        return values, columns
+    return resample(values, file_rate, rate), columns
+
 
 # You will probably NOT need to set anything in run_example()
 def run_example():
@@ -101,14 +196,18 @@ def run_example():
         ao_info = daq_dev_info.get_ao_info()
 
         low_chan = 0
-        high_chan = min(3, ao_info.num_chans - 1)
-        num_chans = high_chan - low_chan + 1
-
-
-        #points_per_channel = time * rate
-        total_count = points_per_channel * num_chans
-        sample_time = points_per_channel/rate
-        print('Sample time = ' + str(sample_time) + "s")
+        max_chans = min(4, ao_info.num_chans)
+        values, columns = load_stimulus(max_chans,
+                                        10000 if streaming else None)
+        num_chans = len(columns)
+        high_chan = low_chan + num_chans - 1
+        print('Output columns: ' + ', '.join(columns))
+
+        if not streaming:
+            points_per_channel = len(values)
+            total_count = points_per_channel * num_chans
+            sample_time = points_per_channel/rate
+            print('Sample time = ' + str(sample_time) + "s")
 
         ao_range = ao_info.supported_ranges[0]
 
@@ -125,42 +224,47 @@ def run_example():
 
             status, _, _ = ul.get_status(board_num, FunctionType.AOFUNCTION)
         print('')
-        # Allocate a buffer for the scan
-        memhandle = ul.win_buf_alloc(total_count)
-        # Convert the memhandle to a ctypes array
-        # Note: the ctypes array will no longer be valid after win_buf_free
-        # is called.
-        # A copy of the buffer can be created using win_buf_to_array
-        # before the memory is freed. The copy can be used at any time.
-        ctypes_array = cast(memhandle, POINTER(c_ushort))
-
-        # Check if the buffer was successfully allocated
-        if not memhandle:
-            raise Exception('Error: Failed to allocate memory')
-
-        frequencies = add_example_data(board_num, ctypes_array, ao_range,
-                                       num_chans, rate, points_per_channel)
-
-        for ch_num in range(low_chan, high_chan + 1):
-            print('Channel', ch_num, 'Output Signal Frequency:',
-                  frequencies[ch_num - low_chan])
-
-        # Start the scan
-        ul.a_out_scan(board_num, low_chan, high_chan, total_count, rate,
-                      ao_range, memhandle, ScanOptions.BACKGROUND)
+        if streaming:
+            # Read the file piece by piece while it is output
+            stream_output(board_num, low_chan, high_chan, rate, ao_range,
+                          values)
+        else:
+            # Allocate a buffer for the scan
+            memhandle = ul.win_buf_alloc(total_count)
+            # Convert the memhandle to a ctypes array
+            # Note: the ctypes array will no longer be valid after win_buf_free
+            # is called.
+            # A copy of the buffer can be created using win_buf_to_array
+            # before the memory is freed. The copy can be used at any time.
+            ctypes_array = cast(memhandle, POINTER(c_ushort))
+
+            # Check if the buffer was successfully allocated
+            if not memhandle:
+                raise Exception('Error: Failed to allocate memory')
+
+            frequencies = add_example_data(board_num, ctypes_array, ao_range,
+                                           values, rate)
+
+            for ch_num in range(low_chan, high_chan + 1):
+                print('Channel', ch_num, 'Output Signal Frequency:',
+                      frequencies[ch_num - low_chan])
+
+            # Start the scan
+            ul.a_out_scan(board_num, low_chan, high_chan, total_count, rate,
+                          ao_range, memhandle, ScanOptions.BACKGROUND)
     
 
-        # Wait for the scan to complete
-        print('Waiting for output scan to complete...', end='')
-        status = Status.RUNNING
-        while status != Status.IDLE:
-            print('.', end='')
+            # Wait for the scan to complete
+            print('Waiting for output scan to complete...', end='')
+            status = Status.RUNNING
+            while status != Status.IDLE:
+                print('.', end='')
 
-            # Slow down the status check so as not to flood the CPU
-            sleep(0.5)
+                # Slow down the status check so as not to flood the CPU
+                sleep(0.5)
 
-            status, _, _ = ul.get_status(board_num, FunctionType.AOFUNCTION)
-        print('')
+                status, _, _ = ul.get_status(board_num, FunctionType.AOFUNCTION)
+            print('')
         # Apply 0V at end
         print('Applying 0V to finish')
         v_final = 0
@@ -170,51 +274,25 @@ def run_example():
         print('Scan completed successfully')
     except Exception as e:
         print('\n', e)
-    #finally:
-    #    if memhandle:
-    #        # Free the buffer in a finally block to prevent a memory leak.
-    #        ul.win_buf_free(memhandle)
-    #    if use_device_detection:
-    #        ul.release_daq_device(board_num)
+    finally:
+        if memhandle:
+            # Free the buffer in a finally block to prevent a memory leak.
+            ul.win_buf_free(memhandle)
+        if use_device_detection:
+            ul.release_daq_device(board_num)
 
 # You will probably also not need to change anything here.
-def add_example_data(board_num, data_array, ao_range, num_chans, rate,
-                     points_per_channel):
-    
-    frequencies = [0,0,0,0]
-
-    value_array = []
-    Ch0, Ch1, Ch2, Ch3 = [],[],[],[]
-    data_index = 0
-    for point_num in range(len(Speech_Filter1)):
-        for channel_num in range(num_chans):
-            freq = frequencies[channel_num]
-            if channel_num == 0:
-                value = Speech_Filter1[point_num]
-                Ch0.append(value)
-            elif channel_num == 1:
-                value = Speech_Filter2[point_num]
-                Ch1.append(value)
-            elif channel_num == 2:
-                value = Speech_Filter3[point_num]
-                Ch2.append(value)
-            else:
-                value = Speech_Filter4[point_num]
-                Ch3.append(value)
-
-            raw_value = ul.from_eng_units(board_num, ao_range, value)
-            data_array[data_index] = raw_value
-            data_index += 1
-            value_array.append(value)
-
-    plt.plot(np.arange(0,len(Ch0))/rate, Ch0, label = 'Channel 0')
-    plt.plot(np.arange(0,len(Ch1))/rate, Ch1, label = 'Channel 1')
-    plt.plot(np.arange(0,len(Ch2))/rate, Ch2, label = 'Channel 2')
-    plt.plot(np.arange(0,len(Ch3))/rate, Ch3, label = 'Channel 3')
-    plt.xlabel('Time (s)')
-    plt.ylabel('Voltage (V)')
-    plt.legend()
-    plt.show()
+def add_example_data(board_num, data_array, ao_range, channel_data, rate):
+
+    num_chans = channel_data.shape[1]
+    frequencies = [0] * num_chans
+
+    # Convert all points to counts and copy them into the buffer at once
+    write_counts(board_num, ao_range, data_array, channel_data)
+
+    if plot:
+        show_preview(channel_data, rate, 'Output of DAC / Input to Reservoir',
+                     confirm)
     return frequencies
 
 if __name__ == '__main__':
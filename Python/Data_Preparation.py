@@ -4,22 +4,232 @@
 # this sequence will become important when we want to make use of the memory funtionality
 #
 # Here is also where you can change the y-offset. This will important to make the device more sensitive.
+#
+# The files are read in parallel (one process per CPU core) and every snippet is written straight to its place in the
+# combined file, so even corpora with thousands of files never have to fit into memory at once. Next to the combined
+# file, a _boundaries.csv file lists in which rows (and at which time) every snippet starts and ends, and its label
+# (the value of the target column). With Segments.py, it can be mapped onto a recording.
+#
+# The combined file is stored as .csv (as before, used by Data_Output.py) or as binary .bin file plus a .json file,
+# which can be opened with open_recording() from Recording.py.
+#
+# With output_rate, the combined data is resampled to the rate of the output of the card (see Resampling.py), e.g.
+# from 100Hz to 500Hz. The 0V between the snippets keeps its length in time.
+#
+# With use_cache = True, the result is also kept in the stimulus cache (see Stimulus_Cache.py), and settings that
+# were used before are taken from there without reading the input files again.
 
-import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+import json
+import os
 from pathlib import Path
+import shutil
+
+import pandas as pd
 import matplotlib.pyplot as plt
 import numpy as np
 
+#################################################
 # Insert your parameters here
+
 rate = 100 # Default rate of the input data is 100Hz
 seconds_zeros = 0.2 # For how long (in s) 0V is applied between each data snippet
-y_offset = 0 # Offset (in V)
+y_offset = 0 # Offset (in V), added to the data columns (all but the first (time) and the last (target) column)
+
+output_rate = None # Rate (in Hz) the combined data is resampled to, e.g. 500. None keeps the rate above.
+
+# Which columns of the input files should be kept? None keeps all of them, otherwise e.g. ['Time', 'F1', 'F2', 'Target']
+columns = None
 
 # Where are the files located that you want to use as input?
 path = r'C:\Users\lbongartz\Desktop\Reservoir Computing\Data\Setup_Test\Input_Test'
 
 # Where should the combined file be stored?
 output_path = r'C:\Users\lbongartz\Desktop\Reservoir Computing\Data\Setup_Test'
+output_name = 'Files_combined'
+
+# In which format should the combined file be stored?
+file_format = 'csv' # 'csv' or 'binary'. Binary is stored as .bin (plus a .json file), see Recording.py.
+
+num_workers = None # How many processes read the files. None uses one per CPU core.
+
+use_cache = False # Take the data from the stimulus cache if it was prepared with the same files and settings before
+
+plot = True # Should the combined data be plotted?
+
+#################################################
+
+
+def read_header(file):
+    """The column names of a csv file."""
+    return list(pd.read_csv(file, nrows=0).columns)
+
+
+def held_columns(columns, header):
+    """The indices (in columns) of the time column (the first of the files)
+    and, if the files have more than two columns, of the target column (the
+    last). They are held when resampling instead of filtered, see
+    Resampling.resample_prepared()."""
+    names = [header[0]]
+    if len(header) > 2:
+        names.append(header[-1])
+    return [k for k, name in enumerate(columns) if name in names]
+
+
+def data_columns(columns, header=None):
+    """The data (feature) columns among columns, i.e. all but the time and
+    the target column, see held_columns(). header are the columns of the
+    input files; for a prepared file, its own columns are used."""
+    if header is None:
+        header = columns
+    hold = held_columns(columns, header)
+    return [name for k, name in enumerate(columns) if k not in hold]
+
+
+def count_rows(file):
+    """Counts the data rows of a csv file (all non-empty lines but the
+    header) without parsing them."""
+    with open(file, 'rb') as f:
+        return sum(1 for line in f if line.strip()) - 1
+
+
+def write_snippet(file, out_file, dtype, shape, start, num_rows,
+                  offset_columns, y_offset, columns=None, label_column=None):
+    """Reads one file and writes it into rows start to start + num_rows of the
+    memory-mapped combined file. Runs in one of the worker processes.
+
+    Returns the label of the snippet: the most common value of label_column
+    (None without label_column)."""
+    usecols = columns
+    if columns is not None and label_column is not None:
+        usecols = list(columns) + [label_column]
+    df = pd.read_csv(file, index_col=None, usecols=usecols)
+    label = None
+    if label_column is not None and len(df):
+        label = df[label_column].mode().iloc[0]
+        if isinstance(label, np.generic):
+            label = label.item()
+    if columns is not None:
+        df = df[columns]
+    data = df.to_numpy(dtype=float)
+    if data.shape != (num_rows, shape[1]):
+        raise Exception('Error: ' + str(file) + ' has shape '
+                        + str(data.shape) + ', expected '
+                        + str((num_rows, shape[1])))
+    data[:, offset_columns] += y_offset
+    combined = np.memmap(out_file, dtype=dtype, mode='r+', shape=shape)
+    combined[start:start + num_rows] = data
+    combined.flush()
+    del combined
+    return label
+
+
+def prepare_files(files, out_file, rate, seconds_zeros, y_offset=0,
+                  dtype='float64', num_workers=None, columns=None):
+    """Combines the files into one memory-mapped binary file, each snippet
+    followed by seconds_zeros of 0V.
+
+    Parameters
+    ----------
+    files : list of Path
+        The csv files, all with the same columns.
+    out_file : str or Path
+        The binary file to write to.
+    rate : int
+        Rate of the data (in Hz).
+    seconds_zeros : float
+        For how long (in s) 0V is applied after each snippet.
+    y_offset : float, optional
+        Offset (in V) added to the data columns, including the 0V between
+        the snippets.
+    dtype : str, optional
+        Data type of the combined file. Default is 'float64'.
+    num_workers : int, optional
+        Number of processes. None uses one per CPU core.
+    columns : list of str, optional
+        The columns to keep. None keeps all of them.
+
+    Returns
+    -------
+    combined : numpy.memmap
+        The combined data, shape (rows, columns).
+    columns : list of str
+        The column names.
+    boundaries : pandas.DataFrame
+        One row per file: file, start, end (rows, end excluded), start_time
+        and end_time (in s) and, if the files have more than two columns,
+        label (the most common value of their last (target) column).
+    """
+    header = read_header(files[0])
+    if columns is None:
+        columns = header
+    missing = [name for name in columns if name not in header]
+    if missing:
+        raise Exception('Error: ' + str(files[0]) + ' has no column(s) '
+                        + ', '.join(missing))
+    num_cols = len(columns)
+    # All columns but the first (time) and the last (target) of the files get
+    # the offset
+    if len(header) > 2:
+        hold = held_columns(columns, header)
+        offset_columns = [k for k in range(num_cols) if k not in hold]
+        label_column = header[-1]
+    else:
+        offset_columns = list(range(num_cols))
+        label_column = None
+    len_zeros = round(seconds_zeros * rate)
+
+    with ProcessPoolExecutor(max_workers=num_workers) as pool:
+        # First only count the rows of every file, so that the place of every
+        # snippet in the combined file is known before anything is read
+        for file, file_header in zip(files, pool.map(read_header, files)):
+            if file_header != header:
+                raise Exception('Error: ' + str(file) + ' has the columns '
+                                + ', '.join(file_header) + ', expected '
+                                + ', '.join(header))
+        rows = list(pool.map(count_rows, files))
+        starts = np.concatenate(([0], np.cumsum(np.add(rows, len_zeros))))
+        shape = (int(starts[-1]), num_cols)
+
+        # The whole file is created at once, filled with 0V
+        combined = np.memmap(out_file, dtype=dtype, mode='w+', shape=shape)
+        if y_offset != 0:
+            combined[:, offset_columns] = y_offset
+        combined.flush()
+
+        futures = [pool.submit(write_snippet, file, str(out_file), dtype,
+                               shape, int(start), num_rows, offset_columns,
+                               y_offset, columns, label_column)
+                   for file, start, num_rows in zip(files, starts, rows)]
+        print('Reading ' + str(len(files)) + ' files', end='')
+        labels = []
+        for k, future in enumerate(futures):
+            labels.append(future.result())
+            # About 20 dots for all files
+            if (k + 1) % max(len(files) // 20, 1) == 0:
+                print('.', end='')
+        print('')
+
+    boundaries = pd.DataFrame({
+        'file': [Path(file).name for file in files],
+        'start': starts[:-1],
+        'end': starts[:-1] + np.array(rows, dtype=int),
+    })
+    boundaries['start_time'] = boundaries['start'] / rate
+    boundaries['end_time'] = boundaries['end'] / rate
+    if label_column is not None:
+        boundaries['label'] = labels
+    return combined, columns, boundaries
+
+
+def write_csv(combined, columns, csv_file, chunk_rows=100000):
+    """Writes the combined data to a csv file, piece by piece."""
+    with open(csv_file, 'w', newline='') as f:
+        for start in range(0, max(len(combined), 1), chunk_rows):
+            block = pd.DataFrame(np.asarray(combined[start:start + chunk_rows]),
+                                 columns=columns)
+            block.to_csv(f, header=(start == 0), index=False)
+
 
 if __name__ == '__main__':
     input_path = Path(
@@ -28,26 +238,101 @@ if __name__ == '__main__':
         #r'C:\Users\Steiner\Documents\Python\SPRInd-challenge\data\training'
         #r'\input')
 
-    all_input_files = list(sorted(input_path.glob("*.csv")))
-    num_files = len(all_input_files)
-
-    input_sequence = [None] * num_files
-    for k, input_file in enumerate(all_input_files):
-
-        print(input_file)
+    output_file = Path(output_path) / output_name
+    bin_file = output_file.with_suffix('.bin')
+    resampling = output_rate is not None and output_rate != rate
+    final_rate = output_rate if resampling else rate
+    tmp_files = []
 
-        len_zeros = round(seconds_zeros * rate)
-        df = pd.read_csv(input_file, index_col=None)
-        df_zeros = pd.DataFrame(np.zeros(shape=(len_zeros, 6)),
-                                columns=df.columns)
-        input_sequence[k] = df.append(df_zeros, ignore_index=True)
+    if use_cache:
+        try:
+            from Stimulus_Cache import get_prepared
+        except ImportError:
+            from .Stimulus_Cache import get_prepared
+        combined, meta, boundaries = get_prepared(
+            input_path, rate, seconds_zeros, y_offset, columns, num_workers,
+            output_rate)
+        columns = meta['channels']
+        # The cached columns are those of the prepared file
+        header = None
+        if file_format == 'binary':
+            shutil.copyfile(combined.filename, bin_file)
+    else:
+        try:
+            from Resampling import resample_prepared, resampled_length
+        except ImportError:
+            from .Resampling import resample_prepared, resampled_length
+        all_input_files = list(sorted(input_path.glob("*.csv")))
+        if not all_input_files:
+            raise Exception('Error: No csv files found in ' + str(input_path))
+        header = read_header(all_input_files[0])
+        dtype = 'float64' if file_format == 'csv' else 'float32'
+        # Binary files are only needed on the way to the csv file or to the
+        # resampled data
+        if file_format == 'csv' or resampling:
+            prepared_file = output_file.with_name(output_name + '_tmp.bin')
+            tmp_files.append(prepared_file)
+        else:
+            prepared_file = bin_file
+        combined, columns, boundaries = prepare_files(
+            all_input_files, prepared_file, rate, seconds_zeros, y_offset,
+            dtype, num_workers, columns)
+        if resampling:
+            print('Resampling to ' + str(output_rate) + 'Hz')
+            if file_format == 'csv':
+                resampled_file = output_file.with_name(output_name
+                                                       + '_resampled_tmp.bin')
+                tmp_files.append(resampled_file)
+            else:
+                resampled_file = bin_file
+            resampled = np.memmap(resampled_file, dtype=dtype, mode='w+',
+                                  shape=(resampled_length(len(combined), rate,
+                                                          output_rate),
+                                         len(columns)))
+            combined, boundaries = resample_prepared(
+                combined, boundaries, rate, output_rate,
+                held_columns(columns, header),
+                out=resampled)
+    boundaries.to_csv(output_file.with_name(output_name + '_boundaries.csv'),
+                      index=False)
 
-    input_sequence = pd.concat(input_sequence) + y_offset
+    if file_format == 'csv':
+        write_csv(combined, columns, output_file.with_suffix('.csv'))
+    else:
+        meta = {
+            'rate': final_rate,
+            'channels': columns,
+            'dtype': combined.dtype.str,
+            'num_points': len(combined),
+            'seconds_zeros': seconds_zeros,
+            'y_offset': y_offset,
+            'source': str(input_path),
+        }
+        if resampling:
+            meta['source_rate'] = rate
+        with open(bin_file.with_suffix('.json'), 'w') as f:
+            json.dump(meta, f, indent=4)
+    print('Combined ' + str(len(boundaries)) + ' files into '
+          + str(len(combined)) + ' rows')
 
-    plot_array = input_sequence.to_numpy()
-    N = len(plot_array)
-    plot_time = np.linspace(0, N/rate, N)
-    plt.plot(plot_time, plot_array[:,1:5])
-    plt.show()
+    if plot:
+        # The first seconds and a decimated overview of all of it
+        try:
+            from Stimulus_Preview import plot_preview
+        except ImportError:
+            from .Stimulus_Preview import plot_preview
+        # The data columns that were written, without time and target
+        preview_columns = data_columns(columns, header)
+        indices = [columns.index(name) for name in preview_columns]
+        if indices == list(range(indices[0], indices[-1] + 1)):
+            # A slice of the memory-mapped file is not read at once
+            preview = combined[:, indices[0]:indices[-1] + 1]
+        else:
+            preview = combined[:, indices]
+        plot_preview(preview, final_rate, 'Combined data',
+                     channel_names=preview_columns)
+        plt.show()
 
-    input_sequence.to_csv(output_path + '/Files_combined.csv', index = False)
+    del combined
+    for tmp_file in tmp_files:
+        os.remove(tmp_file)
@@ -0,0 +1,98 @@
+# This file reduces long recordings to what can be seen in a plot, for the plots after a recording, the live plot
+# while recording (see Live_Monitor.py) and the preview of the output. You do not need to change anything here.
+#
+# A plot is only a few thousand pixels wide, so millions of points per channel are not needed to draw it. The points
+# are split into bins, and only the smallest and the largest value of every bin are plotted (min/max decimation).
+# Unlike taking every n-th point, this keeps every peak and spike. The data is read block by block, so an hour of 16
+# channels is plotted within seconds, even from a memory-mapped binary recording or a .csv recording that is read
+# back from the file (see Recording.CSVRecording).
+
+import numpy as np
+
+
+def minmax_bins(data, points_per_bin):
+    """The smallest and the largest value of every complete bin.
+
+    Parameters
+    ----------
+    data : numpy.ndarray
+        Shape (points, channels). Points after the last complete bin are
+        ignored.
+    points_per_bin : int
+        Points per bin.
+
+    Returns
+    -------
+    mins, maxs : numpy.ndarray
+        Shape (bins, channels).
+    """
+    data = np.asarray(data, dtype=float)
+    data = data.reshape(len(data), -1)
+    num_bins = len(data) // points_per_bin
+    bins = data[:num_bins * points_per_bin].reshape(num_bins, points_per_bin,
+                                                    data.shape[1])
+    return bins.min(axis=1), bins.max(axis=1)
+
+
+def interleave(mins, maxs, first_point, points_per_bin, rate):
+    """The minima and maxima one after the other, as a line that can be
+    plotted.
+
+    Returns
+    -------
+    time : numpy.ndarray
+        The time (in s) of every value, shape (2 * bins,).
+    values : numpy.ndarray
+        Shape (2 * bins, channels).
+    """
+    values = np.empty((2 * len(mins), mins.shape[1]))
+    values[0::2] = mins
+    values[1::2] = maxs
+    # The minimum at the start and the maximum in the middle of each bin
+    time = (first_point + np.arange(2 * len(mins)) * points_per_bin / 2) / rate
+    return time, values
+
+
+def envelope(data, rate, max_bins=2000, block_points=1000000):
+    """Decimates data for plotting.
+
+    Parameters
+    ----------
+    data : numpy.ndarray or numpy.memmap
+        Shape (points, channels). Read block by block.
+    rate : int
+        Rate of the data (in Hz).
+    max_bins : int, optional
+        At most this many bins (two values each) per channel. Data with
+        fewer than 2 * max_bins points is returned as it is. Default is 2000.
+    block_points : int, optional
+        Points read at once. Default is 1000000.
+
+    Returns
+    -------
+    time : numpy.ndarray
+        The time (in s) of every value.
+    values : numpy.ndarray
+        Shape (len(time), channels).
+    """
+    num_points = len(data)
+    if num_points <= 2 * max_bins:
+        values = np.asarray(data, dtype=float).reshape(num_points, -1)
+        return np.arange(num_points) / rate, values
+    points_per_bin = -(-num_points // max_bins)
+    block_points = max(block_points // points_per_bin, 1) * points_per_bin
+    mins = []
+    maxs = []
+    for start in range(0, num_points, block_points):
+        block_mins, block_maxs = minmax_bins(data[start:start + block_points],
+                                             points_per_bin)
+        mins.append(block_mins)
+        maxs.append(block_maxs)
+    rest = num_points % points_per_bin
+    if rest:
+        last = np.asarray(data[num_points - rest:], dtype=float)
+        last = last.reshape(rest, -1)
+        mins.append(last.min(axis=0, keepdims=True))
+        maxs.append(last.max(axis=0, keepdims=True))
+    return interleave(np.concatenate(mins), np.concatenate(maxs), 0,
+                      points_per_bin, rate)
@@ -0,0 +1,262 @@
+# This file runs a whole experiment (output of the card = input of the reservoir, and the recording of the
+# reservoir) in one process, for Run_Experiment.py. You do not need to change anything here.
+#
+# The output is prepared in the buffer of the card and all input scans are armed before anything starts. Then the
+# input scans are started first and the output right after them, and all start times are measured. The recording
+# stops by itself when the output is over plus a tail. This replaces starting the scripts in two terminals and closing
+# the plot window at the right moment, which left a random delay of up to seconds between stimulus and recording.
+# The measured start times are stored in a _run.json file next to the recording.
+
+from __future__ import absolute_import, division, print_function
+from builtins import *  # @UnusedWildImport
+
+from ctypes import cast, POINTER, c_ushort
+from datetime import datetime
+import json
+from pathlib import Path
+from time import perf_counter
+
+from mcculw.enums import ScanOptions, FunctionType, Status
+import numpy as np
+
+try:
+    from DAQ_Backend import ul, DaqDeviceInfo
+    from DAC_Conversion import get_conversion, write_counts
+    from Acquisition import run_acquisition
+except ImportError:
+    from .DAQ_Backend import ul, DaqDeviceInfo
+    from .DAC_Conversion import get_conversion, write_counts
+    from .Acquisition import run_acquisition
+
+
+class OutputScan:
+    """An a_out_scan whose buffer is prepared in advance with load() and
+    that is started later with start().
+
+    The buffer (and the conversion to counts) is kept and reused by the next
+    load(), as long as the new output fits into it, so several runs can be
+    output one after the other without setting up the card again (see
+    Batch_Runner.py).
+
+    Parameters
+    ----------
+    board_num : int
+        The board number of the card.
+    num_chans : int
+        Number of output channels, starting with channel 0.
+    max_points : int, optional
+        Points per channel to allocate the buffer for right away. If an
+        output is longer, the buffer is allocated again.
+    """
+
+    def __init__(self, board_num, num_chans, max_points=0):
+        self.board_num = board_num
+        self.memhandle = None
+        self.capacity = 0
+        self.start_time = None
+        self.rate = None
+        self.num_points = 0
+        self.total_count = 0
+
+        daq_dev_info = DaqDeviceInfo(board_num)
+        if not daq_dev_info.supports_analog_output:
+            raise Exception('Error: The DAQ device does not support '
+                            'analog output')
+        ao_info = daq_dev_info.get_ao_info()
+        self.ao_range = ao_info.supported_ranges[0]
+
+        if num_chans > ao_info.num_chans:
+            raise Exception('Error: The card has only '
+                            + str(ao_info.num_chans) + ' output channels')
+        self.num_chans = num_chans
+        self.low_chan = 0
+        self.high_chan = num_chans - 1
+
+        self.conversion = get_conversion(board_num, self.ao_range)
+        if max_points > 0:
+            self._alloc(max_points * num_chans)
+
+    def _alloc(self, count):
+        self.free()
+        self.memhandle = ul.win_buf_alloc(count)
+        if not self.memhandle:
+            raise Exception('Error: Failed to allocate memory')
+        self.data_array = cast(self.memhandle, POINTER(c_ushort))
+        self.capacity = count
+
+    def load(self, values, rate):
+        """Writes the output into the buffer.
+
+        Parameters
+        ----------
+        values : numpy.ndarray
+            The output of all channels in volts, shape (points, channels),
+            e.g. from Waveforms.build_channels(). Channel 0 is the first
+            column.
+        rate : int
+            Output rate (in Hz).
+        """
+        values = np.asarray(values, dtype=float)
+        if values.ndim != 2 or values.shape[1] != self.num_chans:
+            raise Exception('Error: The output must have '
+                            + str(self.num_chans) + ' columns')
+        if values.size > self.capacity:
+            self._alloc(values.size)
+        write_counts(self.board_num, self.ao_range, self.data_array, values,
+                     conversion=self.conversion)
+        self.num_points = len(values)
+        self.total_count = values.size
+        self.rate = rate
+        self.start_time = None
+
+    @property
+    def duration(self):
+        """How long (in s) the loaded output takes."""
+        return self.num_points / self.rate
+
+    def apply(self, voltage):
+        """Applies a constant voltage to all channels (outside of a scan)."""
+        for channel_num in range(self.low_chan, self.high_chan + 1):
+            ul.v_out(self.board_num, channel_num, self.ao_range, voltage)
+
+    def start(self):
+        """Starts the output and returns the time (perf_counter()) when it
+        was started."""
+        ul.a_out_scan(self.board_num, self.low_chan, self.high_chan,
+                      self.total_count, self.rate, self.ao_range,
+                      self.memhandle, ScanOptions.BACKGROUND)
+        self.start_time = perf_counter()
+        return self.start_time
+
+    def is_done(self):
+        status, _, _ = ul.get_status(self.board_num, FunctionType.AOFUNCTION)
+        return status == Status.IDLE
+
+    def stop(self):
+        ul.stop_background(self.board_num, FunctionType.AOFUNCTION)
+
+    def free(self):
+        if self.memhandle:
+            # Free the buffer to prevent a memory leak.
+            ul.win_buf_free(self.memhandle)
+            self.memhandle = None
+            self.capacity = 0
+
+
+def run_experiment(output_board, output_rate, output_values, boards,
+                   input_rate, record_file, tail=1, file_format='csv',
+                   buffer_size_seconds=2, run_info=None, output=None,
+                   board_scans=None, on_chunk=None):
+    """Outputs output_values and records the boards at the same time.
+
+    Parameters
+    ----------
+    output_board : int
+        The board number of the card that does the output.
+    output_rate : int
+        Output rate (in Hz).
+    output_values : numpy.ndarray
+        The output in volts, shape (points, channels).
+    boards : list of tuple
+        (board_num, low_chan, high_chan) for every board that records.
+    input_rate : int
+        Scan rate (in Hz) of all recording boards.
+    record_file : str
+        The file to record to, see Acquisition.prepare_record_file().
+    tail : float, optional
+        How long (in s) the recording goes on after the output is over.
+        Default is 1s.
+    file_format : str, optional
+        'csv', 'binary' or 'counts', see Recording.py. Default is 'csv'.
+    buffer_size_seconds : float, optional
+        The size of the UL buffers of the recording, in seconds.
+    run_info : dict, optional
+        Anything else to store in the run metadata, e.g. the settings of the
+        stimulus.
+    output : OutputScan, optional
+        An OutputScan of output_board to reuse. It is not freed at the end.
+        If None, one is set up for this run only.
+    board_scans : list of Acquisition.BoardScan, optional
+        The scans of boards to reuse, see Acquisition.run_acquisition().
+    on_chunk : callable or list of callable, optional
+        Called with every block of the recording, see
+        Acquisition.run_acquisition().
+
+    Returns
+    -------
+    data : numpy.ndarray or numpy.memmap
+        The recording, see Acquisition.run_acquisition().
+    channel_names : list of str
+        The names of the columns of data.
+    run : dict
+        The run metadata, as stored in the _run.json file.
+    """
+    output_values = np.asarray(output_values, dtype=float)
+    own_output = output is None
+    if own_output:
+        output = OutputScan(output_board, output_values.shape[1])
+    stats = {}
+    output_done = False
+
+    def start_output():
+        # The input scans are running at this point
+        output.start()
+        return output.start_time + output.duration + tail
+
+    try:
+        output.load(output_values, output_rate)
+        print('Applying 0V to start')
+        output.apply(0)
+        print('Output: ' + str(output.duration) + 's, recording until '
+              + str(tail) + 's after it')
+        # The extra second is only a limit, the recording stops at the end of
+        # the tail
+        data, channel_names = run_acquisition(
+            boards, input_rate, output.duration + tail + 1, record_file,
+            file_format, buffer_size_seconds, on_start=start_output,
+            board_scans=board_scans, stats=stats, on_chunk=on_chunk)
+        output_done = output.is_done()
+    finally:
+        output.stop()
+        print('Applying 0V to finish')
+        output.apply(0)
+        if own_output:
+            output.free()
+
+    if not output_done:
+        print('Warning: the output was still running when the recording '
+              'ended')
+
+    # All times relative to the start of the first recording board
+    start_times = stats.get('start_times', [])
+    first_start = start_times[0] if start_times else output.start_time
+    run = {
+        'date': datetime.now().isoformat(),
+        'record_file': str(record_file),
+        'file_format': file_format,
+        'output_board': output_board,
+        'output_rate': output_rate,
+        'output_points': output.num_points,
+        'output_channels': output.num_chans,
+        'input_boards': [list(board) for board in boards],
+        'input_rate': input_rate,
+        'tail': tail,
+        'input_start_offsets': [t - first_start for t in start_times],
+        'output_start_offset': (None if output.start_time is None
+                                else output.start_time - first_start),
+        'points_written': stats.get('points_written'),
+        'overrun': stats.get('overrun'),
+        'error': stats.get('error'),
+    }
+    if run['output_start_offset'] is not None:
+        print('Output started ' + '{:.4f}'.format(run['output_start_offset'])
+              + 's after the recording')
+    if run_info:
+        run['info'] = run_info
+
+    run_file = Path(record_file)
+    run_file = run_file.with_name(run_file.stem + '_run.json')
+    with open(run_file, 'w') as f:
+        json.dump(run, f, indent=4)
+    print('Run metadata stored in ' + str(run_file))
+    return data, channel_names, run
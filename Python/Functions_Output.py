@@ -3,28 +3,34 @@
 # This script is for giving functions (e.g., sin, square...) as the output of the MCC (aka input of the reservoir). 
 # It is NOT the script for using data (e.g., speech data, heart beats). Please use Data_Output.py for this
 #
-# When you run this script, a window will show up with a snippet of the function you're inserting. The output will start
-# once you close this window.
+# When you run this script, a window will show up with a snippet of the function you're inserting and an overview of all
+# of it. The output will start once you close this window (see confirm below and Stimulus_Preview.py).
 
 
 from __future__ import absolute_import, division, print_function
 from builtins import * 
 
 from ctypes import cast, POINTER, c_ushort
-from math import pi, sin, cos, tanh
 from time import sleep
 
-from mcculw import ul
 from mcculw.enums import ScanOptions, FunctionType, Status
-from mcculw.device_info import DaqDeviceInfo
-import matplotlib.pyplot as plt
-import numpy as np
-from scipy import signal
 
 try:
+    from DAQ_Backend import ul, DaqDeviceInfo
     from Config_File_Dont_Touch import config_first_detected_device
+    from Waveforms import (build_channels, generate_chunks, interleave,
+                           period_points)
+    from DAC_Conversion import write_counts
+    from AO_Streaming import loop_output, stream_output
+    from Stimulus_Preview import show_preview
 except ImportError:
+    from .DAQ_Backend import ul, DaqDeviceInfo
     from .Config_File_Dont_Touch import config_first_detected_device
+    from .Waveforms import (build_channels, generate_chunks, interleave,
+                            period_points)
+    from .DAC_Conversion import write_counts
+    from .AO_Streaming import loop_output, stream_output
+    from .Stimulus_Preview import show_preview
 
 
 # Insert your parameters here
@@ -33,6 +39,41 @@ time = 10  # How long the signal should be applied (in s)
 rate = 500 # At what rate the signal should be applied
 plot = True # Should the output be plotted? Better leave it as True, it's like a security break to doublecheck your input. 
             # Otherwise insert "False"
+confirm = 'close' # When should the output start after the plot? 'close': once you close the window, 'ask': you are asked
+                  # in the terminal, 'none': right away (e.g. for automated runs without a screen)
+streaming = False # Should the output be streamed through a small buffer instead of preparing all of it beforehand?
+                  # Use this for very long runs (hours) that don't fit into memory. The plot is skipped in this case.
+looping = False # Should only one period of the functions be prepared and repeated by the card for the set time?
+                # Starts instantly, even for runs over night. You can stop it earlier with Ctrl+C.
+
+#################################################
+# Set the parameters for the 4 channels here
+
+freq_Ch0 = 5
+freq_Ch1 = 5
+freq_Ch2 = 5
+freq_Ch3 = 5
+
+amplitude_Ch0 = 1
+amplitude_Ch1 = 1
+amplitude_Ch2 = 1
+amplitude_Ch3 = 1
+
+y_offset_Ch0 = 0
+y_offset_Ch1 = 0
+y_offset_Ch2 = 0
+y_offset_Ch3 = 0
+
+duty = 0.5  # Duty cycle, if you use a square wave.
+
+#################################################
+# Function selection
+# Choose between 'sin', 'square' or '0' (0V) for each channel
+
+function_Ch0 = 'sin'
+function_Ch1 = 'sin'
+function_Ch2 = 'sin'
+function_Ch3 = 'sin'
 
 
 
@@ -86,38 +127,58 @@ def run_example():
 
             status, _, _ = ul.get_status(board_num, FunctionType.AOFUNCTION)
         print('')
-        # Allocate a buffer for the scan
-        memhandle = ul.win_buf_alloc(total_count)
-        # Convert the memhandle to a ctypes array
-        # Note: the ctypes array will no longer be valid after win_buf_free
-        # is called.
-        # A copy of the buffer can be created using win_buf_to_array
-        # before the memory is freed. The copy can be used at any time.
-        ctypes_array = cast(memhandle, POINTER(c_ushort))
-
-        # Check if the buffer was successfully allocated
-        if not memhandle:
-            raise Exception('Error: Failed to allocate memory')
-
-        frequencies = add_example_data(board_num, ctypes_array, ao_range,
-                                       num_chans, rate, points_per_channel)
-
-        # Start the scan
-        ul.a_out_scan(board_num, low_chan, high_chan, total_count, rate,
-                      ao_range, memhandle, ScanOptions.BACKGROUND)
+        if looping:
+            # Only one period of all channels together is calculated, the
+            # card repeats it until the time is over
+            functions, frequencies, amplitude, y_offset, duty = channel_settings()
+            num_points = period_points(functions[:num_chans],
+                                       frequencies[:num_chans], rate,
+                                       max_points=points_per_channel)
+            print('Repeating a period of ' + str(num_points) + ' points')
+            period_data = build_channels(functions, frequencies, amplitude,
+                                         y_offset, duty, rate, num_points,
+                                         num_chans)
+            loop_output(board_num, low_chan, high_chan, rate, ao_range,
+                        period_data, duration=time)
+        elif streaming:
+            # Calculate the output piece by piece while it is output
+            chunks = generate_chunks(*channel_settings(), rate,
+                                     points_per_channel, num_chans)
+            stream_output(board_num, low_chan, high_chan, rate, ao_range,
+                          chunks)
+        else:
+            # Allocate a buffer for the scan
+            memhandle = ul.win_buf_alloc(total_count)
+            # Convert the memhandle to a ctypes array
+            # Note: the ctypes array will no longer be valid after win_buf_free
+            # is called.
+            # A copy of the buffer can be created using win_buf_to_array
+            # before the memory is freed. The copy can be used at any time.
+            ctypes_array = cast(memhandle, POINTER(c_ushort))
+
+            # Check if the buffer was successfully allocated
+            if not memhandle:
+                raise Exception('Error: Failed to allocate memory')
+
+            frequencies = add_example_data(board_num, ctypes_array, ao_range,
+                                           num_chans, rate, points_per_channel)
+
+            # Start the scan
+            ul.a_out_scan(board_num, low_chan, high_chan, total_count, rate,
+                          ao_range, memhandle, ScanOptions.BACKGROUND)
     
 
-        # Wait for the scan to complete
-        print('Waiting for output scan to complete...', end='')
-        status = Status.RUNNING
-        while status != Status.IDLE:
-            print('.', end='')
+            # Wait for the scan to complete
+            print('Waiting for output scan to complete...', end='')
+            status = Status.RUNNING
+            while status != Status.IDLE:
+                print('.', end='')
 
-            # Slow down the status check so as not to flood the CPU
-            sleep(0.5)
+                # Slow down the status check so as not to flood the CPU
+                sleep(0.5)
 
-            status, _, _ = ul.get_status(board_num, FunctionType.AOFUNCTION)
-        print('')
+                status, _, _ = ul.get_status(board_num, FunctionType.AOFUNCTION)
+            print('')
 
         # Apply 0V at end
         v_final = 0
@@ -129,110 +190,43 @@ def run_example():
     except Exception as e:
         print('\n', e)
 
-    #finally:
-    #    if memhandle:
-    #        # Free the buffer in a finally block to prevent a memory leak.
-    #        ul.win_buf_free(memhandle)
-    #    if use_device_detection:
-    #        ul.release_daq_device(board_num)
-
-
-# You will need to set a few things here:
-def add_example_data(board_num, data_array, ao_range, num_chans, rate,
-                     points_per_channel):
-    
-    #################################################
-    # Set the parameters for the 4 channels here
+    finally:
+        if memhandle:
+            # Free the buffer in a finally block to prevent a memory leak.
+            ul.win_buf_free(memhandle)
+        if use_device_detection:
+            ul.release_daq_device(board_num)
 
-    freq_Ch0 = 5
-    freq_Ch1 = 5
-    freq_Ch2 = 5
-    freq_Ch3 = 5
-    
-    amplitude_Ch0 = 1
-    amplitude_Ch1 = 1
-    amplitude_Ch2 = 1
-    amplitude_Ch3 = 1
-
-    y_offset_Ch0 = 0
-    y_offset_Ch1 = 0
-    y_offset_Ch2 = 0
-    y_offset_Ch3 = 0
-    
-    duty = 0.5  # Duty cycle, if you use a square wave. Don't be surprised, when the script is a bit slower 
-                # when running the sqaure wave.
 
-    #################################################
-    
-    def square(amp, freq, duty, y_off):
-        t = np.linspace(0, time, points_per_channel, endpoint=False)
-        output = amp*signal.square(2 * np.pi * freq * t, duty=duty) + y_off
-        return output
-        
+def channel_settings():
+    # Collects the parameters of the 4 channels set above
+    functions = [function_Ch0, function_Ch1, function_Ch2, function_Ch3]
     frequencies = [freq_Ch0, freq_Ch1, freq_Ch2, freq_Ch3]
     amplitude = [amplitude_Ch0, amplitude_Ch1, amplitude_Ch2, amplitude_Ch3]
     y_offset = [y_offset_Ch0, y_offset_Ch1, y_offset_Ch2, y_offset_Ch3]
+    return functions, frequencies, amplitude, y_offset, duty
 
-    points_per_channel = time * rate
-    value_array = []
-    Ch0, Ch1, Ch2, Ch3 = [],[],[],[]
-    data_index = 0
-    for point_num in range(points_per_channel):
-        for channel_num in range(num_chans):
-
-            freq = frequencies[channel_num]
-            amp = amplitude[channel_num]
-            y_off = y_offset[channel_num]
-
-            #################################################
-            # Function selection
-            # Choose between sin, sqaure o 0V for each channel by commenting out
-
-            if channel_num == 0:
 
-                value = amp * sin(2 * pi * freq * point_num / rate) + y_off 
-                #value = square(amp, freq, duty, y_off)[point_num]
-                #value = 0 
-                Ch0.append(value)
-
-            elif channel_num == 1:
-
-                value = amp * sin(2 * pi * freq * point_num / rate) + y_off 
-                #value = square(amp, freq, duty, y_off)[point_num]
-                #value = 0 
-                Ch1.append(value)
-
-            elif channel_num == 2:
-
-                value = amp * sin(2 * pi * freq * point_num / rate) + y_off 
-                #value = square(amp, freq, duty, y_off)[point_num]
-                #value = 0 
+# You will probably NOT need to set anything in add_example_data() either. The parameters of the channels are set above.
+def add_example_data(board_num, data_array, ao_range, num_chans, rate,
+                     points_per_channel):
+    
+    functions, frequencies, amplitude, y_offset, duty = channel_settings()
 
-                Ch2.append(value)
-            else:
+    points_per_channel = time * rate
 
-                value = amp * sin(2 * pi * freq * point_num / rate) + y_off 
-                #value = square(amp, freq, duty, y_off)[point_num]
-                #value = 0 
-                
-                Ch3.append(value)
-            #################################################
+    # All channels are calculated at once, one column per channel
+    channel_data = build_channels(functions, frequencies, amplitude, y_offset,
+                                  duty, rate, points_per_channel, num_chans)
+    value_array = interleave(channel_data)
 
-            raw_value = ul.from_eng_units(board_num, ao_range, value)
-            data_array[data_index] = raw_value
-            data_index += 1
-            value_array.append(value)
+    # Convert all points to counts and copy them into the buffer at once
+    write_counts(board_num, ao_range, data_array, value_array)
 
-    time_array = np.linspace(0, time, time*rate)
     if plot == True:
-        plt.plot(time_array, Ch0, label = 'Channel 0')
-        plt.plot(time_array, Ch1, label = 'Channel 1')
-        plt.plot(time_array, Ch2, label = 'Channel 2')
-        plt.plot(time_array, Ch3, label = 'Channel 3')
-        plt.title('Output of DAC / Input to Reservoir')
-        plt.legend()
-        plt.xlim([0, 2])
-        plt.show()
+        # The first 2s and a decimated overview of all of it
+        show_preview(channel_data, rate,
+                     'Output of DAC / Input to Reservoir', confirm)
     return frequencies
 
 
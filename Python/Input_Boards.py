@@ -0,0 +1,67 @@
+# This script records several boards at once (e.g., when you use more than 8 reservoir outputs). All boards are recorded by
+# this one script at the same rate and stored side by side in one file with a common time axis, one column per channel
+# (e.g. "Board1 Channel 3").
+#
+# Start your output script (Functions_Output.py or Data_Output.py) first, then this script, see the Read-me file. To
+# record the full output, the scan time (see below) has to be longer than it. To start output and recording together
+# without a second script, set the same boards in Run_Experiment.py instead.
+#
+# The recording is stored as .csv file, or with file_format = 'binary' or 'counts' as .bin file (plus a .json file), see
+# Recording.py.
+
+
+from __future__ import absolute_import, division, print_function
+from builtins import *  # @UnusedWildImport
+
+from time import sleep
+from pathlib import Path
+
+try:
+    from Acquisition import record_boards
+except ImportError:
+    from .Acquisition import record_boards
+
+#################################################
+# Insert your parameters here
+
+rate = 500 # At what rate the signal should be applied. The default of the speech_data is 100Hz. 
+            # I recommend matching the rate of input and output.
+
+input_scan_time = 100 # How long the output should be scanned (in s). Should be longer than your input (as defined in x_Output.py).
+
+# Which boards (as defined in Instacal) and which input channels of them do you use?
+# One line per board: (board number, lowest input channel, highest input channel)
+boards = [(0, 0, 7),
+          (1, 0, 7)]
+
+# Do you want to plot the spectrum (power spectral density, calculated while recording)?
+FFT = False # True or False
+
+# Do you want to see the last seconds of all channels while recording?
+live_plot = False # True or False
+live_seconds = 10 # How many seconds the live plot shows
+
+# How should the output file be named?
+file_name = 'Boards_Test.csv'
+
+# In which format should the data be stored?
+file_format = 'csv' # 'csv', 'binary' or 'counts'. Binary is much smaller and faster to write and is stored as .bin (plus a
+                    # .json file with rate, channels etc.). Open it with open_recording() from Recording.py. 'counts' stores
+                    # the raw 16 bit counts of the card instead of volts, half the size of 'binary', and is opened the same way.
+
+# Where should the output file be stored? 
+# In this folder, a folder with todays date will be created, where the data will be stored
+parent_dir = Path('C:/Users/lbongartz/Desktop/Reservoir Computing/Data/Setup_Test/Output_Test')
+
+
+#################################################
+
+
+# You will probably NOT need to set anything in run_example()
+def run_example():
+    record_boards(boards, rate, input_scan_time, parent_dir, file_name,
+                  file_format, FFT, live_plot, live_seconds)
+
+if __name__ == '__main__':
+    sleep(2)
+    run_example()
\ No newline at end of file
@@ -0,0 +1,150 @@
+# This file shows the last seconds of all channels while recording (live_plot = True in the input scripts and in
+# Run_Experiment.py). You do not need to change anything here.
+#
+# The recording must never wait for the plot, so the plot runs in a process of its own. LiveMonitor.update() is
+# called with every chunk the cards deliver (see run_acquisition(on_chunk=...) in Acquisition.py) and only reduces it
+# to the smallest and largest value of every bin (see Decimation.py), which is sent to the plot without waiting. If the
+# plot cannot keep up, bins are dropped for the plot, never for the file. The plot takes whatever has arrived a few
+# times per second (fps) and redraws, so drawing takes the same time for 1 or 16 channels and any rate.
+
+import multiprocessing
+import queue
+
+import numpy as np
+
+try:
+    from Decimation import minmax_bins, interleave
+except ImportError:
+    from .Decimation import minmax_bins, interleave
+
+
+def _monitor_loop(bins_queue, rate, points_per_bin, window_bins, fps, title):
+    """Draws the bins from bins_queue until it gets None. Runs in the
+    process of the plot."""
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots()
+    ax.set_title(title)
+    ax.set_xlabel('Time (s)')
+    ax.set_ylabel('Voltage (V)')
+    lines = None
+    mins = maxs = None
+    first_bin = 0
+    window_seconds = window_bins * points_per_bin / rate
+    while True:
+        # Take everything that arrived since the last frame
+        finished = False
+        updated = False
+        while True:
+            try:
+                item = bins_queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                finished = True
+                break
+            item_first_bin, new_mins, new_maxs = item
+            if mins is None or item_first_bin != first_bin + len(mins):
+                # The first bins, or bins were dropped: start anew
+                first_bin = item_first_bin
+                mins, maxs = new_mins, new_maxs
+            else:
+                mins = np.concatenate((mins, new_mins))
+                maxs = np.concatenate((maxs, new_maxs))
+            # Keep only the bins of the window
+            if len(mins) > window_bins:
+                first_bin += len(mins) - window_bins
+                mins, maxs = mins[-window_bins:], maxs[-window_bins:]
+            updated = True
+        if finished:
+            break
+
+        if updated and plt.fignum_exists(fig.number):
+            time, values = interleave(mins, maxs, first_bin * points_per_bin,
+                                      points_per_bin, rate)
+            if lines is None:
+                lines = ax.plot(time, values)
+            else:
+                for chan, line in enumerate(lines):
+                    line.set_data(time, values[:, chan])
+            ax.set_xlim(max(time[-1] - window_seconds, 0),
+                        max(time[-1], window_seconds))
+            ax.relim()
+            ax.autoscale_view(scalex=False)
+            fig.canvas.draw_idle()
+        plt.pause(1 / fps)
+    plt.close(fig)
+
+
+class LiveMonitor:
+    """Shows the last window_seconds of all channels while recording.
+
+    Pass update as on_chunk to run_acquisition() (see Acquisition.py) and
+    call close() when the recording is over.
+
+    Parameters
+    ----------
+    rate : int
+        Rate of the recording (in Hz).
+    window_seconds : float, optional
+        How many seconds are shown. Default is 10s.
+    fps : float, optional
+        How often the plot is redrawn (per s). Default is 10.
+    max_bins : int, optional
+        At most this many bins (two values each) per channel in the window.
+        Default is 1000.
+    title : str, optional
+        Title of the plot.
+    """
+
+    def __init__(self, rate, window_seconds=10, fps=10, max_bins=1000,
+                 title='Live recording'):
+        self.rate = rate
+        self.points_per_bin = max(int(np.ceil(window_seconds * rate
+                                              / max_bins)), 1)
+        window_bins = max(int(window_seconds * rate / self.points_per_bin), 1)
+        # Points that do not fill a bin yet
+        self._rest = None
+        self.num_bins = 0
+        self.dropped = 0
+        # spawn, so that the plot does not share the state of matplotlib
+        # (or of the cards) with the recording
+        context = multiprocessing.get_context('spawn')
+        self._queue = context.Queue(maxsize=100)
+        self._process = context.Process(
+            target=_monitor_loop,
+            args=(self._queue, rate, self.points_per_bin, window_bins, fps,
+                  title),
+            daemon=True)
+        self._process.start()
+
+    def update(self, chunk):
+        """Adds the points of chunk, shape (points, channels). Never waits
+        for the plot."""
+        chunk = np.asarray(chunk, dtype=float)
+        chunk = chunk.reshape(len(chunk), -1)
+        if self._rest is not None and len(self._rest):
+            chunk = np.concatenate((self._rest, chunk))
+        mins, maxs = minmax_bins(chunk, self.points_per_bin)
+        # A copy, the chunk may be used again for the next points
+        self._rest = chunk[len(mins) * self.points_per_bin:].copy()
+        if len(mins) == 0:
+            return
+        try:
+            self._queue.put_nowait((self.num_bins, mins, maxs))
+        except queue.Full:
+            self.dropped += len(mins)
+        self.num_bins += len(mins)
+
+    def close(self, timeout=2):
+        """Closes the plot."""
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            pass
+        self._process.join(timeout)
+        if self._process.is_alive():
+            self._process.terminate()
+        if self.dropped:
+            print(str(self.dropped) + ' bins were not shown in the live plot, '
+                  'it could not keep up')
@@ -0,0 +1,319 @@
+# This script trains the readout of the reservoir: a linear map from the recorded channels (the states of the
+# reservoir) to the Target column of the stimulus, e.g. which digit was spoken. No notebook and no loading of whole
+# recordings is needed for this anymore.
+#
+# The recordings are read block by block and only the sums X^T X and X^T Y are kept (X: the recorded channels, Y: the
+# targets). Their size only depends on the number of channels, so training takes as long as reading the recordings
+# once and needs the same memory for one minute or for hours of 16 channels at a high rate. The ridge regression is
+# then solved for all regularization values (alphas) from one eigendecomposition of X^T X, and the errors on the
+# training and validation runs are calculated for all of them.
+#
+# The recordings are matched with their stimulus by the _run.json files that Run_Experiment.py and Batch_Runner.py
+# store next to every recording, so only runs with a data stimulus (with a Target column) can be used.
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+try:
+    from Recording import read_blocks, load_run
+except ImportError:
+    from .Recording import read_blocks, load_run
+
+#################################################
+# Insert your parameters here
+
+# The _run.json files of the runs to train with and of the runs to validate with (e.g. other speakers)
+run_dir = Path('C:/Users/lbongartz/Desktop/Reservoir Computing/Data/Setup_Test/Output_Test')
+train_runs = sorted(run_dir.glob('*/Batch_Test/*_run.json'))
+validation_runs = []
+
+task = 'classification' # 'classification' (the target is a class, e.g. the digit) or 'regression'
+
+alphas = np.logspace(-8, 2, 11) # The regularization values to try (per point, so they work for any amount of data)
+
+ignore_target = None # Points with this target are not used, e.g. 0 for the 0V between the snippets. None uses all.
+
+# Where should the trained readout be stored?
+readout_file = run_dir / 'Readout.npz'
+
+#################################################
+
+
+class RidgeAccumulator:
+    """The sums needed for ridge regression (X^T X, X^T Y, Y^T Y and the
+    sums of X and Y), updated block by block.
+
+    The sums are taken around the mean of the first block, which keeps them
+    precise when the channels have a large offset.
+    """
+
+    def __init__(self):
+        self.num_points = 0
+        self.shift_x = None
+        self.shift_y = None
+
+    def update(self, x, y):
+        """Adds the points x (shape (points, features)) with the targets y
+        (shape (points, outputs))."""
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float).reshape(len(x), -1)
+        if len(x) == 0:
+            return
+        if self.shift_x is None:
+            self.shift_x = x.mean(axis=0)
+            self.shift_y = y.mean(axis=0)
+            self.xx = np.zeros((x.shape[1], x.shape[1]))
+            self.xy = np.zeros((x.shape[1], y.shape[1]))
+            self.yy = np.zeros(y.shape[1])
+            self.sum_x = np.zeros(x.shape[1])
+            self.sum_y = np.zeros(y.shape[1])
+        x = x - self.shift_x
+        y = y - self.shift_y
+        self.xx += x.T @ x
+        self.xy += x.T @ y
+        self.yy += (y * y).sum(axis=0)
+        self.sum_x += x.sum(axis=0)
+        self.sum_y += y.sum(axis=0)
+        self.num_points += len(x)
+
+    def centered(self):
+        """The means of X and Y and the sums around them: mean_x, mean_y,
+        X^T X, X^T Y and Y^T Y (per output)."""
+        if self.num_points == 0:
+            raise Exception('Error: There are no points to train with')
+        n = self.num_points
+        mean_x = self.sum_x / n
+        mean_y = self.sum_y / n
+        xx = self.xx - n * np.outer(mean_x, mean_x)
+        xy = self.xy - n * np.outer(mean_x, mean_y)
+        yy = self.yy - n * mean_y**2
+        return mean_x + self.shift_x, mean_y + self.shift_y, xx, xy, yy
+
+
+def solve_ridge(acc, alphas):
+    """Solves the ridge regression for all alphas from one
+    eigendecomposition.
+
+    Parameters
+    ----------
+    acc : RidgeAccumulator
+        The sums of the training data.
+    alphas : list of float
+        The regularization values, per point (the penalty is alpha times the
+        number of points). The bias is not regularized.
+
+    Returns
+    -------
+    weights : numpy.ndarray
+        Shape (alphas, features, outputs).
+    biases : numpy.ndarray
+        Shape (alphas, outputs).
+    """
+    mean_x, mean_y, xx, xy, _ = acc.centered()
+    eigvals, eigvecs = np.linalg.eigh(xx)
+    eigvals = np.clip(eigvals, 0, None)
+    projected = eigvecs.T @ xy
+    weights = np.stack([eigvecs @ (projected / (eigvals + alpha
+                                                 * acc.num_points)[:, None])
+                        for alpha in alphas])
+    biases = mean_y - mean_x @ weights
+    return weights, biases
+
+
+def ridge_mse(acc, weights, biases):
+    """The mean squared error of all alphas on the data of acc, from its
+    sums alone. Shape (alphas, outputs)."""
+    mean_x, mean_y, xx, xy, yy = acc.centered()
+    sse = (yy - 2 * np.einsum('afk,fk->ak', weights, xy)
+           + np.einsum('afk,fg,agk->ak', weights, xx, weights))
+    # The error of the mean
+    sse += acc.num_points * (mean_y - mean_x @ weights - biases)**2
+    return sse / acc.num_points
+
+
+class Readout:
+    """A linear readout, trained with ridge regression for several alphas.
+
+    Parameters
+    ----------
+    alphas : list of float
+        The regularization values, see solve_ridge().
+    classes : list, optional
+        For classification: all classes of the target. The target is then
+        one-hot encoded and the class with the largest output is predicted.
+        None for regression.
+    """
+
+    def __init__(self, alphas, classes=None):
+        self.alphas = np.asarray(alphas, dtype=float)
+        self.classes = None if classes is None else np.asarray(classes)
+        self.train = RidgeAccumulator()
+        self.validation = RidgeAccumulator()
+        self.weights = None
+        self.biases = None
+
+    def encode(self, targets):
+        """The targets as the readout should output them."""
+        targets = np.asarray(targets)
+        if self.classes is None:
+            return targets.reshape(len(targets), -1)
+        return (targets[:, None] == self.classes[None, :]).astype(float)
+
+    def add(self, states, targets, validation=False):
+        """Adds the recorded states (shape (points, channels)) and their
+        targets to the training (or validation) data."""
+        acc = self.validation if validation else self.train
+        acc.update(states, self.encode(targets))
+
+    def fit(self):
+        self.weights, self.biases = solve_ridge(self.train, self.alphas)
+
+    def output(self, states, alpha_index):
+        return np.asarray(states, dtype=float) @ self.weights[alpha_index] \
+            + self.biases[alpha_index]
+
+    def predict(self, states, alpha_index):
+        """The predicted targets (the classes for classification)."""
+        output = self.output(states, alpha_index)
+        if self.classes is None:
+            return output
+        return self.classes[np.argmax(output, axis=1)]
+
+    def accuracy(self, blocks):
+        """The share of correctly classified points for all alphas, in one
+        pass over blocks (an iterable of (states, targets))."""
+        correct = np.zeros(len(self.alphas))
+        num_points = 0
+        for states, targets in blocks:
+            for k in range(len(self.alphas)):
+                correct[k] += np.sum(self.predict(states, k) == targets)
+            num_points += len(targets)
+        return correct / max(num_points, 1)
+
+    def metrics(self, train_blocks=None, validation_blocks=None):
+        """The errors of all alphas on the training and validation data.
+
+        The mean squared errors come from the sums alone. For
+        classification, the accuracies need one more pass over the blocks
+        (iterables of (states, targets), e.g. from run_blocks()).
+
+        Returns
+        -------
+        pandas.DataFrame
+            One row per alpha.
+        """
+        table = pd.DataFrame({'alpha': self.alphas})
+        table['train_mse'] = ridge_mse(self.train, self.weights,
+                                       self.biases).mean(axis=1)
+        if self.validation.num_points:
+            table['validation_mse'] = ridge_mse(
+                self.validation, self.weights, self.biases).mean(axis=1)
+        if self.classes is not None:
+            if train_blocks is not None:
+                table['train_accuracy'] = self.accuracy(train_blocks)
+            if validation_blocks is not None:
+                table['validation_accuracy'] = self.accuracy(
+                    validation_blocks)
+        return table
+
+    def best(self, table):
+        """The index of the best alpha: by the validation accuracy or error
+        if there are validation runs, else by the training error."""
+        if 'validation_accuracy' in table:
+            return int(np.argmax(table['validation_accuracy'].to_numpy()))
+        if 'validation_mse' in table:
+            return int(np.argmin(table['validation_mse'].to_numpy()))
+        return int(np.argmin(table['train_mse'].to_numpy()))
+
+    def save(self, file, alpha_index):
+        np.savez(file, weights=self.weights[alpha_index],
+                 bias=self.biases[alpha_index],
+                 alpha=self.alphas[alpha_index],
+                 classes=self.classes if self.classes is not None else [])
+
+
+def stimulus_targets(run):
+    """The Target column (the last one) of the stimulus of a run, at the
+    rate of the stimulus file."""
+    spec = run.get('info') or {}
+    if spec.get('type') != 'data':
+        raise Exception('Error: The run of ' + str(run['record_file'])
+                        + ' has no data stimulus, so there is no target')
+    name = spec.get('target', list(pd.read_csv(spec['file'],
+                                               nrows=0).columns)[-1])
+    return pd.read_csv(spec['file'], usecols=[name])[name].to_numpy()
+
+
+def run_blocks(run_file, block_points=100000):
+    """Reads the recording of a run block by block, together with the
+    target of the stimulus at every recorded point.
+
+    Only the points recorded while the stimulus was output are used (and
+    not those with ignore_target). The target of a point is the target of
+    the stimulus point that was output at that time, from the start times
+    stored in the _run.json file.
+
+    Yields
+    ------
+    states : numpy.ndarray
+        The recorded channels, shape (points, channels).
+    targets : numpy.ndarray
+        The target of every point.
+    """
+    run = load_run(run_file)
+    targets = stimulus_targets(run)
+    stimulus_rate = run['info']['rate']
+    offset = run['output_start_offset'] or 0
+    start = 0
+    for states in read_blocks(run['record_file'], block_points):
+        time = (start + np.arange(len(states))) / run['input_rate']
+        start += len(states)
+        index = np.floor((time - offset) * stimulus_rate).astype(int)
+        valid = (index >= 0) & (index < len(targets))
+        block_targets = targets[np.clip(index, 0, len(targets) - 1)]
+        if ignore_target is not None:
+            valid &= block_targets != ignore_target
+        if valid.any():
+            yield states[valid], block_targets[valid]
+
+
+def run_example():
+    if not train_runs:
+        raise Exception('Error: No runs to train with')
+
+    classes = None
+    if task == 'classification':
+        classes = np.unique(np.concatenate(
+            [stimulus_targets(load_run(run_file)) for run_file in train_runs]))
+        if ignore_target is not None:
+            classes = classes[classes != ignore_target]
+        print('Classes: ' + ', '.join(str(c) for c in classes))
+
+    readout = Readout(alphas, classes)
+    for runs, validation in [(train_runs, False), (validation_runs, True)]:
+        for run_file in runs:
+            print('Reading ' + str(run_file))
+            for states, targets in run_blocks(run_file):
+                readout.add(states, targets, validation)
+    print('Training with ' + str(readout.train.num_points) + ' points, '
+          'validating with ' + str(readout.validation.num_points) + ' points')
+    readout.fit()
+
+    def blocks(runs):
+        for run_file in runs:
+            yield from run_blocks(run_file)
+
+    table = readout.metrics(blocks(train_runs),
+                            blocks(validation_runs) if validation_runs
+                            else None)
+    print(table.to_string(index=False))
+    best = readout.best(table)
+    print('Best alpha: ' + str(readout.alphas[best]))
+    readout.save(readout_file, best)
+    print('Readout stored in ' + str(readout_file))
+
+
+if __name__ == '__main__':
+    run_example()
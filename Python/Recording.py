@@ -0,0 +1,552 @@
+# This file is for storing the data that the Input_Board scripts record. You do not need to change anything here.
+#
+# There are two formats:
+#   - 'csv': the (tab-separated) text file you already know, with the time in the first column. Easy to open, but
+#     big and slow to write.
+#   - 'binary': the raw numbers (float32) in a .bin file, plus a small .json file next to it with the rate, channels,
+#     range and start time. It is written in one go per chunk, is much smaller and can be opened with
+#     open_recording() without loading it into memory, even if it is several GB.
+#   - 'counts': like 'binary', but the raw counts of the cards (16 bit integers) instead of volts, half the size of
+#     'binary' and about a tenth of 'csv'. How to convert them to volts (the voltage of count 0 and of one count, for
+#     every channel) is stored once in the .json file. open_recording() converts them when you read a part of the
+#     recording, so it is used just like a 'binary' recording.
+#
+# Writing to the disk happens in a separate thread (BackgroundWriter), so that a slow disk never holds up the loop
+# that copies the data out of the buffer of the card.
+
+from collections import deque
+from datetime import datetime
+import json
+from pathlib import Path
+import queue
+import threading
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+
+
+class CSVSink:
+    """Writes the recorded values as tab-separated text, one line per point:
+    the point number, the time (in s) and one column per channel.
+
+    The time is calculated from the number of the point and the rate while
+    writing, so the file is finished as soon as the recording stops.
+    """
+
+    def __init__(self, file, channel_names, rate):
+        self.file = str(file)
+        self.num_chans = len(channel_names)
+        self.rate = rate
+        self.num_points = 0
+        # Values of a point whose channels are not all there yet
+        self._rest = np.zeros(0)
+        self._row_format = '%d\t%r' + '\t%r' * self.num_chans + '\n'
+        self._f = open(self.file, 'w')
+        # Write a header to the file
+        self._f.write('\tTime\t' + '\t'.join(channel_names) + '\n')
+
+    def write(self, values):
+        """Writes a chunk of interleaved values (Ch0, Ch1, ..., Ch0, ...).
+        The chunk does not have to end with the last channel."""
+        values = np.concatenate((self._rest, np.asarray(values, dtype=float)))
+        num_points = len(values) // self.num_chans
+        self._rest = values[num_points * self.num_chans:]
+        rows = values[:num_points * self.num_chans].reshape(num_points,
+                                                            self.num_chans)
+        point_num = self.num_points + np.arange(num_points)
+        table = np.column_stack((point_num, point_num / self.rate, rows))
+        self._f.write(''.join(self._row_format % tuple(row)
+                              for row in table.tolist()))
+        self.num_points += num_points
+
+    def close(self):
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class BinarySink:
+    """Writes the recorded values as raw binary numbers, plus a .json file
+    with everything needed to read them back (see open_recording())."""
+
+    def __init__(self, file, channel_names, rate, ai_range=None,
+                 board_num=None, dtype='float32', scale=None):
+        self.file = Path(file).with_suffix('.bin')
+        self.meta_file = self.file.with_suffix('.json')
+        self.dtype = np.dtype(dtype)
+        self.num_values = 0
+        self.meta = {
+            'rate': rate,
+            'channels': list(channel_names),
+            'range': None if ai_range is None else getattr(ai_range, 'name',
+                                                           str(ai_range)),
+            'board_num': board_num,
+            'start_time': datetime.now().isoformat(),
+            'dtype': self.dtype.str,
+            'num_points': 0,
+        }
+        if scale is not None:
+            # Raw counts: V = offset + counts * lsb, for every channel
+            offset, lsb = scale
+            self.meta['scale'] = {'offset': [float(v) for v in offset],
+                                  'lsb': [float(v) for v in lsb]}
+        self._f = open(self.file, 'wb')
+        self._write_meta()
+
+    def _write_meta(self):
+        with open(self.meta_file, 'w') as f:
+            json.dump(self.meta, f, indent=4)
+
+    def write(self, values):
+        """Writes a chunk of interleaved values (Ch0, Ch1, ..., Ch0, ...) as
+        one block."""
+        values = np.asarray(values, dtype=self.dtype)
+        values.tofile(self._f)
+        self.num_values += values.size
+
+    def close(self):
+        self._f.close()
+        self.meta['num_points'] = self.num_values // len(self.meta['channels'])
+        self._write_meta()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ChunkPool:
+    """Arrays of one shape that are used again for the next chunks instead
+    of allocating new ones.
+
+    take() gives a free array (a new one only if all are in use) and
+    give_back() returns it once it is not needed anymore, e.g. when the
+    BackgroundWriter has written it. Both may be called from different
+    threads.
+
+    Parameters
+    ----------
+    shape : tuple of int
+        Shape of the arrays, e.g. (points, channels) of a chunk.
+    dtype : numpy.dtype or str, optional
+        Default is float.
+    """
+
+    def __init__(self, shape, dtype=float):
+        self.shape = shape
+        self.dtype = np.dtype(dtype)
+        self.num_allocated = 0
+        self._free = deque()
+
+    def take(self):
+        try:
+            return self._free.pop()
+        except IndexError:
+            self.num_allocated += 1
+            return np.empty(self.shape, dtype=self.dtype)
+
+    def give_back(self, array):
+        self._free.append(array)
+
+
+class BackgroundWriter:
+    """Hands the chunks over to a sink that runs in its own thread.
+
+    write() only puts the chunk into a bounded queue (copied, or handed over
+    as it is with copy=False) and returns right away, the writer thread then
+    drains the queue into the sink. If the
+    queue is full (the disk is much slower than the card for a long time),
+    write() waits until there is space again.
+
+    Parameters
+    ----------
+    sink : CSVSink or BinarySink
+        Where the chunks are written to.
+    max_chunks : int, optional
+        How many chunks can wait in the queue. Default is 100.
+    """
+
+    def __init__(self, sink, max_chunks=100):
+        self.sink = sink
+        self.max_chunks = max_chunks
+        self._queue = queue.Queue(maxsize=max_chunks)
+        self._error = None
+
+        # Statistics, see report()
+        self.num_chunks = 0
+        self.max_depth = 0
+        self.num_full = 0
+        self.total_lag = 0
+        self.max_lag = 0
+        self.lags = []
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            put_time, values, release = item
+            if self._error is not None:
+                # Keep draining the queue, so that write() does not block
+                if release is not None:
+                    release()
+                continue
+            try:
+                self.sink.write(values)
+            except Exception as e:
+                self._error = e
+                continue
+            finally:
+                if release is not None:
+                    release()
+            lag = perf_counter() - put_time
+            self.num_chunks += 1
+            self.total_lag += lag
+            self.max_lag = max(self.max_lag, lag)
+            self.lags.append(lag)
+
+    def write(self, values, timestamp=None, copy=True, release=None):
+        """Puts the chunk into the queue.
+
+        The lag of the chunk is counted from timestamp (a perf_counter()
+        time, e.g. when its last point was measured), or from now if it is
+        None.
+
+        With copy=False, values is handed over without copying it and must
+        not be changed until it is written. Then release (if given) is
+        called without arguments, e.g. to give values back to its
+        ChunkPool.
+        """
+        if self._error is not None:
+            raise self._error
+        if timestamp is None:
+            timestamp = perf_counter()
+        if copy:
+            values = np.array(values, copy=True)
+        item = (timestamp, values, release)
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self.num_full += 1
+            self._queue.put(item)
+        self.max_depth = max(self.max_depth, self._queue.qsize())
+
+    @property
+    def depth(self):
+        """How many chunks are waiting to be written right now."""
+        return self._queue.qsize()
+
+    def close(self):
+        """Waits until all chunks are written and closes the sink."""
+        self._queue.put(None)
+        self._thread.join()
+        self.sink.close()
+        if self._error is not None:
+            raise self._error
+
+    def report(self):
+        """Prints how far the writer was behind the acquisition."""
+        mean_lag = self.total_lag / self.num_chunks if self.num_chunks else 0
+        print('\nWriter: ' + str(self.num_chunks) + ' chunks written, max. '
+              'queue depth ' + str(self.max_depth) + '/' + str(self.max_chunks)
+              + ', lag mean ' + '{:.3f}'.format(mean_lag) + 's / max '
+              + '{:.3f}'.format(self.max_lag) + 's')
+        if self.num_full > 0:
+            print('Warning: the queue was full ' + str(self.num_full) + ' '
+                  'times, the acquisition had to wait for the disk')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        self.report()
+
+
+def open_sink(file_format, file, channel_names, rate, ai_range=None,
+              board_num=None, scale=None):
+    """Returns the sink for file_format ('csv', 'binary' or 'counts').
+
+    For 'counts', scale is (offset, lsb) with one value per channel, see
+    ScaledRecording.
+    """
+    if file_format == 'csv':
+        return CSVSink(file, channel_names, rate)
+    elif file_format == 'binary':
+        return BinarySink(file, channel_names, rate, ai_range, board_num)
+    elif file_format == 'counts':
+        if scale is None:
+            raise ValueError('Raw counts need the scale of every channel')
+        return BinarySink(file, channel_names, rate, ai_range, board_num,
+                          'uint16', scale)
+    raise ValueError('Unknown file format "' + str(file_format) + '". '
+                     'Use "csv", "binary" or "counts".')
+
+
+class ScaledRecording:
+    """The raw counts of a recording, converted to volts when they are
+    read.
+
+    Indexing works like for the memmap of the counts (e.g. data[start:end]
+    or data[:, chan]), but gives the values in V. Only the part that is
+    read is converted, all channels at once.
+
+    Parameters
+    ----------
+    counts : numpy.memmap
+        The counts, shape (points, channels).
+    offset, lsb : list of float
+        The voltage of count 0 and of one count, for every channel.
+    """
+
+    def __init__(self, counts, offset, lsb):
+        self.counts = counts
+        self.offset = np.asarray(offset, dtype=float)
+        self.lsb = np.asarray(lsb, dtype=float)
+        self.shape = counts.shape
+        self.ndim = counts.ndim
+        self.dtype = np.dtype(float)
+
+    def __len__(self):
+        return len(self.counts)
+
+    def __getitem__(self, key):
+        # Offset and lsb as arrays of the shape of the counts (without
+        # copying), so that any index picks the right ones
+        offset = np.broadcast_to(self.offset, self.shape)[key]
+        lsb = np.broadcast_to(self.lsb, self.shape)[key]
+        return offset + self.counts[key] * lsb
+
+    def __array__(self, dtype=None, copy=None):
+        values = self[:]
+        return values if dtype is None else values.astype(dtype)
+
+    def rows(self, start, stop):
+        """The points start to stop as ScaledRecording, without reading
+        them."""
+        return ScaledRecording(self.counts[start:stop], self.offset,
+                               self.lsb)
+
+
+def open_recording(file):
+    """Opens a binary recording without loading it into memory.
+
+    Parameters
+    ----------
+    file : str or Path
+        The .bin file (or its .json file).
+
+    Returns
+    -------
+    data : numpy.memmap or ScaledRecording
+        The recording, shape (points, channels). Recordings of raw counts
+        are converted to V when they are read, see ScaledRecording.
+    meta : dict
+        rate, channels, range, board_num, start_time, dtype, num_points and,
+        for raw counts, scale.
+    """
+    file = Path(file).with_suffix('.bin')
+    with open(file.with_suffix('.json')) as f:
+        meta = json.load(f)
+    dtype = np.dtype(meta['dtype'])
+    num_chans = len(meta['channels'])
+    # If the recording was not closed properly, num_points is not up to
+    # date, so it is taken from the size of the file instead
+    num_points = file.stat().st_size // (dtype.itemsize * num_chans)
+    data = np.memmap(file, dtype=dtype, mode='r',
+                     shape=(num_points, num_chans))
+    if 'scale' in meta:
+        data = ScaledRecording(data, meta['scale']['offset'],
+                               meta['scale']['lsb'])
+    return data, meta
+
+
+def read_blocks(file, block_points=100000):
+    """Reads a recording (.bin or .csv) block by block, so that it never has
+    to fit into memory.
+
+    Parameters
+    ----------
+    file : str or Path
+        The recording, as written by the Input_Board scripts.
+    block_points : int, optional
+        Points per block. Default is 100000.
+
+    Yields
+    ------
+    numpy.ndarray
+        The values of all channels, shape (points, channels).
+    """
+    if Path(file).suffix in ('.bin', '.json'):
+        data, meta = open_recording(file)
+        for start in range(0, len(data), block_points):
+            yield np.asarray(data[start:start + block_points], dtype=float)
+    else:
+        for df in pd.read_csv(file, sep='\t', index_col=0,
+                              chunksize=block_points):
+            yield df.drop(columns='Time').to_numpy(dtype=float)
+
+
+def read_points(file, start, num_points):
+    """Reads only the points start to start + num_points of a recording
+    (.bin or .csv), shape (points, channels).
+
+    For .csv files all lines before start are parsed again on every call;
+    to read several parts one after the other, use SequentialReader."""
+    start = max(int(start), 0)
+    if Path(file).suffix in ('.bin', '.json'):
+        data, meta = open_recording(file)
+        return np.asarray(data[start:start + num_points], dtype=float)
+    df = pd.read_csv(file, sep='\t', index_col=0,
+                     skiprows=range(1, start + 1), nrows=num_points)
+    return df.drop(columns='Time').to_numpy(dtype=float)
+
+
+class SequentialReader:
+    """Reads parts of a recording (.bin or .csv) one after the other, each
+    starting at or after the start of the one before.
+
+    Binary recordings are read with read_points(). Csv files are read only
+    once from start to end, block by block (see read_blocks()), and only the
+    points from the start of the last part on are kept, so reading all parts
+    of a long recording takes one pass over the file.
+
+    Parameters
+    ----------
+    file : str or Path
+        The recording, as written by the Input_Board scripts.
+    block_points : int, optional
+        Points per block read from a csv file. Default is 100000.
+    """
+
+    def __init__(self, file, block_points=100000):
+        self.file = file
+        self.binary = Path(file).suffix in ('.bin', '.json')
+        self._blocks = None if self.binary else read_blocks(file,
+                                                            block_points)
+        self._parts = []
+        # The number of the first point of _parts
+        self._start = 0
+
+    @property
+    def position(self):
+        """The first point that can still be read."""
+        return self._start
+
+    def read(self, start, num_points):
+        """The points start to start + num_points, shape (points,
+        channels)."""
+        start = max(int(start), 0)
+        if self.binary:
+            return read_points(self.file, start, num_points)
+        if start < self._start:
+            raise Exception('Error: ' + str(self.file) + ' can only be read '
+                            'forward, point ' + str(start) + ' was passed '
+                            'already')
+        end = self._start + sum(len(part) for part in self._parts)
+        while end < start + num_points:
+            block = next(self._blocks, None)
+            if block is None:
+                break
+            self._parts.append(block)
+            end += len(block)
+            # Blocks before start are not needed again
+            while (self._parts
+                   and self._start + len(self._parts[0]) <= start):
+                self._start += len(self._parts.pop(0))
+        if not self._parts:
+            return np.zeros((0, 0))
+        values = np.concatenate(self._parts)[start - self._start:]
+        self._parts = [values]
+        self._start = start
+        return values[:num_points]
+
+
+class CSVRecording:
+    """A .csv recording that is read from the file when it is indexed, like
+    the memmap of a binary recording, instead of being kept in memory.
+
+    Only points can be indexed, in slices (e.g. data[start:end]). They are
+    read with a SequentialReader, so reading the recording from start to end
+    block by block (as Decimation.envelope() and
+    Spectral_Analysis.welch_psd() do) takes one pass over the file. A slice
+    before the last one starts again at the top of the file.
+
+    Parameters
+    ----------
+    file : str or Path
+        The .csv recording.
+    num_points, num_chans : int, optional
+        The size of the recording, if known. By default they are taken from
+        the file.
+    """
+
+    def __init__(self, file, num_points=None, num_chans=None):
+        self.file = file
+        if num_points is None:
+            num_points = recording_length(file)
+        if num_chans is None:
+            # All columns but the point number and the time
+            num_chans = len(pd.read_csv(file, sep='\t', nrows=0).columns) - 2
+        self.shape = (num_points, num_chans)
+        self.ndim = 2
+        self.dtype = np.dtype(float)
+        self._reader = None
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice) or key.step not in (None, 1):
+            raise Exception('Error: A csv recording can only be read in '
+                            'slices of points, e.g. data[start:end]')
+        start, stop, _ = key.indices(len(self))
+        if self._reader is None or start < self._reader.position:
+            self._reader = SequentialReader(self.file)
+        values = self._reader.read(start, max(stop - start, 0))
+        return values.reshape(len(values), self.shape[1])
+
+    def __array__(self, dtype=None, copy=None):
+        values = self[:]
+        return values if dtype is None else values.astype(dtype)
+
+
+def recording_rate(file):
+    """The rate (in Hz) of a recording: from the .json file of binary
+    recordings, from the time column of .csv recordings."""
+    if Path(file).suffix in ('.bin', '.json'):
+        with open(Path(file).with_suffix('.json')) as f:
+            return json.load(f)['rate']
+    time = pd.read_csv(file, sep='\t', index_col=0, nrows=2)['Time']
+    return round(1 / (time.iloc[1] - time.iloc[0]), 6)
+
+
+def recording_length(file):
+    """The number of points of a recording (.bin or .csv), without reading
+    its values."""
+    if Path(file).suffix in ('.bin', '.json'):
+        data, meta = open_recording(file)
+        return len(data)
+    with open(file, 'rb') as f:
+        # All non-empty lines but the header
+        return sum(1 for line in f if line.strip()) - 1
+
+
+def load_run(run_file):
+    """The run metadata of a _run.json file (see Experiment.py)."""
+    with open(run_file) as f:
+        run = json.load(f)
+    # If the folder was moved, the recording is next to its _run.json file
+    record_file = Path(run['record_file'])
+    if not record_file.exists():
+        run['record_file'] = str(Path(run_file).with_name(record_file.name))
+    return run
@@ -0,0 +1,263 @@
+# This file converts data to another rate, e.g. the speech data (prepared at 100Hz) to the rate of the output of the
+# card (e.g. 500Hz), so you do not have to prepare the data again by hand for every rate. You do not need to change
+# anything here.
+#
+# The data is resampled with a polyphase filter (scipy.signal.resample_poly), for all points and channels at once. It
+# can also be done piece by piece while the data is output (resample_chunks()), which gives the same result as
+# resampling all data at once. For prepared datasets (see Data_Preparation.py), resample_prepared() (and
+# resample_prepared_chunks() for data coming piece by piece) keeps the 0V between the snippets exactly: it starts and
+# ends at the same times as before and keeps its value.
+
+from fractions import Fraction
+
+import numpy as np
+from scipy import signal
+
+
+def resample_factors(rate_in, rate_out):
+    """The factors up and down with rate_out / rate_in = up / down.
+
+    Parameters
+    ----------
+    rate_in, rate_out : int or float
+        The rate of the data and the rate it is converted to (in Hz).
+
+    Returns
+    -------
+    up, down : int
+        The smallest integers with rate_out / rate_in = up / down.
+    """
+    if rate_in <= 0 or rate_out <= 0:
+        raise Exception('Error: The rates must be positive, got '
+                        + str(rate_in) + ' and ' + str(rate_out))
+    ratio = Fraction(str(rate_out)) / Fraction(str(rate_in))
+    return ratio.numerator, ratio.denominator
+
+
+def resample(values, rate_in, rate_out):
+    """Resamples values (shape (points, channels)) from rate_in to rate_out.
+
+    The result has ceil(points * rate_out / rate_in) points.
+    """
+    up, down = resample_factors(rate_in, rate_out)
+    if up == down:
+        return values
+    return signal.resample_poly(np.asarray(values, dtype=float), up, down,
+                                axis=0)
+
+
+def _filter_reach(up, down):
+    # How far (in input points) the filter of resample_poly() reaches to each
+    # side, rounded up to a multiple of down
+    reach = -(-10 * max(up, down) // up) + 1
+    return -(-reach // down) * down
+
+
+def _resample_part(x, offset, count, pad, up, down):
+    # Resamples the points offset to offset + count of x (count None: to the
+    # end), using up to pad points before and after them as context
+    seg_start = max(offset - pad, 0)
+    if count is None:
+        y = signal.resample_poly(x[seg_start:], up, down, axis=0)
+        return y[(offset - seg_start) * up // down:]
+    y = signal.resample_poly(x[seg_start:offset + count + pad], up, down,
+                             axis=0)
+    first = (offset - seg_start) * up // down
+    return y[first:first + count * up // down]
+
+
+def resample_chunks(chunks, rate_in, rate_out, block_points=10000):
+    """Resamples data coming piece by piece, e.g. while it is output.
+
+    The result is the same as resample() of all data at once: every block is
+    resampled together with the points around it that the filter reaches.
+
+    Parameters
+    ----------
+    chunks : iterable
+        Generator or chunked file reader, which yields arrays of shape
+        (points, channels), e.g. AO_Streaming.read_csv_chunks().
+    rate_in, rate_out : int or float
+        The rate of the data and the rate it is converted to (in Hz).
+    block_points : int, optional
+        Input points resampled at once. Default is 10000.
+
+    Yields
+    ------
+    numpy.ndarray
+        The resampled data, shape (points, channels).
+    """
+    up, down = resample_factors(rate_in, rate_out)
+    pad = _filter_reach(up, down)
+    # The blocks start at multiples of down, so that every block lines up
+    # with the points of the new rate
+    block_points = -(-block_points // down) * down
+    pending = None # The input points from start on
+    start = 0      # Index (in the input) of pending[0]
+    done = 0       # The input points before done are resampled
+
+    for chunk in chunks:
+        chunk = np.asarray(chunk, dtype=float)
+        if chunk.ndim == 1:
+            chunk = chunk.reshape(-1, 1)
+        if up == down:
+            yield chunk
+            continue
+        pending = chunk if pending is None else np.concatenate((pending,
+                                                                chunk))
+        while start + len(pending) >= done + block_points + pad:
+            yield _resample_part(pending, done - start, block_points, pad,
+                                 up, down)
+            done += block_points
+            # Only keep the points before done that the filter reaches
+            cut = max(done - pad - start, 0)
+            pending = pending[cut:]
+            start += cut
+
+    if pending is not None and done < start + len(pending):
+        yield _resample_part(pending, done - start, None, pad, up, down)
+
+
+def resampled_length(num_points, rate_in, rate_out):
+    """The number of points of num_points points after resampling."""
+    up, down = resample_factors(rate_in, rate_out)
+    return -(-num_points * up // down)
+
+
+def resample_boundaries(boundaries, rate_in, rate_out):
+    """The boundaries of the snippets of a prepared dataset (see
+    Data_Preparation.prepare_files()) at the new rate, rounded to the
+    nearest point."""
+    up, down = resample_factors(rate_in, rate_out)
+    new = boundaries.copy()
+    new['start'] = (boundaries['start'].to_numpy() * up + down // 2) // down
+    new['end'] = (boundaries['end'].to_numpy() * up + down // 2) // down
+    new['start_time'] = new['start'] / rate_out
+    new['end_time'] = new['end'] / rate_out
+    return new
+
+
+def resample_prepared(data, boundaries, rate_in, rate_out, hold, out=None,
+                      block_points=100000):
+    """Resamples a prepared dataset (see Data_Preparation.py).
+
+    The data columns are resampled with the polyphase filter. The columns in
+    hold (the time and the target column) are held, i.e. every new point
+    gets the value of the last point before it. The 0V between the snippets
+    keeps its value and its start and end times (rounded to the new rate).
+
+    Parameters
+    ----------
+    data : numpy.ndarray or numpy.memmap
+        The prepared data, shape (points, columns).
+    boundaries : pandas.DataFrame
+        Where every snippet starts and ends, see
+        Data_Preparation.prepare_files().
+    rate_in, rate_out : int or float
+        The rate of the data and the rate it is converted to (in Hz).
+    hold : list of int
+        The indices of the columns that are held, see
+        Data_Preparation.held_columns().
+    out : numpy.ndarray or numpy.memmap, optional
+        Where to write the result, shape (new points, columns), see
+        resampled_length(). If None, a new array is returned.
+    block_points : int, optional
+        Input points resampled at once. Default is 100000.
+
+    Returns
+    -------
+    out : numpy.ndarray or numpy.memmap
+        The resampled data.
+    boundaries : pandas.DataFrame
+        The boundaries at the new rate.
+    """
+    up, down = resample_factors(rate_in, rate_out)
+    num_points, num_cols = data.shape
+    num_out = resampled_length(num_points, rate_in, rate_out)
+    if out is None:
+        out = np.empty((num_out, num_cols), dtype=data.dtype)
+    hold = list(hold)
+    columns = [k for k in range(num_cols) if k not in hold]
+
+    blocks = (data[start:start + block_points, columns]
+              for start in range(0, num_points, block_points))
+    pos = 0
+    for block in resample_chunks(blocks, rate_in, rate_out, block_points):
+        out[pos:pos + len(block), columns] = block
+        if hold:
+            # The last input point at or before every new point
+            index = np.arange(pos, pos + len(block)) * down // up
+            rows = np.asarray(data[index[0]:index[-1] + 1])
+            out[pos:pos + len(block), hold] = rows[index - index[0]][:, hold]
+        pos += len(block)
+
+    new = resample_boundaries(boundaries, rate_in, rate_out)
+    # Between the snippets, the 0V (plus offset) of the prepared data
+    gap_ends = list(new['start'][1:]) + [num_out]
+    for end, gap_start, gap_end in zip(boundaries['end'], new['end'],
+                                       gap_ends):
+        if end < num_points and gap_start < gap_end:
+            out[gap_start:gap_end, columns] = np.asarray(data[end])[columns]
+    return out, new
+
+
+def resample_prepared_chunks(chunks, boundaries, rate_in, rate_out,
+                             block_points=10000):
+    """Resamples a prepared dataset coming piece by piece, e.g. while it is
+    output.
+
+    Like resample_prepared() without held columns: all columns are resampled
+    with the polyphase filter (see resample_chunks()), and the 0V between
+    the snippets keeps its value and its start and end times.
+
+    Parameters
+    ----------
+    chunks : iterable
+        Yields arrays of shape (points, channels), e.g.
+        AO_Streaming.read_csv_chunks().
+    boundaries : pandas.DataFrame
+        Where every snippet starts and ends, see
+        Data_Preparation.prepare_files().
+    rate_in, rate_out : int or float
+        The rate of the data and the rate it is converted to (in Hz).
+    block_points : int, optional
+        Input points resampled at once. Default is 10000.
+
+    Yields
+    ------
+    numpy.ndarray
+        The resampled data, shape (points, channels).
+    """
+    up, down = resample_factors(rate_in, rate_out)
+    if up == down:
+        yield from chunks
+        return
+    ends = boundaries['end'].to_numpy()
+    new = resample_boundaries(boundaries, rate_in, rate_out)
+    gap_starts = new['end'].to_numpy()
+    gap_ends = np.append(new['start'].to_numpy()[1:], np.inf)
+    # The value of every gap, i.e. the first point after its snippet
+    gap_values = {}
+
+    def tracked_chunks():
+        start = 0
+        for chunk in chunks:
+            chunk = np.asarray(chunk, dtype=float)
+            chunk = chunk.reshape(len(chunk), -1)
+            for k in np.flatnonzero((ends >= start)
+                                    & (ends < start + len(chunk))):
+                gap_values[k] = chunk[ends[k] - start]
+            start += len(chunk)
+            yield chunk
+
+    pos = 0
+    for block in resample_chunks(tracked_chunks(), rate_in, rate_out,
+                                 block_points):
+        for k in np.flatnonzero((gap_starts < pos + len(block))
+                                & (gap_ends > pos)):
+            if k in gap_values:
+                first = max(gap_starts[k], pos) - pos
+                last = int(min(gap_ends[k], pos + len(block))) - pos
+                block[first:last] = gap_values[k]
+        pos += len(block)
+        yield block
@@ -0,0 +1,81 @@
+# This file gives numpy access to the circular buffer of a running scan, without copying through
+# ul.scaled_win_buf_to_array first. You do not need to change anything here. It is used by Acquisition.py.
+#
+# The buffer of the card is seen as one numpy array that shares its memory with the UL buffer. New data is handed
+# out as views of shape (points, channels): one view, or two when the data wraps around the end of the buffer.
+# Whoever uses the views has to be done with them before the card writes over that part of the buffer again.
+
+from __future__ import absolute_import, division, print_function
+from builtins import *  # @UnusedWildImport
+
+from ctypes import cast, POINTER, c_double
+
+import numpy as np
+
+
+class RingBuffer:
+    """numpy views of the circular UL buffer of a scan.
+
+    Parameters
+    ----------
+    memhandle : int
+        The memhandle of the buffer, e.g. from ul.scaled_win_buf_alloc.
+    count : int
+        Size of the buffer (points of all channels together). Must be a
+        multiple of num_chans.
+    num_chans : int
+        Number of channels of the scan.
+    ctype : ctypes type, optional
+        What the buffer holds: c_double for scaled data (default), c_ushort
+        for raw counts.
+    """
+
+    def __init__(self, memhandle, count, num_chans, ctype=c_double):
+        if count % num_chans != 0:
+            raise ValueError('The size of the buffer must be a multiple of '
+                             'the number of channels')
+        self.count = count
+        self.num_chans = num_chans
+        # One flat array over the whole UL buffer, no copy
+        self.array = np.ctypeslib.as_array(cast(memhandle, POINTER(ctype)),
+                                           shape=(count,))
+
+    def views(self, start, count):
+        """The count points from index start on, wrapped around the end of
+        the buffer.
+
+        Parameters
+        ----------
+        start : int
+            Index of the first point in the buffer. Must be a multiple of
+            num_chans.
+        count : int
+            Number of points (of all channels together), at most the size
+            of the buffer. Must be a multiple of num_chans.
+
+        Returns
+        -------
+        list of numpy.ndarray
+            One view, or two if the data wraps around, each of shape
+            (points, channels).
+        """
+        start %= self.count
+        end = start + count
+        if end <= self.count:
+            parts = [self.array[start:end]]
+        else:
+            parts = [self.array[start:], self.array[:end - self.count]]
+        return [part.reshape(-1, self.num_chans) for part in parts]
+
+    def copy_to(self, start, count, out=None):
+        """Copies the count points from index start on into out (shape
+        (points, channels)), e.g. a staging array that is reused for every
+        chunk. If out is None, a new array is returned."""
+        parts = self.views(start, count)
+        if out is None:
+            return np.concatenate(parts)
+        first = len(parts[0])
+        out[:first] = parts[0]
+        if len(parts) > 1:
+            out[first:first + len(parts[1])] = parts[1]
+        return out
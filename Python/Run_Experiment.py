@@ -0,0 +1,108 @@
+# This script runs a whole experiment in one terminal: it applies your functions (as set in Functions_Output.py) or
+# your prepared data file as the output of the MCC (aka input of the reservoir) and records the input of the MCC (aka
+# output of the reservoir) at the same time. No second terminal, no waiting and no closing of plot windows is needed.
+#
+# The recording is started right before the output, and stops by itself when the output is over plus the tail set
+# below. How long after the recording the output started is measured and stored, together with all settings, in a
+# _run.json file next to your recording.
+
+
+from __future__ import absolute_import, division, print_function
+from builtins import *  # @UnusedWildImport
+
+from pathlib import Path
+
+try:
+    import Functions_Output
+    from Acquisition import prepare_record_file, plot_recording, \
+        RecordingMonitors
+    from Experiment import run_experiment
+    from Waveforms import build_stimulus
+except ImportError:
+    from . import Functions_Output
+    from .Acquisition import prepare_record_file, plot_recording, \
+        RecordingMonitors
+    from .Experiment import run_experiment
+    from .Waveforms import build_stimulus
+
+#################################################
+# Insert your parameters here
+
+# What should be output? 'functions' uses the functions, time and rate set in Functions_Output.py,
+# 'data' uses the prepared data file below (see Data_preparation.py)
+stimulus = 'functions'
+
+# Only used for stimulus = 'data': the prepared file and its rate
+data_file = 'C:/Users/lbongartz/Desktop/Reservoir Computing/Data/Setup_Test/Files_combined.csv'
+data_rate = 100
+
+# Which board does the output?
+output_board = 0
+
+# Which boards (as defined in Instacal) and which input channels of them do you record?
+# One line per board: (board number, lowest input channel, highest input channel)
+boards = [(0, 0, 7)]
+
+input_rate = 500 # At what rate the input should be recorded
+
+tail = 1 # How long (in s) the recording should go on after the output is over
+
+# Do you want to plot the spectrum (power spectral density, calculated while recording)?
+FFT = False # True or False
+
+# Do you want to see the last seconds of all channels while recording?
+live_plot = False # True or False
+live_seconds = 10 # How many seconds the live plot shows
+
+# How should the output file be named?
+file_name = 'Experiment_Test.csv'
+
+# In which format should the data be stored?
+file_format = 'csv' # 'csv', 'binary' or 'counts', see Input_Board_0.py
+
+# Where should the output file be stored?
+# In this folder, a folder with todays date will be created, where the data will be stored
+parent_dir = Path('C:/Users/lbongartz/Desktop/Reservoir Computing/Data/Setup_Test/Output_Test')
+
+
+#################################################
+
+
+def stimulus_spec():
+    """Describes the output, see Waveforms.build_stimulus()."""
+    if stimulus == 'functions':
+        F = Functions_Output
+        functions, frequencies, amplitude, y_offset, duty = \
+            F.channel_settings()
+        return {'type': 'functions', 'functions': functions,
+                'frequencies': frequencies, 'amplitude': amplitude,
+                'y_offset': y_offset, 'duty': duty, 'time': F.time,
+                'rate': F.rate}
+    elif stimulus == 'data':
+        return {'type': 'data', 'file': data_file, 'rate': data_rate}
+    raise Exception('Error: Unknown stimulus "' + str(stimulus) + '". '
+                    'Use "functions" or "data".')
+
+
+# You will probably NOT need to set anything in run_example()
+def run_example():
+
+    spec = stimulus_spec()
+    values, output_rate = build_stimulus(spec)
+    record_file = prepare_record_file(parent_dir, file_name, file_format)
+    # The spectrum is calculated and the last seconds are shown while
+    # recording
+    with RecordingMonitors(input_rate, FFT, live_plot,
+                           live_seconds) as monitors:
+        data, channel_names, run = run_experiment(
+            output_board, output_rate, values, boards, input_rate, record_file,
+            tail, file_format, run_info=spec,
+            on_chunk=monitors.on_chunk)
+
+    board_names = ', '.join('Board ' + str(board[0]) for board in boards)
+    plot_recording(data, input_rate, channel_names,
+                   'Input of ' + board_names + ' / Output of Reservoir', FFT,
+                   psd=monitors.psd)
+
+if __name__ == '__main__':
+    run_example()
@@ -0,0 +1,242 @@
+# This script finds every snippet (e.g. every utterance) of a prepared stimulus in a recording, so that you do not have
+# to search for the response of the reservoir to it by eye, and thousands of snippets can be analysed without going
+# through the whole recording again for each of them.
+#
+# Data_Preparation.py stores where every snippet starts and ends (and its label) in a _boundaries.csv file next to the
+# combined file. Here, these times are shifted by the time at which the output started in the recording (from the
+# _run.json file of Run_Experiment.py or Batch_Runner.py, plus extra_lag, e.g. as measured with Alignment.py) and
+# converted to points of the recording. The result is stored as _segments.csv file next to the recording, and the lag
+# and the _boundaries.csv file it was made with in a _segments.json file. It is only used again for the same ones.
+#
+# With open_segments(), the response to every snippet is then a slice of the recording: segments[k] gives the points
+# of snippet k. For binary recordings, nothing is read until you use it.
+
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+try:
+    from Recording import open_recording, read_blocks, load_run
+except ImportError:
+    from .Recording import open_recording, read_blocks, load_run
+
+#################################################
+# Insert your parameters here
+
+# The _run.json file of the recording (see Run_Experiment.py and Batch_Runner.py)
+run_file = 'C:/Users/lbongartz/Desktop/Reservoir Computing/Data/Setup_Test/Output_Test/20230316/Experiment_Test_run.json'
+
+# The _boundaries.csv file of the stimulus. None uses the one next to the stimulus file of the run.
+boundaries_file = None
+
+extra_lag = 0 # Added to the start of the output (in s), e.g. the delay of the reservoir or a lag from Alignment.py
+
+#################################################
+
+
+def default_boundaries_file(stimulus_file):
+    """The _boundaries.csv file that Data_Preparation.py stores next to the
+    combined file."""
+    stimulus_file = Path(stimulus_file)
+    return stimulus_file.with_name(stimulus_file.stem + '_boundaries.csv')
+
+
+def map_segments(boundaries, record_rate, lag, num_points=None):
+    """Converts the boundaries of the snippets to points of a recording.
+
+    Parameters
+    ----------
+    boundaries : pandas.DataFrame
+        The boundaries of the stimulus, see Data_Preparation.prepare_files().
+        Only start_time and end_time are used, so the rate of the stimulus
+        does not matter.
+    record_rate : int
+        Rate of the recording (in Hz).
+    lag : float
+        The time (in s) in the recording at which the stimulus started.
+    num_points : int, optional
+        Number of points of the recording. Snippets are cut off at its end,
+        see the column complete.
+
+    Returns
+    -------
+    pandas.DataFrame
+        One row per snippet: file, label (if there is one), start and end
+        (points of the recording, end excluded), start_time and end_time (in
+        s of the recording) and complete (False if the snippet was not
+        completely recorded).
+    """
+    segments = boundaries.drop(columns=['start', 'end']).copy()
+    segments['start_time'] = boundaries['start_time'] + lag
+    segments['end_time'] = boundaries['end_time'] + lag
+    start = np.round(segments['start_time'].to_numpy() * record_rate)
+    end = np.round(segments['end_time'].to_numpy() * record_rate)
+    if num_points is None:
+        num_points = np.inf
+    segments['complete'] = (start >= 0) & (end <= num_points)
+    segments['start'] = np.clip(start, 0, num_points).astype(int)
+    segments['end'] = np.clip(end, 0, num_points).astype(int)
+    columns = ['file', 'label', 'start', 'end', 'start_time', 'end_time',
+               'complete']
+    return segments[[name for name in columns if name in segments]]
+
+
+def segments_file_for(record_file):
+    """The _segments.csv file next to a recording."""
+    record_file = Path(record_file)
+    return record_file.with_name(record_file.stem + '_segments.csv')
+
+
+def segments_source_for(record_file):
+    """The _segments.json file next to a recording, which tells how its
+    _segments.csv file was made."""
+    return segments_file_for(record_file).with_suffix('.json')
+
+
+def write_segments(segments, record_file, lag, boundaries_file):
+    """Stores the segments of a recording in its _segments.csv file, and
+    the lag (in s) and the _boundaries.csv file they were made with in its
+    _segments.json file."""
+    segments.to_csv(segments_file_for(record_file), index=False)
+    with open(segments_source_for(record_file), 'w') as f:
+        json.dump({'lag': float(lag),
+                   'boundaries_file': str(Path(boundaries_file))}, f,
+                  indent=4)
+
+
+def read_segments(record_file, lag, boundaries_file):
+    """The segments stored for a recording, if they were made with this
+    lag (in s) and _boundaries.csv file, else None."""
+    segments_file = segments_file_for(record_file)
+    source_file = segments_source_for(record_file)
+    if not (segments_file.exists() and source_file.exists()):
+        return None
+    with open(source_file) as f:
+        source = json.load(f)
+    if (not np.isclose(source['lag'], lag, rtol=0, atol=1e-9)
+            or source['boundaries_file'] != str(Path(boundaries_file))):
+        return None
+    return pd.read_csv(segments_file)
+
+
+def run_source(run, boundaries_file=None, extra_lag=0):
+    """The _boundaries.csv file and the lag (in s) of the stimulus of a
+    run, see segments_for_run()."""
+    spec = run.get('info') or {}
+    if boundaries_file is None:
+        if spec.get('type') != 'data':
+            raise Exception('Error: The run of ' + str(run['record_file'])
+                            + ' has no data stimulus, so there are no '
+                            'snippets')
+        boundaries_file = default_boundaries_file(spec['file'])
+    lag = (run['output_start_offset'] or 0) + extra_lag
+    return boundaries_file, lag
+
+
+def segments_for_run(run_file, boundaries_file=None, extra_lag=0):
+    """Maps the boundaries of the stimulus of a run onto its recording.
+
+    Parameters
+    ----------
+    run_file : str or Path
+        The _run.json file of the recording.
+    boundaries_file : str or Path, optional
+        The _boundaries.csv file of the stimulus. None uses the one next to
+        the stimulus file of the run.
+    extra_lag : float, optional
+        Added to the measured start of the output (in s).
+
+    Returns
+    -------
+    pandas.DataFrame
+        The segments, see map_segments().
+    """
+    run = load_run(run_file)
+    boundaries_file, lag = run_source(run, boundaries_file, extra_lag)
+    boundaries = pd.read_csv(boundaries_file)
+    return map_segments(boundaries, run['input_rate'], lag,
+                        run.get('points_written'))
+
+
+class SegmentIndex:
+    """The responses of the reservoir to every snippet, as slices of a
+    recording.
+
+    Parameters
+    ----------
+    data : numpy.ndarray or numpy.memmap
+        The recording, shape (points, channels).
+    segments : pandas.DataFrame
+        The segments, see map_segments().
+    """
+
+    def __init__(self, data, segments):
+        self.data = data
+        self.segments = segments
+        self.starts = segments['start'].to_numpy()
+        self.ends = segments['end'].to_numpy()
+        if 'label' in segments:
+            self.labels = segments['label'].to_numpy()
+        else:
+            self.labels = None
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, k):
+        """The points of snippet k, shape (points, channels)."""
+        return self.data[self.starts[k]:self.ends[k]]
+
+    def __iter__(self):
+        for k in range(len(self)):
+            yield self[k]
+
+    def with_label(self, label):
+        """The numbers of all snippets with this label."""
+        if self.labels is None:
+            raise Exception('Error: The snippets have no labels')
+        return np.flatnonzero(self.labels == label)
+
+
+def open_segments(run_file, boundaries_file=None, extra_lag=0):
+    """Opens the recording of a run with the index of its snippets.
+
+    The segments are taken from the _segments.csv file next to the
+    recording if it was made with the same lag and _boundaries.csv file (see
+    read_segments()), else they are calculated and stored there. Binary
+    recordings are memory-mapped, .csv recordings are read once.
+
+    Returns
+    -------
+    SegmentIndex
+    """
+    run = load_run(run_file)
+    record_file = Path(run['record_file'])
+    source_file, lag = run_source(run, boundaries_file, extra_lag)
+    segments = read_segments(record_file, lag, source_file)
+    if segments is None:
+        segments = segments_for_run(run_file, boundaries_file, extra_lag)
+        write_segments(segments, record_file, lag, source_file)
+    if record_file.suffix == '.bin':
+        data, _ = open_recording(record_file)
+    else:
+        data = np.concatenate(list(read_blocks(record_file)))
+    return SegmentIndex(data, segments)
+
+
+def run_example():
+    run = load_run(run_file)
+    source_file, lag = run_source(run, boundaries_file, extra_lag)
+    segments = segments_for_run(run_file, boundaries_file, extra_lag)
+    write_segments(segments, run['record_file'], lag, source_file)
+    segments_file = segments_file_for(run['record_file'])
+    print(str(len(segments)) + ' snippets, '
+          + str(int(segments['complete'].sum())) + ' completely recorded')
+    print(segments.head().to_string(index=False))
+    print('Segments stored in ' + str(segments_file))
+
+
+if __name__ == '__main__':
+    run_example()
@@ -0,0 +1,455 @@
+# This file is a software copy of the MCC cards, so that all scripts can be run (and timed) without a card, e.g. on
+# a plain Linux computer. You do not need to change anything here. To use it, set backend = 'simulator' in
+# DAQ_Backend.py or set the environment variable RC_DAQ_BACKEND=simulator.
+#
+# It provides the parts of mcculw.ul and DaqDeviceInfo that the scripts use. The scans run in real time at the rate
+# you set: get_status() counts the points in packets, like the real cards, and the circular buffers wrap around and
+# can overrun. Whatever the analog outputs apply goes through a simple model of the reservoir and comes back on the
+# analog inputs of all boards (loopback), so you can see your stimulus in the recordings.
+
+from ctypes import addressof, c_double, c_ushort, memmove
+from time import perf_counter
+
+import numpy as np
+from scipy import signal
+
+from mcculw.enums import FunctionType, ScanOptions, Status, ULRange
+
+
+#################################################
+# Settings of the simulated cards
+
+num_boards = 2 # How many cards there are (board numbers 0, 1, ...)
+num_ai_chans = 16 # Analog inputs per card
+num_ao_chans = 4 # Analog outputs per card
+resolution = 16 # Bits of the ADC and DAC
+packet_size = 32 # The cards transfer the data in packets of this many points
+noise = 0.001 # Noise (in V) on the analog inputs
+
+#################################################
+
+
+class ULError(Exception):
+    pass
+
+
+# The voltage limits of the ranges the simulated cards support
+_range_limits = {
+    ULRange.BIP10VOLTS: (-10.0, 10.0),
+    ULRange.BIP5VOLTS: (-5.0, 5.0),
+    ULRange.BIP2VOLTS: (-2.0, 2.0),
+    ULRange.BIP1VOLTS: (-1.0, 1.0),
+    ULRange.UNI10VOLTS: (0.0, 10.0),
+    ULRange.UNI5VOLTS: (0.0, 5.0),
+}
+
+
+def _lsb(ul_range):
+    low, high = _range_limits[ul_range]
+    return (high - low) / 2 ** resolution
+
+
+def _to_volts(counts, ul_range):
+    return _range_limits[ul_range][0] + counts * _lsb(ul_range)
+
+
+def _to_counts(volts, ul_range):
+    counts = np.rint((np.asarray(volts) - _range_limits[ul_range][0])
+                     / _lsb(ul_range))
+    return np.clip(counts, 0, 2 ** resolution - 1).astype(np.uint16)
+
+
+#################################################
+# The reservoir
+
+def leaky_tanh_reservoir(inputs, rate, state):
+    """A simple model of the reservoir: every analog input sees a fixed,
+    random mix of the analog outputs, squashed by tanh and low-pass filtered
+    with a time constant of 20 ms.
+
+    Parameters
+    ----------
+    inputs : numpy.ndarray
+        What the analog outputs apply, shape (points, num_ao_chans).
+    rate : float
+        The rate of the points (in Hz).
+    state : object
+        What this function returned as state the last time for this scan,
+        None at the start.
+
+    Returns
+    -------
+    outputs : numpy.ndarray
+        What the analog inputs read, shape (points, num_ai_chans).
+    state : object
+        Passed in again with the next points.
+    """
+    if state is None:
+        weights = np.random.default_rng(0).normal(
+            0, 1 / np.sqrt(num_ao_chans), size=(num_ao_chans, num_ai_chans))
+        state = (weights, np.zeros((1, num_ai_chans)))
+    weights, zi = state
+    alpha = 1 - np.exp(-1 / (0.02 * rate))
+    mixed = np.tanh(inputs @ weights)
+    outputs, zi = signal.lfilter([alpha], [1, alpha - 1], mixed, axis=0,
+                                 zi=zi)
+    return outputs, (weights, zi)
+
+
+# Can be replaced with any function with the same arguments, see
+# set_reservoir()
+_reservoir = leaky_tanh_reservoir
+
+
+def set_reservoir(reservoir):
+    """Replaces the model of the reservoir, see leaky_tanh_reservoir()."""
+    global _reservoir
+    _reservoir = reservoir
+
+
+def replay(data):
+    """Returns a reservoir (for set_reservoir()) that ignores the analog
+    outputs and plays back a recording on the analog inputs instead, over
+    and over again.
+
+    Parameters
+    ----------
+    data : numpy.ndarray
+        The recording, shape (points, channels), e.g. from
+        Recording.open_recording(). Its channels are repeated to fill all
+        analog inputs.
+    """
+    data = np.asarray(data, dtype=float)
+    chans = np.arange(num_ai_chans) % data.shape[1]
+
+    def replay_reservoir(inputs, rate, state):
+        position = 0 if state is None else state
+        rows = (position + np.arange(len(inputs))) % len(data)
+        return data[rows][:, chans], position + len(inputs)
+
+    return replay_reservoir
+
+
+#################################################
+# Buffers
+
+# memhandle -> ctypes array. The memhandle is the address of the array, so
+# that cast(memhandle, POINTER(...)) works as with the real UL.
+_buffers = {}
+
+
+def _alloc(ctype, num_points):
+    array = (ctype * num_points)()
+    memhandle = addressof(array)
+    _buffers[memhandle] = array
+    return memhandle
+
+
+def win_buf_alloc(num_points):
+    return _alloc(c_ushort, num_points)
+
+
+def scaled_win_buf_alloc(num_points):
+    return _alloc(c_double, num_points)
+
+
+def win_buf_free(memhandle):
+    _buffers.pop(memhandle, None)
+
+
+def _copy_out(memhandle, data_array, first_point, count):
+    _update()
+    src = _buffers[memhandle]
+    item_size = np.dtype(np.ctypeslib.as_array(src).dtype).itemsize
+    memmove(data_array, addressof(src) + first_point * item_size,
+            count * item_size)
+
+
+def win_buf_to_array(memhandle, data_array, first_point, count):
+    _copy_out(memhandle, data_array, first_point, count)
+
+
+def scaled_win_buf_to_array(memhandle, data_array, first_point, count):
+    _copy_out(memhandle, data_array, first_point, count)
+
+
+#################################################
+# Scans
+
+class _Scan:
+    """A running (or finished) background scan of one board."""
+
+    def __init__(self, board_num, low_chan, high_chan, num_points, rate,
+                 ul_range, memhandle, options):
+        self.board_num = board_num
+        self.num_chans = high_chan - low_chan + 1
+        self.low_chan = low_chan
+        self.num_points = num_points
+        self.rate = rate
+        self.ul_range = ul_range
+        self.buffer = np.ctypeslib.as_array(_buffers[memhandle])
+        self.scaled = bool(options & ScanOptions.SCALEDATA)
+        self.continuous = bool(options & ScanOptions.CONTINUOUS)
+        self.start_time = perf_counter()
+        self.stop_time = None
+        self.count = 0 # points transferred, like cur_count
+        self.rows_done = 0 # channel scans transferred
+
+    @property
+    def running(self):
+        return self.stop_time is None
+
+    def _target_count(self, now):
+        rows = int((now - self.start_time) * self.rate)
+        count = rows * self.num_chans
+        # Like the real cards, the count grows in whole packets
+        count -= count % packet_size
+        if not self.continuous:
+            count = min(count, self.num_points)
+        return count
+
+    def update(self, now):
+        """Transfers the points up to now. Returns the rows (channel scans)
+        that are new and their first row number."""
+        if not self.running:
+            return None, self.rows_done
+        count = self._target_count(now)
+        first_row = self.rows_done
+        self.count = count
+        self.rows_done = -(-count // self.num_chans)
+        if not self.continuous and count >= self.num_points:
+            self.stop_time = self.start_time + self.rows_done / self.rate
+        return first_row, self.rows_done
+
+    def cur_index(self):
+        if self.rows_done == 0:
+            return -1
+        return ((self.rows_done - 1) * self.num_chans) % self.num_points
+
+    def buffer_rows(self, first_row, last_row):
+        """Buffer indices of the points of the rows first_row..last_row."""
+        rows = np.arange(first_row, last_row)
+        index = rows[:, None] * self.num_chans + np.arange(self.num_chans)
+        return index % self.num_points
+
+
+class _OutputScan(_Scan):
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        # The last few seconds of what was output, for the loopback
+        self.history = np.zeros((0, self.num_chans))
+        self.history_first = 0
+
+    def update(self, now):
+        first_row, last_row = super().update(now)
+        if first_row is None or last_row <= first_row:
+            return
+        # Only what fits into the history matters
+        first_row = max(first_row, last_row - self.history_length)
+        values = self.buffer[self.buffer_rows(first_row, last_row)]
+        if not self.scaled:
+            values = _to_volts(values, self.ul_range)
+        self.history = np.concatenate((self.history, values))
+        self.history_first = last_row - len(self.history)
+        if len(self.history) > self.history_length:
+            self.history = self.history[-self.history_length:]
+            self.history_first = last_row - self.history_length
+
+    @property
+    def history_length(self):
+        return max(int(10 * self.rate), self.num_points // self.num_chans)
+
+
+class _InputScan(_Scan):
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self.reservoir_state = None
+
+    def update(self, now):
+        first_row, last_row = super().update(now)
+        if first_row is None or last_row <= first_row:
+            return
+        # Only the rows that are still in the buffer matter
+        first_row = max(first_row, last_row - self.num_points // self.num_chans
+                        - 1)
+        times = self.start_time + np.arange(first_row, last_row) / self.rate
+        inputs = _ao_values_at(times)
+        outputs, self.reservoir_state = _reservoir(inputs, self.rate,
+                                                   self.reservoir_state)
+        chans = (self.low_chan + np.arange(self.num_chans)) % num_ai_chans
+        values = outputs[:, chans]
+        values = values + np.random.normal(0, noise, values.shape)
+        if not self.scaled:
+            values = _to_counts(values, self.ul_range)
+        self.buffer[self.buffer_rows(first_row, last_row)] = values
+
+
+# (board_num, function_type) -> _Scan
+_scans = {}
+# Voltage applied with v_out() on every analog output, used outside of scans
+_ao_levels = np.zeros(num_ao_chans)
+
+
+def _ao_values_at(times):
+    """What the analog outputs applied at the given times (loopback),
+    shape (len(times), num_ao_chans)."""
+    values = np.tile(_ao_levels, (len(times), 1))
+    for (board_num, function_type), scan in _scans.items():
+        if function_type != FunctionType.AOFUNCTION or len(scan.history) == 0:
+            continue
+        rows = np.floor((times - scan.start_time) * scan.rate).astype(int)
+        in_scan = ((rows >= scan.history_first)
+                   & (rows < scan.history_first + len(scan.history)))
+        if scan.stop_time is not None:
+            in_scan &= times < scan.stop_time
+        rows = rows[in_scan] - scan.history_first
+        chans = scan.low_chan + np.arange(scan.num_chans)
+        values[np.ix_(np.nonzero(in_scan)[0], chans)] = scan.history[rows]
+    return values
+
+
+def _update():
+    # The outputs first, so that the inputs see what was output until now
+    now = perf_counter()
+    for (board_num, function_type), scan in _scans.items():
+        if function_type == FunctionType.AOFUNCTION:
+            scan.update(now)
+    for (board_num, function_type), scan in _scans.items():
+        if function_type == FunctionType.AIFUNCTION:
+            scan.update(now)
+
+
+def _check_board(board_num):
+    if not 0 <= board_num < num_boards:
+        raise ULError('Error: Board ' + str(board_num) + ' does not exist')
+
+
+def a_in_scan(board_num, low_chan, high_chan, num_points, rate, ul_range,
+              memhandle, options):
+    _check_board(board_num)
+    _update()
+    _scans[(board_num, FunctionType.AIFUNCTION)] = _InputScan(
+        board_num, low_chan, high_chan, num_points, rate, ul_range,
+        memhandle, options)
+    return rate
+
+
+def a_out_scan(board_num, low_chan, high_chan, num_points, rate, ul_range,
+               memhandle, options):
+    _check_board(board_num)
+    _update()
+    _scans[(board_num, FunctionType.AOFUNCTION)] = _OutputScan(
+        board_num, low_chan, high_chan, num_points, rate, ul_range,
+        memhandle, options)
+    return rate
+
+
+def get_status(board_num, function_type):
+    _update()
+    scan = _scans.get((board_num, function_type))
+    if scan is None:
+        return Status.IDLE, 0, -1
+    status = Status.RUNNING if scan.running else Status.IDLE
+    return status, scan.count, scan.cur_index()
+
+
+def stop_background(board_num, function_type):
+    _update()
+    scan = _scans.get((board_num, function_type))
+    if scan is not None and scan.running:
+        scan.stop_time = perf_counter()
+
+
+def v_out(board_num, channel, ul_range, data_value, options=0):
+    _check_board(board_num)
+    _update()
+    _ao_levels[channel] = data_value
+
+
+def from_eng_units(board_num, ul_range, eng_units_value):
+    return int(_to_counts(eng_units_value, ul_range))
+
+
+def to_eng_units(board_num, ul_range, data_value):
+    return float(_to_volts(data_value, ul_range))
+
+
+#################################################
+# Device information and setup
+
+class _AiInfo:
+
+    def __init__(self):
+        self.num_chans = num_ai_chans
+        self.is_supported = True
+        self.supports_scan = True
+        self.resolution = resolution
+        self.packet_size = packet_size
+        self.supported_ranges = [ULRange.BIP10VOLTS, ULRange.BIP5VOLTS,
+                                 ULRange.BIP2VOLTS, ULRange.BIP1VOLTS]
+
+
+class _AoInfo:
+
+    def __init__(self):
+        self.num_chans = num_ao_chans
+        self.is_supported = True
+        self.supports_scan = True
+        self.resolution = resolution
+        self.supported_ranges = [ULRange.BIP10VOLTS]
+
+
+class DaqDeviceInfo:
+    """Hardware information of a simulated card, like
+    mcculw.device_info.DaqDeviceInfo."""
+
+    def __init__(self, board_num):
+        _check_board(board_num)
+        self.board_num = board_num
+        self.product_name = 'Simulated DAQ'
+        self.unique_id = 'SIM' + str(board_num)
+        self.supports_analog_input = True
+        self.supports_analog_output = True
+
+    def get_ai_info(self):
+        return _AiInfo()
+
+    def get_ao_info(self):
+        return _AoInfo()
+
+
+class _DeviceDescriptor:
+
+    def __init__(self, board_num):
+        self.product_name = 'Simulated DAQ'
+        self.unique_id = 'SIM' + str(board_num)
+        self.product_id = 0
+
+
+def ignore_instacal():
+    pass
+
+
+def get_daq_device_inventory(interface_type, number_of_devices=100):
+    return [_DeviceDescriptor(board_num) for board_num in range(num_boards)]
+
+
+def create_daq_device(board_num, descriptor):
+    _check_board(board_num)
+
+
+def release_daq_device(board_num):
+    pass
+
+
+def a_input_mode(board_num, input_mode):
+    _check_board(board_num)
+
+
+def reset():
+    """Stops all scans and frees all buffers, e.g. between benchmarks."""
+    _scans.clear()
+    _buffers.clear()
+    _ao_levels[:] = 0
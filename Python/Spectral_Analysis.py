@@ -0,0 +1,184 @@
+# This file calculates the spectrum of recordings, for all channels at once. It is used for the plots of the input
+# scripts (FFT = True) and you do not need to change anything here.
+#
+# Instead of one FFT over the whole recording (whose thousands of bins can hardly be plotted), the power spectral
+# density is estimated with Welch's method: the recording is cut into overlapping segments, and the spectra of all
+# segments are averaged. This is also done while recording: RunningPSD is updated with every chunk the cards deliver
+# (see run_acquisition(on_chunk=...) in Acquisition.py), so only one segment per channel is kept in memory, no matter
+# how long the recording is. For the change of the spectrum over time, use spectrogram().
+
+import matplotlib.pyplot as plt
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy import signal
+from scipy.fft import rfft, rfftfreq
+
+
+class RunningPSD:
+    """Welch power spectral density of all channels, updated chunk by chunk.
+
+    Gives the same result as scipy.signal.welch() (Hann window, 50% overlap,
+    the mean of every segment removed) of all data passed to update().
+
+    Parameters
+    ----------
+    rate : int
+        Rate of the data (in Hz).
+    segment_seconds : float, optional
+        Length of the segments (in s). Longer segments give a finer
+        frequency resolution (1/segment_seconds), but fewer segments to
+        average. Default is 4s.
+    window : str, optional
+        Window of the segments, see scipy.signal.get_window(). Default is
+        'hann'.
+    """
+
+    def __init__(self, rate, segment_seconds=4, window='hann'):
+        self.rate = rate
+        self.segment_points = max(int(segment_seconds * rate), 2)
+        self.step = self.segment_points - self.segment_points // 2
+        self.window = signal.get_window(window, self.segment_points)
+        self.freqs = rfftfreq(self.segment_points, 1/rate)
+        self.num_segments = 0
+        self.num_points = 0
+        self._sum = None
+        self._pending = None
+
+    def update(self, chunk):
+        """Adds the points of chunk, shape (points, channels)."""
+        chunk = np.asarray(chunk, dtype=float)
+        if chunk.ndim == 1:
+            chunk = chunk.reshape(-1, 1)
+        self.num_points += len(chunk)
+        if self._pending is None:
+            # A copy, the chunk may be used again for the next points
+            self._pending = chunk.copy()
+        else:
+            self._pending = np.concatenate((self._pending, chunk))
+
+        num_segments = 0
+        if len(self._pending) >= self.segment_points:
+            num_segments = ((len(self._pending) - self.segment_points)
+                            // self.step + 1)
+        if num_segments == 0:
+            return
+        # All complete segments of all channels at once, shape (segments,
+        # channels, segment_points)
+        segments = sliding_window_view(self._pending, self.segment_points,
+                                       axis=0)[::self.step][:num_segments]
+        segments = segments - segments.mean(axis=-1, keepdims=True)
+        power = np.abs(rfft(segments * self.window, axis=-1))**2
+        if self._sum is None:
+            self._sum = power.sum(axis=0)
+        else:
+            self._sum += power.sum(axis=0)
+        self.num_segments += num_segments
+        # Keep the points the next segments start with
+        self._pending = self._pending[num_segments * self.step:]
+
+    @property
+    def psd(self):
+        """The power spectral density (in V**2/Hz), shape (frequencies,
+        channels). None before the first complete segment."""
+        if self._sum is None:
+            return None
+        psd = self._sum.T / (self.num_segments * self.rate
+                             * (self.window**2).sum())
+        # One-sided: the power of the negative frequencies is added, except
+        # for 0Hz and the Nyquist frequency
+        if self.segment_points % 2 == 0:
+            psd[1:-1] *= 2
+        else:
+            psd[1:] *= 2
+        return psd
+
+
+def welch_psd(data, rate, segment_seconds=4, block_points=1000000):
+    """Welch power spectral density of all channels of data.
+
+    The data is read block by block, so recordings that are opened with
+    open_recording() (see Recording.py) are not loaded into memory at once.
+
+    Parameters
+    ----------
+    data : numpy.ndarray or numpy.memmap
+        The recording, shape (points, channels).
+    rate : int
+        Rate of the data (in Hz).
+    segment_seconds : float, optional
+        Length of the segments (in s), see RunningPSD. Recordings shorter
+        than this are taken as one segment. Default is 4s.
+    block_points : int, optional
+        Points read at once. Default is 1000000.
+
+    Returns
+    -------
+    freqs : numpy.ndarray
+        The frequencies (in Hz).
+    psd : numpy.ndarray
+        The power spectral density (in V**2/Hz), shape (frequencies,
+        channels).
+    """
+    if len(data) == 0:
+        raise Exception('Error: There is no data to analyse')
+    segment_seconds = min(segment_seconds, len(data) / rate)
+    running = RunningPSD(rate, segment_seconds)
+    for start in range(0, len(data), block_points):
+        running.update(data[start:start + block_points])
+    return running.freqs, running.psd
+
+
+def spectrogram(data, rate, segment_seconds=1):
+    """The power spectral density of all channels over time.
+
+    Parameters
+    ----------
+    data : numpy.ndarray
+        The recording, shape (points, channels).
+    rate : int
+        Rate of the data (in Hz).
+    segment_seconds : float, optional
+        Length of the segments (in s). Default is 1s.
+
+    Returns
+    -------
+    freqs : numpy.ndarray
+        The frequencies (in Hz).
+    times : numpy.ndarray
+        The centres of the segments (in s).
+    power : numpy.ndarray
+        The power spectral density (in V**2/Hz), shape (channels,
+        frequencies, segments).
+    """
+    data = np.asarray(data, dtype=float)
+    segment_points = max(min(int(segment_seconds * rate), len(data)), 2)
+    freqs, times, power = signal.spectrogram(data.T, rate,
+                                             nperseg=segment_points)
+    return freqs, times, power
+
+
+def plot_psd(freqs, psd, channel_names, title, max_freq=None):
+    """Plots the power spectral density of all channels in one figure."""
+    plt.figure()
+    for chan, name in enumerate(channel_names):
+        plt.semilogy(freqs, psd[:, chan], label = name)
+    plt.title(title)
+    plt.xlabel('Frequency (Hz)')
+    plt.ylabel('PSD (V$^2$/Hz)')
+    if max_freq is not None:
+        plt.xlim([0, max_freq])
+    plt.legend(loc = 1)
+
+
+def plot_spectrogram(data, rate, channel_names, title, channel=0,
+                     segment_seconds=1):
+    """Plots the spectrogram of one channel of data."""
+    freqs, times, power = spectrogram(data[:, [channel]], rate,
+                                      segment_seconds)
+    plt.figure()
+    plt.pcolormesh(times, freqs, 10 * np.log10(power[0] + 1e-20),
+                   shading='auto')
+    plt.title(title + ': ' + channel_names[channel])
+    plt.xlabel('Time (s)')
+    plt.ylabel('Frequency (Hz)')
+    plt.colorbar(label = 'PSD (dB V$^2$/Hz)')
@@ -0,0 +1,233 @@
+# This file keeps the results of Data_Preparation.py, so that going back to settings you already used (e.g. an
+# earlier seconds_zeros or y_offset) does not mean reading all the input files again. You do not need to change
+# anything here, except for the folder and the size of the cache.
+#
+# Every prepared dataset is stored as binary file in its own folder of cache_dir. The name of this folder is a hash
+# of the input files (their names, sizes and modification times, or with hash_contents = True their contents) and of
+# rate, seconds_zeros, y_offset and the selected columns. If any of these change, the data is prepared again. If the
+# cache grows above max_size_gb, the datasets that were not used for the longest time are deleted.
+#
+# Data resampled to another rate (see Resampling.py) is cached as well, next to the data at its own rate, so changing
+# only the output rate does not read the input files again either.
+#
+# It is used by Data_Preparation.py and Data_Output.py when you set use_cache = True there.
+
+from datetime import datetime
+import hashlib
+import json
+import os
+from pathlib import Path
+import shutil
+
+import numpy as np
+import pandas as pd
+
+try:
+    from Data_Preparation import prepare_files, held_columns, read_header
+    from Recording import open_recording
+    from Resampling import resample_prepared, resampled_length
+except ImportError:
+    from .Data_Preparation import prepare_files, held_columns, read_header
+    from .Recording import open_recording
+    from .Resampling import resample_prepared, resampled_length
+
+#################################################
+# Insert your parameters here
+
+# Where should the prepared datasets be kept?
+cache_dir = r'C:\Users\lbongartz\Desktop\Reservoir Computing\Data\Stimulus_Cache'
+
+max_size_gb = 20 # When the cache is larger than this, the least recently used datasets are deleted
+
+hash_contents = False # True hashes the contents of the input files instead of their sizes and modification times
+                      # (slower, but also notices changes that keep size and time)
+
+#################################################
+
+INDEX_FILE = 'index.json'
+
+
+def cache_key(files, rate, seconds_zeros, y_offset=0, columns=None,
+              contents=None, output_rate=None):
+    """The hash that identifies a prepared dataset.
+
+    Parameters
+    ----------
+    files : list of Path
+        The input files, in the order they are combined.
+    rate, seconds_zeros, y_offset, columns
+        The settings of Data_Preparation.py.
+    contents : bool, optional
+        Hash the contents of the files instead of their sizes and
+        modification times. Default is hash_contents.
+    output_rate : int, optional
+        The rate the data is resampled to. None if it is not resampled.
+
+    Returns
+    -------
+    str
+        The hash as hex string.
+    """
+    if contents is None:
+        contents = hash_contents
+    h = hashlib.sha256()
+    settings = {'rate': rate, 'seconds_zeros': seconds_zeros,
+                'y_offset': y_offset, 'columns': columns}
+    if output_rate is not None:
+        settings['output_rate'] = output_rate
+    h.update(json.dumps(settings, sort_keys=True).encode())
+    for file in files:
+        file = Path(file)
+        h.update(str(file.resolve()).encode())
+        if contents:
+            with open(file, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 20), b''):
+                    h.update(block)
+        else:
+            stat = file.stat()
+            h.update((str(stat.st_size) + ':' + str(stat.st_mtime_ns))
+                     .encode())
+    return h.hexdigest()
+
+
+def _read_index():
+    try:
+        with open(os.path.join(cache_dir, INDEX_FILE)) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _write_index(index):
+    # Write to a temporary file first, so that the index is never half
+    # written
+    tmp_file = os.path.join(cache_dir, INDEX_FILE + '.tmp')
+    with open(tmp_file, 'w') as f:
+        json.dump(index, f, indent=4)
+    os.replace(tmp_file, os.path.join(cache_dir, INDEX_FILE))
+
+
+def _folder_size(folder):
+    return sum(file.stat().st_size for file in Path(folder).iterdir())
+
+
+def evict(index, keep=None):
+    """Deletes the least recently used datasets until the cache is smaller
+    than max_size_gb. The dataset keep is never deleted."""
+    max_size = max_size_gb * 1e9
+    total = sum(entry['size'] for entry in index.values())
+    for key in sorted(index, key=lambda key: index[key]['last_used']):
+        if total <= max_size:
+            break
+        if key == keep:
+            continue
+        print('Stimulus cache: deleting ' + key[:12] + ' (last used '
+              + index[key]['last_used'] + ')')
+        shutil.rmtree(os.path.join(cache_dir, key), ignore_errors=True)
+        total -= index.pop(key)['size']
+
+
+def get_prepared(input_path, rate, seconds_zeros, y_offset=0, columns=None,
+                 num_workers=None, output_rate=None):
+    """Returns the prepared dataset of all csv files in input_path, from the
+    cache if it was prepared before with the same files and settings.
+
+    Parameters
+    ----------
+    input_path : str or Path
+        The folder with the input files.
+    rate, seconds_zeros, y_offset, columns
+        The settings of Data_Preparation.py.
+    num_workers : int, optional
+        Number of processes, if the data has to be prepared.
+    output_rate : int, optional
+        Resample the data to this rate, see Resampling.resample_prepared().
+        None keeps the rate of the data.
+
+    Returns
+    -------
+    data : numpy.memmap
+        The combined data, shape (rows, columns).
+    meta : dict
+        rate, channels (the column names), dtype, num_points, seconds_zeros,
+        y_offset, source and, if resampled, source_rate.
+    boundaries : pandas.DataFrame
+        Where every snippet starts and ends, see
+        Data_Preparation.prepare_files().
+    """
+    files = list(sorted(Path(input_path).glob('*.csv')))
+    if not files:
+        raise Exception('Error: No csv files found in ' + str(input_path))
+    if output_rate == rate:
+        output_rate = None
+    key = cache_key(files, rate, seconds_zeros, y_offset, columns,
+                    output_rate=output_rate)
+    folder = os.path.join(cache_dir, key)
+    os.makedirs(cache_dir, exist_ok=True)
+    index = _read_index()
+
+    if key in index and os.path.exists(folder):
+        print('Stimulus cache: using ' + key[:12])
+    else:
+        tmp_folder = folder + '.tmp'
+        shutil.rmtree(tmp_folder, ignore_errors=True)
+        os.makedirs(tmp_folder)
+        tmp_file = os.path.join(tmp_folder, 'data.bin')
+        if output_rate is None:
+            print('Stimulus cache: preparing ' + str(len(files)) + ' files')
+            combined, names, boundaries = prepare_files(
+                files, tmp_file, rate, seconds_zeros, y_offset, 'float64',
+                num_workers, columns)
+        else:
+            # The data at its own rate comes from the cache as well
+            source, source_meta, source_boundaries = get_prepared(
+                input_path, rate, seconds_zeros, y_offset, columns,
+                num_workers)
+            print('Stimulus cache: resampling ' + key[:12] + ' to '
+                  + str(output_rate) + 'Hz')
+            names = source_meta['channels']
+            combined = np.memmap(tmp_file, dtype='float64', mode='w+',
+                                 shape=(resampled_length(len(source), rate,
+                                                         output_rate),
+                                        len(names)))
+            combined, boundaries = resample_prepared(
+                source, source_boundaries, rate, output_rate,
+                held_columns(names, read_header(files[0])), out=combined)
+            combined.flush()
+            del source
+        meta = {
+            'rate': rate if output_rate is None else output_rate,
+            'channels': names,
+            'dtype': combined.dtype.str,
+            'num_points': len(combined),
+            'seconds_zeros': seconds_zeros,
+            'y_offset': y_offset,
+            'source': str(input_path),
+        }
+        if output_rate is not None:
+            meta['source_rate'] = rate
+        del combined
+        with open(os.path.join(tmp_folder, 'data.json'), 'w') as f:
+            json.dump(meta, f, indent=4)
+        boundaries.to_csv(os.path.join(tmp_folder, 'boundaries.csv'),
+                          index=False)
+        # Only complete datasets get their final name
+        shutil.rmtree(folder, ignore_errors=True)
+        os.replace(tmp_folder, folder)
+        # Preparing the data at its own rate may have changed the index
+        index = _read_index()
+        index[key] = {'size': _folder_size(folder),
+                      'source': str(input_path),
+                      'settings': {'rate': rate,
+                                   'seconds_zeros': seconds_zeros,
+                                   'y_offset': y_offset,
+                                   'columns': columns,
+                                   'output_rate': output_rate}}
+
+    index[key]['last_used'] = datetime.now().isoformat()
+    evict(index, keep=key)
+    _write_index(index)
+
+    data, meta = open_recording(os.path.join(folder, 'data.bin'))
+    boundaries = pd.read_csv(os.path.join(folder, 'boundaries.csv'))
+    return data, meta, boundaries
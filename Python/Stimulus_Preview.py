@@ -0,0 +1,98 @@
+# This file shows the output before it starts, for Functions_Output.py, Data_Output.py and Data_Preparation.py. You do
+# not need to change anything here.
+#
+# The preview has two parts: the first seconds of all channels as they will be output, point by point, and an overview
+# of the whole output below, decimated to the smallest and largest value of short bins (see Decimation.py) so that even
+# hours of output are drawn at once. The part shown above is marked in the overview.
+#
+# With confirm, you choose how the output waits for you:
+#   'close' - the output starts once you close the window (like before)
+#   'ask'   - the window stays open while you are asked in the terminal whether to start
+#   'none'  - the window is shown (if there is a screen) and the output starts right away, e.g. for automated runs
+
+import matplotlib.pyplot as plt
+import numpy as np
+
+try:
+    from Decimation import envelope
+except ImportError:
+    from .Decimation import envelope
+
+
+def plot_preview(channel_data, rate, title, window_seconds=2,
+                 channel_names=None, max_bins=2000):
+    """Plots the first window_seconds of channel_data and a decimated
+    overview of all of it.
+
+    Parameters
+    ----------
+    channel_data : numpy.ndarray or numpy.memmap
+        The output in V, shape (points, channels).
+    rate : int
+        Rate of the output (in Hz).
+    title : str
+        Title of the plot.
+    window_seconds : float, optional
+        How many seconds are shown point by point. Default is 2s.
+    channel_names : list of str, optional
+        Default is 'Channel 0', 'Channel 1', ...
+    max_bins : int, optional
+        Bins of the overview, see Decimation.envelope(). Default is 2000.
+
+    Returns
+    -------
+    matplotlib.figure.Figure
+    """
+    num_points, num_chans = len(channel_data), channel_data.shape[1]
+    if channel_names is None:
+        channel_names = ['Channel ' + str(chan) for chan in range(num_chans)]
+    window_points = min(int(window_seconds * rate), num_points)
+
+    fig, (window_ax, overview_ax) = plt.subplots(2, 1)
+    window = np.asarray(channel_data[:window_points])
+    window_time = np.arange(window_points) / rate
+    for chan, name in enumerate(channel_names):
+        window_ax.plot(window_time, window[:, chan], label = name)
+    window_ax.set_title(title)
+    window_ax.set_ylabel('Voltage (V)')
+    window_ax.legend(loc = 1)
+
+    time, values = envelope(channel_data, rate, max_bins)
+    overview_ax.plot(time, values)
+    overview_ax.axvspan(0, window_points / rate, color = 'grey', alpha = 0.3)
+    overview_ax.set_title('All ' + '{:.1f}'.format(num_points / rate) + 's')
+    overview_ax.set_xlabel('Time (s)')
+    overview_ax.set_ylabel('Voltage (V)')
+    fig.tight_layout()
+    return fig
+
+
+def show_preview(channel_data, rate, title, confirm='close', window_seconds=2,
+                 channel_names=None):
+    """Shows the preview (see plot_preview()) and returns once the output may
+    start.
+
+    Parameters
+    ----------
+    confirm : str, optional
+        'close', 'ask' or 'none', see the top of this file. Default is
+        'close'.
+
+    The other parameters are those of plot_preview().
+    """
+    if confirm not in ('close', 'ask', 'none'):
+        raise Exception('Error: Unknown confirm "' + str(confirm) + '". '
+                        'Use "close", "ask" or "none".')
+    fig = plot_preview(channel_data, rate, title, window_seconds,
+                       channel_names)
+    if confirm == 'close':
+        plt.show()
+        return
+    # Draw the window without waiting for it to be closed
+    plt.show(block=False)
+    plt.pause(0.001)
+    if confirm == 'ask':
+        answer = input('Start the output? \n(y/n) ')
+        if not answer.lower().startswith('y'):
+            plt.close(fig)
+            raise Exception('Error: The output was cancelled')
@@ -0,0 +1,177 @@
+# This file builds the functions (sin, square, 0V) for Functions_Output.py and the stimulus of Run_Experiment.py and
+# Batch_Runner.py (functions or a prepared data file). You do not need to change anything here.
+#
+# Every channel is calculated in one go with numpy instead of point by point, so that even hours of output
+# are prepared within a second.
+
+from fractions import Fraction
+from math import gcd
+
+import numpy as np
+import pandas as pd
+from scipy import signal
+
+try:
+    from Data_Preparation import data_columns
+    from Resampling import resample, resample_prepared
+    from Segments import default_boundaries_file
+except ImportError:
+    from .Data_Preparation import data_columns
+    from .Resampling import resample, resample_prepared
+    from .Segments import default_boundaries_file
+
+
+def time_axis(rate, points_per_channel, first_point=0):
+    """Returns the time (in s) of every output point, starting at the point
+    with index first_point."""
+    return (first_point + np.arange(points_per_channel)) / rate
+
+
+def make_channel(function, amp, freq, y_off, t, duty=0.5):
+    """Calculates one channel for all times t at once.
+
+    Parameters
+    ----------
+    function : str
+        'sin', 'square' or '0' (0V, amplitude and offset are ignored).
+    amp, freq, y_off : float
+        Amplitude (in V), frequency (in Hz) and y-offset (in V).
+    t : numpy.ndarray
+        Times (in s) of the output points.
+    duty : float, optional
+        Duty cycle of the square wave. Default is 0.5.
+    """
+    if function == 'sin':
+        return amp * np.sin(2 * np.pi * freq * t) + y_off
+    elif function == 'square':
+        return amp * signal.square(2 * np.pi * freq * t, duty=duty) + y_off
+    elif str(function) == '0':
+        return np.zeros(len(t))
+    raise ValueError('Unknown function "' + str(function) + '". '
+                     'Use "sin", "square" or "0".')
+
+
+def build_channels(functions, frequencies, amplitude, y_offset, duty, rate,
+                   points_per_channel, num_chans, first_point=0):
+    """Calculates the first num_chans channels and returns them as one array
+    of shape (points_per_channel, num_chans).
+
+    Each row holds one point of every channel, so flattening the array gives
+    exactly the interleaved order (Ch0, Ch1, ..., Ch0, Ch1, ...) that the
+    output buffer of the card expects. With first_point, a later part of the
+    output can be calculated without calculating everything before it.
+    """
+    t = time_axis(rate, points_per_channel, first_point)
+    channel_data = np.empty((points_per_channel, num_chans))
+    for channel_num in range(num_chans):
+        channel_data[:, channel_num] = make_channel(
+            functions[channel_num], amplitude[channel_num],
+            frequencies[channel_num], y_offset[channel_num], t, duty)
+    return channel_data
+
+
+def interleave(channel_data):
+    """Returns the (points, channels) array as one flat array in the order in
+    which the card outputs the points."""
+    return np.ascontiguousarray(channel_data).ravel()
+
+
+def generate_chunks(functions, frequencies, amplitude, y_offset, duty, rate,
+                    points_per_channel, num_chans, chunk_points=None):
+    """Yields the output piece by piece as arrays of shape
+    (chunk_points, num_chans), so that it never has to be held in memory as
+    a whole (see AO_Streaming.py). Default chunk length is 1s."""
+    if chunk_points is None:
+        chunk_points = max(int(rate), 1)
+    for first_point in range(0, points_per_channel, chunk_points):
+        num_points = min(chunk_points, points_per_channel - first_point)
+        yield build_channels(functions, frequencies, amplitude, y_offset,
+                             duty, rate, num_points, num_chans, first_point)
+
+
+def period_points(functions, frequencies, rate, max_points=None):
+    """Returns the smallest number of points after which all channels repeat
+    themselves, i.e. the least common multiple of the periods of the
+    channels (in points). Channels with 0V or a frequency of 0 are constant
+    and don't count.
+
+    If this is longer than max_points (e.g. for frequencies that don't fit
+    into the rate), max_points is returned instead.
+    """
+    num_points = 1
+    for function, freq in zip(functions, frequencies):
+        if str(function) == '0' or freq == 0:
+            continue
+        # The channel repeats after n points, if n * freq / rate is a whole
+        # number, i.e. if n is a multiple of the denominator of freq / rate
+        cycles_per_point = (Fraction(freq).limit_denominator(10**6)
+                            / Fraction(rate).limit_denominator(10**6))
+        denominator = cycles_per_point.denominator
+        num_points = num_points * denominator // gcd(num_points, denominator)
+    if max_points is not None and num_points > max_points:
+        return max_points
+    return num_points
+
+
+def build_stimulus(spec, num_chans=4):
+    """Calculates or loads the output described by spec.
+
+    Parameters
+    ----------
+    spec : dict
+        For functions: {'type': 'functions', 'functions', 'frequencies',
+        'amplitude', 'y_offset' (one entry per channel), 'duty', 'time' (in
+        s), 'rate'}, as in Functions_Output.py.
+        For data: {'type': 'data', 'file' (a prepared file, see
+        Data_Preparation.py), 'rate'} and optionally 'columns' (default: the
+        data columns, i.e. neither the time nor the target column).
+        Both can have 'output_rate': the rate the stimulus is resampled to
+        and output with (see Resampling.py), e.g. to output data prepared at
+        100Hz with 500Hz.
+        Both can have 'zero_gap': how long (in s) 0V is output after the
+        stimulus, e.g. to let the reservoir relax before the next run.
+    num_chans : int, optional
+        Number of output channels. Default is 4.
+
+    Returns
+    -------
+    values : numpy.ndarray
+        The output in volts, shape (points, num_chans).
+    rate : int
+        The output rate (in Hz).
+    """
+    rate = spec['rate']
+    boundaries = None
+    if spec['type'] == 'functions':
+        points_per_channel = int(spec['time'] * rate)
+        values = build_channels(spec['functions'], spec['frequencies'],
+                                spec['amplitude'], spec['y_offset'],
+                                spec.get('duty', 0.5), rate,
+                                points_per_channel, num_chans)
+    elif spec['type'] == 'data':
+        data = pd.read_csv(spec['file'], delimiter=',')
+        columns = spec.get('columns')
+        if columns is None:
+            columns = data_columns(list(data.columns))[:num_chans]
+        values = data[columns].to_numpy(dtype=float)
+        boundaries_file = default_boundaries_file(spec['file'])
+        if boundaries_file.exists():
+            boundaries = pd.read_csv(boundaries_file)
+    else:
+        raise Exception('Error: Unknown stimulus type "' + str(spec['type'])
+                        + '". Use "functions" or "data".')
+
+    output_rate = spec.get('output_rate', rate)
+    if output_rate != rate:
+        if boundaries is not None:
+            # The 0V between the snippets keeps its length and value
+            values, _ = resample_prepared(values, boundaries, rate,
+                                          output_rate, [])
+        else:
+            values = resample(values, rate, output_rate)
+        rate = output_rate
+
+    gap_points = int(spec.get('zero_gap', 0) * rate)
+    if gap_points > 0:
+        values = np.vstack((values, np.zeros((gap_points, values.shape[1]))))
+    return values, rate
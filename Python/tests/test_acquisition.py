@@ -0,0 +1,61 @@
+# Runs on the simulated cards (see Simulated_DAQ.py), no card is needed: python -m pytest Python/tests
+
+import os
+import sys
+from pathlib import Path
+
+os.environ['RC_DAQ_BACKEND'] = 'simulator'
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import numpy as np
+
+from Acquisition import BoardScan, run_acquisition
+from Decimation import envelope
+from Recording import CSVRecording, open_recording, read_points
+
+
+def test_counts_chunks_in_volts_like_the_file(tmp_path):
+    chunks = []
+    record_file = str(tmp_path / 'counts.bin')
+    data, _ = run_acquisition([(0, 0, 3), (1, 0, 3)], 1000, 1, record_file,
+                              'counts',
+                              on_chunk=lambda chunk: chunks.append(
+                                  np.array(chunk)))
+    stored, meta = open_recording(record_file)
+    received = np.concatenate(chunks)
+
+    assert meta['dtype'] == '<u2'
+    assert len(received) == len(stored) > 0
+    np.testing.assert_allclose(received, stored[:])
+
+
+def test_csv_read_back_from_the_file(tmp_path):
+    record_file = str(tmp_path / 'recording.csv')
+    data, _ = run_acquisition([(0, 0, 1)], 5000, 1, record_file, 'csv')
+    stored = read_points(record_file, 0, 10000)
+
+    assert isinstance(data, CSVRecording)
+    assert data.shape == stored.shape == (5000, 2)
+    # Read block by block, as for the plot after the recording
+    time, values = envelope(data, 5000, max_bins=100, block_points=700)
+    expected_time, expected_values = envelope(stored, 5000, max_bins=100)
+    np.testing.assert_array_equal(time, expected_time)
+    np.testing.assert_array_equal(values, expected_values)
+
+
+def test_chunks_from_the_pool_like_the_file(tmp_path):
+    scans = [BoardScan(0, 0, 1, 5000, chunks_per_buffer=50)]
+    chunks = []
+    record_file = str(tmp_path / 'pool.bin')
+    try:
+        run_acquisition([(0, 0, 1)], 5000, 2, record_file, 'binary',
+                        board_scans=scans,
+                        on_chunk=lambda chunk: chunks.append(chunk.copy()))
+    finally:
+        scans[0].free()
+    stored, _ = open_recording(record_file)
+
+    np.testing.assert_allclose(np.concatenate(chunks), stored[:], atol=1e-6)
+    # 50 chunks, but only the few arrays the writer had at once
+    assert len(chunks) >= 45
+    assert scans[0].pool.num_allocated < len(chunks) // 2
@@ -0,0 +1,73 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import numpy as np
+
+from Alignment import correlation_lag, estimate_lags
+from Recording import BinarySink
+
+
+def _record(tmp_path, function, lag, duration, rate=500):
+    """A recording at rate of the (inverted, distorted) function, which
+    starts lag seconds after the recording."""
+    time = np.arange(int((lag + duration + 5) * rate)) / rate - lag
+    values = np.where((time >= 0) & (time < duration), function(time), 0)
+    noise = np.random.default_rng(1).standard_normal(len(time))
+    values = -np.tanh(values) + 0.01 * noise
+    record_file = tmp_path / 'recording.bin'
+    with BinarySink(record_file, ['Channel 0'], rate) as sink:
+        sink.write(values)
+    return record_file
+
+
+def test_correlation_lag_known_lag():
+    rng = np.random.default_rng(0)
+    reference = rng.standard_normal((1000, 2))
+    signal = np.vstack((rng.standard_normal((123, 2)), reference,
+                        rng.standard_normal((200, 2))))
+    signal[:, 1] *= -1
+    lag, correlation, signs = correlation_lag(reference, signal)
+    assert abs(lag - 123) < 0.1
+    assert 0.5 < correlation <= 1
+    np.testing.assert_array_equal(np.diag(signs), [1, -1])
+
+
+def test_correlation_lag_on_edge():
+    rng = np.random.default_rng(0)
+    reference = rng.standard_normal((1000, 1))
+    signal = np.vstack((np.zeros((300, 1)), reference))
+    lag, _, _ = correlation_lag(reference, signal, (0, 200))
+    assert np.isnan(lag)
+
+
+def test_estimate_lags_known_lag(tmp_path):
+    rng = np.random.default_rng(2)
+    freqs, phases = rng.uniform(0.1, 10, 20), rng.uniform(0, 2 * np.pi, 20)
+
+    def function(time):
+        return 0.3 * np.sin(2 * np.pi * np.multiply.outer(time, freqs)
+                            + phases).sum(axis=-1)
+
+    stimulus = function(np.arange(100 * 100) / 100)[:, None]
+    record_file = _record(tmp_path, function, 12.34, 100)
+    lag, blocks = estimate_lags(stimulus, 100, record_file, max_lag=30,
+                                block_seconds=20)
+    assert abs(lag - 12.34) < 0.005
+    assert blocks['valid'].sum() == 5
+
+
+def test_estimate_lags_periodic(tmp_path):
+    def function(time):
+        return np.sin(2 * np.pi * 5 * time)
+
+    stimulus = function(np.arange(30 * 100) / 100)[:, None]
+    record_file = _record(tmp_path, function, 12.34, 30)
+    lag, blocks = estimate_lags(stimulus, 100, record_file, max_lag=30,
+                                block_seconds=5)
+    assert abs(lag - 12.34) < 0.005
+    # A block that matches one period later just as well is not valid,
+    # instead of giving a lag a whole period off
+    valid = blocks[blocks['valid']]
+    np.testing.assert_allclose(valid['lag'], 12.34, atol=0.005)
@@ -0,0 +1,40 @@
+# Runs on the simulated cards (see Simulated_DAQ.py), no card is needed: python -m pytest Python/tests
+
+import os
+import sys
+from pathlib import Path
+from time import sleep
+
+os.environ['RC_DAQ_BACKEND'] = 'simulator'
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import numpy as np
+from mcculw.enums import FunctionType, ULRange
+
+import Simulated_DAQ
+from AO_Streaming import stream_output
+
+
+def test_underrun_skips_to_the_next_half():
+    rate = 1000
+    values = np.linspace(-5, 5, 1000)[:, None]
+
+    def chunks():
+        for start in range(0, len(values), 50):
+            if start == 500:
+                # The disk is too slow for a while
+                sleep(0.3)
+            yield values[start:start + 50]
+
+    underruns, skipped_points = stream_output(0, 0, 0, rate, ULRange.BIP10VOLTS,
+                                              chunks(),
+                                              buffer_size_seconds=0.1)
+
+    assert underruns >= 1
+    # Whole halves of the buffer (50 points) are skipped
+    assert skipped_points > 0 and skipped_points % 50 == 0
+    # The data after the stall is output in full, only later
+    scan = Simulated_DAQ._scans[(0, FunctionType.AOFUNCTION)]
+    end = len(values) + skipped_points - scan.history_first
+    np.testing.assert_allclose(scan.history[end - 400:end, 0],
+                               values[600:, 0], atol=1e-3)
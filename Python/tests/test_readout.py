@@ -0,0 +1,66 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import numpy as np
+
+from Readout import RidgeAccumulator, solve_ridge, ridge_mse
+
+
+def _data(num_points=500, num_features=6, num_outputs=3, seed=0):
+    rng = np.random.default_rng(seed)
+    # A large offset, as the channels of the cards can have
+    x = rng.normal(size=(num_points, num_features)) + 100
+    y = (x @ rng.normal(size=(num_features, num_outputs)) + 5
+         + 0.1 * rng.normal(size=(num_points, num_outputs)))
+    return x, y
+
+
+def _lstsq(x, y, alpha):
+    """Ridge regression with an unregularized bias, as one least squares
+    problem."""
+    num_points, num_features = x.shape
+    a = np.vstack((np.hstack((x, np.ones((num_points, 1)))),
+                   np.hstack((np.sqrt(alpha * num_points)
+                              * np.eye(num_features),
+                              np.zeros((num_features, 1))))))
+    b = np.vstack((y, np.zeros((num_features, y.shape[1]))))
+    solution = np.linalg.lstsq(a, b, rcond=None)[0]
+    return solution[:-1], solution[-1]
+
+
+def test_solve_ridge_like_lstsq():
+    x, y = _data()
+    alphas = [0, 1e-3, 1e-1, 10]
+    acc = RidgeAccumulator()
+    # Block by block, as the recordings are read
+    for start in range(0, len(x), 64):
+        acc.update(x[start:start + 64], y[start:start + 64])
+    weights, biases = solve_ridge(acc, alphas)
+
+    assert weights.shape == (4, 6, 3) and biases.shape == (4, 3)
+    for k, alpha in enumerate(alphas):
+        expected_weights, expected_bias = _lstsq(x, y, alpha)
+        np.testing.assert_allclose(weights[k], expected_weights, rtol=1e-6,
+                                   atol=1e-8)
+        np.testing.assert_allclose(biases[k], expected_bias, rtol=1e-6,
+                                   atol=1e-6)
+
+
+def test_ridge_mse_like_the_predictions():
+    x, y = _data()
+    acc = RidgeAccumulator()
+    acc.update(x, y)
+    weights, biases = solve_ridge(acc, [0, 1e-2, 1])
+    # Also on other data than the readout was trained with
+    x_val, y_val = _data(seed=1)
+    validation = RidgeAccumulator()
+    validation.update(x_val[:100], y_val[:100])
+    validation.update(x_val[100:], y_val[100:])
+
+    for sums, points, targets in [(acc, x, y), (validation, x_val, y_val)]:
+        expected = np.stack([((points @ w + b - targets)**2).mean(axis=0)
+                             for w, b in zip(weights, biases)])
+        np.testing.assert_allclose(ridge_mse(sums, weights, biases),
+                                   expected, rtol=1e-6, atol=1e-10)
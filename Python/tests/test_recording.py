@@ -0,0 +1,23 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import numpy as np
+
+from Recording import CSVSink, SequentialReader, read_points
+
+
+def test_sequential_reader_like_read_points(tmp_path):
+    values = np.random.default_rng(0).standard_normal((1000, 2))
+    record_file = tmp_path / 'recording.csv'
+    with CSVSink(record_file, ['Channel 0', 'Channel 1'], 100) as sink:
+        sink.write(values.ravel())
+    reader = SequentialReader(record_file, block_points=64)
+    # Overlapping, with gaps and past the end
+    for start, num_points in [(0, 10), (5, 100), (300, 50), (310, 400),
+                              (990, 50)]:
+        np.testing.assert_array_equal(
+            reader.read(start, num_points),
+            read_points(record_file, start, num_points))
+    assert len(reader.read(2000, 10)) == 0
@@ -0,0 +1,102 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import numpy as np
+import pandas as pd
+
+from Data_Preparation import data_columns, held_columns
+from Resampling import resample_prepared, resample_prepared_chunks
+from Waveforms import build_stimulus
+
+
+def _prepared(num_points=200, rate=100):
+    time = np.arange(num_points) / rate
+    feature = np.sin(2 * np.pi * 3 * time)
+    data = np.column_stack((time, feature, feature))
+    boundaries = pd.DataFrame({'file': ['a.csv'], 'start': [0],
+                               'end': [num_points], 'start_time': [0.],
+                               'end_time': [num_points / rate]})
+    return data, boundaries
+
+
+def _gapped(rate=100):
+    """Two snippets of a 3Hz sine, each followed by 0.5s of 0V."""
+    snippet = np.sin(2 * np.pi * 3 * np.arange(100) / rate) + 2
+    data = np.concatenate((snippet, np.zeros(50), snippet, np.zeros(50)))
+    boundaries = pd.DataFrame({'file': ['a.csv', 'b.csv'], 'start': [0, 150],
+                               'end': [100, 250]})
+    boundaries['start_time'] = boundaries['start'] / rate
+    boundaries['end_time'] = boundaries['end'] / rate
+    return data[:, None], boundaries
+
+
+def test_held_columns_by_name():
+    header = ['Time in seconds', 'Feature 1', 'Feature 2', 'Target']
+    assert held_columns(header, header) == [0, 3]
+    # Without the target, only the time is held
+    assert held_columns(header[:3], header) == [0]
+    # Files without a target column
+    assert held_columns(['Time', 'F1'], ['Time', 'F1']) == [0]
+
+
+def test_data_columns_leave_out_time_and_target():
+    header = ['Time in seconds', 'Feature 1', 'Feature 2', 'Target']
+    assert data_columns(header) == ['Feature 1', 'Feature 2']
+    # Of the input files, only some columns were kept
+    assert data_columns(header[:3], header) == ['Feature 1', 'Feature 2']
+    assert data_columns(['Time', 'F1'], ['Time', 'F1']) == ['F1']
+
+
+def test_only_held_columns_repeat():
+    data, boundaries = _prepared()
+    out, _ = resample_prepared(data, boundaries, 100, 500, hold=[0])
+    # The time is held, every value 5 times
+    np.testing.assert_array_equal(out[:10, 0], np.repeat(data[:2, 0], 5))
+    # The last feature is filtered like the first, not held
+    np.testing.assert_allclose(out[:, 2], out[:, 1])
+    assert len(np.unique(out[20:30, 2])) == 10
+
+
+def test_gaps_keep_length_and_value():
+    data, boundaries = _gapped()
+    out, new = resample_prepared(data, boundaries, 100, 500, hold=[])
+    gap = slice(new['end'][0], new['start'][1])
+    # Exactly 0V, from the end of the first snippet to the start of the next
+    np.testing.assert_array_equal(out[gap], 0)
+    assert new['start'][1] - new['end'][0] == 5 * 50
+    assert np.abs(out[gap.start - 5:gap.start]).min() > 0
+
+
+def test_gaps_kept_piece_by_piece():
+    data, boundaries = _gapped()
+    out, _ = resample_prepared(data, boundaries, 100, 500, hold=[])
+    chunks = (data[start:start + 37] for start in range(0, len(data), 37))
+    streamed = np.concatenate(list(resample_prepared_chunks(
+        chunks, boundaries, 100, 500, block_points=64)))
+    np.testing.assert_allclose(streamed, out, atol=1e-12)
+
+
+def test_build_stimulus_keeps_gaps(tmp_path):
+    data, boundaries = _gapped()
+    stimulus_file = tmp_path / 'Files_combined.csv'
+    pd.DataFrame({'Time': np.arange(len(data)) / 100, 'F1': data[:, 0],
+                  'Target': 1}).to_csv(stimulus_file, index=False)
+    boundaries.to_csv(tmp_path / 'Files_combined_boundaries.csv', index=False)
+    values, rate = build_stimulus({'type': 'data', 'file': str(stimulus_file),
+                                   'rate': 100, 'output_rate': 500,
+                                   'columns': ['F1']})
+    expected, _ = resample_prepared(data, boundaries, 100, 500, hold=[])
+    assert rate == 500
+    np.testing.assert_allclose(values, expected, atol=1e-12)
+
+
+def test_build_stimulus_default_columns(tmp_path):
+    stimulus_file = tmp_path / 'Files_combined.csv'
+    pd.DataFrame({'Time': np.arange(10) / 100, 'F1': 1., 'F2': 2.,
+                  'Target': 3.}).to_csv(stimulus_file, index=False)
+    # Fewer features than channels: the target is not output
+    values, _ = build_stimulus({'type': 'data', 'file': str(stimulus_file),
+                                'rate': 100})
+    np.testing.assert_array_equal(values, [[1., 2.]] * 10)
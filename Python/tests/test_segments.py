@@ -0,0 +1,54 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+import numpy as np
+import pandas as pd
+
+from Segments import map_segments
+
+
+def _boundaries():
+    """Three snippets of a stimulus at 100Hz, 0.5s of 0V between them."""
+    boundaries = pd.DataFrame({'file': ['a.csv', 'b.csv', 'c.csv'],
+                               'start': [0, 150, 300],
+                               'end': [100, 250, 400],
+                               'label': [3, 7, 3]})
+    boundaries['start_time'] = boundaries['start'] / 100
+    boundaries['end_time'] = boundaries['end'] / 100
+    return boundaries
+
+
+def test_map_segments_to_recording_points():
+    segments = map_segments(_boundaries(), 500, 1.2)
+
+    assert list(segments.columns) == ['file', 'label', 'start', 'end',
+                                      'start_time', 'end_time', 'complete']
+    # The stimulus rate does not matter, only the times
+    np.testing.assert_array_equal(segments['start'], [600, 1350, 2100])
+    np.testing.assert_array_equal(segments['end'], [1100, 1850, 2600])
+    np.testing.assert_allclose(segments['start_time'], [1.2, 2.7, 4.2])
+    assert segments['complete'].all()
+    assert list(segments['label']) == [3, 7, 3]
+
+
+def test_map_segments_clipped_to_the_recording():
+    # The recording started 0.5s after the stimulus and stopped early
+    segments = map_segments(_boundaries(), 500, -0.5, num_points=1000)
+
+    np.testing.assert_array_equal(segments['start'], [0, 500, 1000])
+    np.testing.assert_array_equal(segments['end'], [250, 1000, 1000])
+    # Only the middle snippet was recorded completely
+    assert list(segments['complete']) == [False, True, False]
+    # The times are not clipped
+    np.testing.assert_allclose(segments['start_time'], [-0.5, 1., 2.5])
+
+
+def test_map_segments_without_label():
+    segments = map_segments(_boundaries().drop(columns=['label']), 100, 0,
+                            num_points=400)
+
+    assert 'label' not in segments
+    np.testing.assert_array_equal(segments['end'], [100, 250, 400])
+    assert segments['complete'].all()